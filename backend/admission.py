@@ -0,0 +1,207 @@
+import os
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Per-client budget: a bucket of CPU seconds refilled at CLIENT_COST_RATE
+# per second up to CLIENT_COST_BURST
+CLIENT_COST_RATE = float(os.environ.get('CLIENT_COST_RATE', 1.0))
+CLIENT_COST_BURST = float(os.environ.get('CLIENT_COST_BURST', 60.0))
+
+# Global budget: estimated CPU seconds of requests allowed in flight at once
+GLOBAL_COST_CAPACITY = float(os.environ.get('GLOBAL_COST_CAPACITY', 20.0 * (os.cpu_count() or 1)))
+
+# Requests this cheap skip the global queue so they never wait behind heavy ones
+SMALL_REQUEST_COST = 0.25
+
+# Longest a request waits for global capacity before it is turned away
+QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10.0))
+
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 1))
+MAX_CLIENT_JOBS = 2
+MAX_STORED_JOBS = 200
+
+# Client buckets are dropped once idle this long (they are full by then)
+CLIENT_IDLE_SECONDS = 3600
+
+_buckets = {}
+_bucket_lock = threading.Lock()
+
+_capacity = threading.Condition()
+_in_flight = 0.0
+_waiting = deque()
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_executor = None
+
+
+class AdmissionRejected(Exception):
+    """A request exceeds a cost budget; retry_after is a suggested wait in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+def charge_client(client, cost, now=None):
+    """
+    Charge a request's estimated cost to its client's bucket
+
+    A request is admitted while the bucket holds its cost (or a full burst,
+    for requests costing more than that) and the bucket may then go into
+    debt, so one expensive request is allowed and later ones wait for the
+    refill.
+
+    Raises:
+        AdmissionRejected: If the bucket does not cover the request
+    """
+    now = time.monotonic() if now is None else now
+    needed = min(cost, CLIENT_COST_BURST)
+    with _bucket_lock:
+        tokens, updated = _buckets.get(client, (CLIENT_COST_BURST, now))
+        tokens = min(CLIENT_COST_BURST, tokens + (now - updated) * CLIENT_COST_RATE)
+        if tokens < needed:
+            _buckets[client] = (tokens, now)
+            raise AdmissionRejected(f"Cost budget exceeded: request needs {cost:.2f}s of "
+                                    f"simulation, {max(tokens, 0):.2f}s available",
+                                    (needed - tokens) / CLIENT_COST_RATE)
+        _buckets[client] = (tokens - cost, now)
+
+        if len(_buckets) > 10000:
+            idle = [c for c, (_, t) in _buckets.items() if now - t > CLIENT_IDLE_SECONDS]
+            for c in idle:
+                del _buckets[c]
+
+
+def refund_client(client, cost, now=None):
+    """Give back the charge of a request turned away after charge_client"""
+    now = time.monotonic() if now is None else now
+    with _bucket_lock:
+        tokens, updated = _buckets.get(client, (CLIENT_COST_BURST, now))
+        tokens = min(CLIENT_COST_BURST, tokens + (now - updated) * CLIENT_COST_RATE + cost)
+        _buckets[client] = (tokens, now)
+
+
+@contextmanager
+def reserve_capacity(cost, timeout=QUEUE_TIMEOUT):
+    """
+    Hold a share of the global budget while a request runs
+
+    Requests queue in arrival order until their cost fits in what is left
+    of GLOBAL_COST_CAPACITY; a request larger than the whole capacity runs
+    once nothing else is. Requests up to SMALL_REQUEST_COST are not
+    queued.
+
+    Raises:
+        AdmissionRejected: If capacity does not free up within timeout
+    """
+    global _in_flight
+    if cost <= SMALL_REQUEST_COST:
+        yield
+        return
+
+    ticket = object()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _capacity:
+        _waiting.append(ticket)
+        try:
+            while not (_waiting[0] is ticket
+                       and (_in_flight + cost <= GLOBAL_COST_CAPACITY or _in_flight == 0)):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise AdmissionRejected("Server busy: simulation capacity is in use",
+                                            min(_in_flight, timeout or 1))
+                _capacity.wait(remaining)
+        finally:
+            _waiting.remove(ticket)
+            _capacity.notify_all()
+        _in_flight += cost
+
+    try:
+        yield
+    finally:
+        with _capacity:
+            _in_flight -= cost
+            _capacity.notify_all()
+
+
+def _run_job(job_id, cost, run):
+    """Background worker body: wait for capacity, run, store the outcome"""
+    with _jobs_lock:
+        _jobs[job_id]["status"] = "running"
+    try:
+        with reserve_capacity(cost, timeout=None):
+            result = run()
+        outcome = {"status": "done", "result": result}
+    except ValueError as e:
+        outcome = {"status": "failed", "error": str(e)}
+    except Exception as e:
+        logger.error("Background job %s failed: %s", job_id, e)
+        outcome = {"status": "failed", "error": f"Internal server error: {str(e)}"}
+    with _jobs_lock:
+        _jobs[job_id].update(outcome, finished_at=time.time())
+
+
+def submit_job(client, cost, run):
+    """
+    Queue an expensive request to run in the background
+
+    Args:
+        client: Client the job belongs to
+        cost: Estimated cost in CPU seconds
+        run: Callable returning the request's result dictionary
+
+    Returns:
+        Job id to poll with get_job
+
+    Raises:
+        AdmissionRejected: If the client already has MAX_CLIENT_JOBS pending
+    """
+    global _executor
+    with _jobs_lock:
+        pending = sum(1 for job in _jobs.values()
+                      if job["client"] == client and job["status"] in ("queued", "running"))
+        if pending >= MAX_CLIENT_JOBS:
+            raise AdmissionRejected(f"At most {MAX_CLIENT_JOBS} background jobs per client", cost)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS,
+                                           thread_name_prefix='simulation-job')
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {"id": job_id, "client": client, "status": "queued", "cost": cost,
+                         "created_at": time.time()}
+        finished = [k for k, job in _jobs.items() if job["status"] in ("done", "failed")]
+        for k in finished[:max(0, len(_jobs) - MAX_STORED_JOBS)]:
+            del _jobs[k]
+    # The job keeps the submitting request's context (and so its request id)
+    _executor.submit(contextvars.copy_context().run, _run_job, job_id, cost, run)
+    logger.info("Queued background job %s (%.2fs estimated) for %s", job_id, cost, client)
+    return job_id
+
+
+def get_job(job_id):
+    """Status of a background job (and its result once done), or None if unknown"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return None if job is None else {k: v for k, v in job.items() if k != "client"}
+
+
+def admission_status():
+    """Current global load: cost in flight, requests queued and pending jobs"""
+    with _capacity:
+        in_flight, waiting = _in_flight, len(_waiting)
+    with _jobs_lock:
+        pending = sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+    return {
+        "cost_in_flight": round(in_flight, 3),
+        "cost_capacity": GLOBAL_COST_CAPACITY,
+        "queued_requests": waiting,
+        "pending_jobs": pending,
+    }
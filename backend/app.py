@@ -1,160 +1,1027 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
-from simulator import simulate_strategy
+from simulator import simulate_strategy, ENGINE_VERSION
+from montecarlo import run_monte_carlo
+from table import simulate_table
+from solver import solve_threshold, SOLVER_PARAMETERS, OBJECTIVES
+from optimizer import optimize_custom_strategy, OPTIMIZER_OBJECTIVES
+from thresholds import sweep_thresholds, SWEEP_STRATEGIES, MAX_SWEEP_PAIRS
+from latency import simulate_latency, DEFAULT_GROWTH_RATE, DEFAULT_ROUND_PAUSE
+from fanchart import fan_chart, DEFAULT_FAN_POINTS, DEFAULT_RELATIVE_ACCURACY
+from survival import survival_analysis, SURVIVAL_STRATEGIES, DEFAULT_SURVIVAL_POINTS, DEFAULT_HISTOGRAM_BINS
+from sessions import simulate_sessions, MAX_SESSION_ELEMENTS
+from portfolio import simulate_portfolio, parse_components, ALLOCATIONS
+from live import create_room, get_room, list_rooms, sse_event
+from fair import (
+    load_chain, chain_cached, game_hashes, verify_game_hashes, verify_server_seed,
+    DEFAULT_HOUSE_EDGE, MAX_CHAIN_LENGTH
+)
+from planner import (
+    plan_request, estimate_cost, estimate_group_cost, estimate_portfolio_cost, estimate_chain_cost,
+    estimate_latency_cost, SOLVER_EVALUATIONS
+)
+from admission import (
+    AdmissionRejected, charge_client, refund_client, reserve_capacity, submit_job, get_job, admission_status
+)
+from table import parse_player_groups
+from latency import parse_latency_groups
+from runs import save_run, list_runs, get_run_history, delete_run, RUN_ORDERS, MAX_RUNS_PAGE
+from logging_setup import configure_logging, request_id
+from worker_pool import start_pool
+from checkpoint import checkpoint_chain
+from validation import (
+    validate_float, validate_int, validate_bool, parse_threshold_list, parse_timestamp,
+    parse_simulation_args, parse_resume_args, parse_crash_chain, build_request_batch_params,
+    STRATEGIES
+)
+import os
+import json
+import hashlib
+import itertools
 import logging
+import math
+import queue
+import time
+import uuid
 
 app = Flask(__name__)
 CORS(app)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger(__name__ + '.access')
 
+# Seconds clients and proxies may reuse a seeded simulation's response
+SIMULATE_CACHE_MAX_AGE = int(os.environ.get('SIMULATE_CACHE_MAX_AGE', 86400))
 
-def validate_float(value, default, min_val=None, max_val=None, name="parameter"):
-    """Validate and convert string to float with bounds checking"""
+
+@app.before_request
+def start_request():
+    """Assign the request an id (X-Request-Id if given) for its log records"""
+    g.started = time.perf_counter()
+    g.request_id = request.headers.get('X-Request-Id') or uuid.uuid4().hex[:16]
+    g.request_id_token = request_id.set(g.request_id)
+
+
+@app.after_request
+def log_request(response):
+    """Log one structured access record per request and echo its id"""
+    duration_ms = round((time.perf_counter() - g.started) * 1000, 2)
+    response.headers['X-Request-Id'] = g.request_id
+    access_logger.info("%s %s %d %.2fms", request.method, request.path, response.status_code,
+                       duration_ms, extra={
+                           "method": request.method,
+                           "path": request.path,
+                           "status": response.status_code,
+                           "duration_ms": duration_ms,
+                           "client": client_id(),
+                           "client_label": request.headers.get('X-Client-Id'),
+                           "execution_path": response.headers.get('X-Execution-Path'),
+                       })
+    return response
+
+
+@app.teardown_request
+def end_request(error=None):
+    """Clear the request id so later records on this thread are not attributed to it"""
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id.reset(token)
+
+
+def client_id():
+    """
+    Client a request's cost is charged to: its remote address
+
+    X-Client-Id is client-supplied, so it only labels requests in the
+    access log; keying budgets on it would let a client rotate it to
+    escape them.
+    """
+    return request.remote_addr or 'anonymous'
+
+
+def run_planned(plan, run):
+    """
+    Execute a planned request within the admission budgets
+
+    The request's estimated cost is charged to its client first, and given
+    back if the request is then turned away (job limit, busy server).
+    Background plans are queued and answered with 202 and a job to poll; the
+    others run now, holding their share of global capacity while they do.
+
+    Args:
+        plan: Plan from planner.plan_request
+        run: Callable returning the response dictionary
+
+    Raises:
+        AdmissionRejected: If a budget does not cover the request
+    """
+    client = client_id()
+    charge_client(client, plan["cost"])
     try:
-        result = float(value) if value is not None else default
-        if min_val is not None and result < min_val:
-            logger.warning(f"{name} {result} below minimum {min_val}, using {min_val}")
-            return min_val
-        if max_val is not None and result > max_val:
-            logger.warning(f"{name} {result} above maximum {max_val}, using {max_val}")
-            return max_val
-        return result
-    except (ValueError, TypeError):
-        logger.warning(f"Invalid {name} value: {value}, using default: {default}")
-        return default
+        if plan["path"] == 'background':
+            job_id = submit_job(client, plan["cost"], run)
+            response = jsonify({"job_id": job_id, "status": "queued",
+                                "status_url": f"/jobs/{job_id}", "plan": plan})
+            response.status_code = 202
+        else:
+            with reserve_capacity(plan["cost"]):
+                response = jsonify(run())
+    except AdmissionRejected:
+        refund_client(client, plan["cost"])
+        raise
+    response.headers['X-Execution-Path'] = plan["path"]
+    response.headers['X-Estimated-Cost'] = str(plan["cost"])
+    return response
 
 
-def validate_int(value, default, min_val=None, max_val=None, name="parameter"):
-    """Validate and convert string to int with bounds checking"""
+def rejected(error):
+    """429 response for a request turned away by admission control"""
+    logger.warning("Rejected request from %s: %s", client_id(), error)
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+
+def simulation_etag(params):
+    """
+    Strong ETag of a deterministic simulation
+
+    Hashes the validated parameters (including seed, checkpoint and crash
+    source) in canonical JSON together with ENGINE_VERSION, so equal
+    requests share a tag however their query strings are written.
+    """
+    canonical = json.dumps({"engine": ENGINE_VERSION, "params": params}, sort_keys=True,
+                           separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def cache_headers(response, etag):
+    """
+    Mark a simulation response cacheable under etag, or not cacheable
+
+    Only a result (200) or its revalidation (304) carries the tag; a 202
+    job ticket must not stand in for the result it promises.
+    """
+    if etag is None or response.status_code not in (200, 304):
+        response.headers['Cache-Control'] = 'no-store'
+    else:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={SIMULATE_CACHE_MAX_AGE}'
+    return response
+
+
+@app.route('/simulate', methods=['GET'])
+def simulate():
     try:
-        result = int(value) if value is not None else default
-        if min_val is not None and result < min_val:
-            logger.warning(f"{name} {result} below minimum {min_val}, using {min_val}")
-            return min_val
-        if max_val is not None and result > max_val:
-            logger.warning(f"{name} {result} above maximum {max_val}, using {max_val}")
-            return max_val
-        return result
-    except (ValueError, TypeError):
-        logger.warning(f"Invalid {name} value: {value}, using default: {default}")
-        return default
+        checkpoint = request.args.get('checkpoint')
+        if checkpoint:
+            params, error = parse_resume_args(request.args)
+        else:
+            params, error = parse_simulation_args(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+        params['checkpoint'] = checkpoint or None
+        if not checkpoint:
+            params['crash_chain'] = parse_crash_chain(request.args)
+        seed = request.args.get('seed')
+        if seed is not None:
+            params['seed'] = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
 
+        save = validate_bool(request.args.get('save'), False)
+        trace = {
+            'trace_every': validate_int(request.args.get('trace_every'), 0, 0, 100000, "trace_every"),
+            'trace_ruin': validate_bool(request.args.get('trace_ruin'), False),
+        }
 
-def validate_bool(value, default, name="parameter"):
-    """Validate and convert string to boolean"""
-    if value is None:
-        return default
-    if isinstance(value, str):
-        return value.lower() in ('true', '1', 'yes', 'on')
-    return bool(value)
+        # Seeded runs and resumed checkpoints (which carry the generator
+        # state) are fully determined by their parameters, so repeat requests
+        # are answered from the client's or a proxy's copy; saving has a side
+        # effect and is never cached
+        deterministic = params.get('seed') is not None or params['checkpoint']
+        etag = simulation_etag(params) if deterministic and not save else None
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            return cache_headers(app.response_class(status=304), etag)
 
+        logger.info("Simulating %s strategy for %d rounds", params['strategy'], params['rounds'])
+        cost = estimate_cost(params['strategy'], params['rounds'], vectorized=False)
+        # A resumed hash-chain run rebuilds its chain unless it is cached
+        chain = checkpoint_chain(checkpoint) if checkpoint else params.get('crash_chain')
+        if chain:
+            cost += estimate_chain_cost(chain['length'], chain_cached(chain['server_seed'],
+                                                                      chain['length'],
+                                                                      chain['house_edge']))
+        plan = plan_request(params['strategy'], params['rounds'], vectorized=False, cost=cost)
 
-def validate_bet_sequence(bet_sequence, default="1,2,4"):
-    """Validate and parse bet sequence"""
-    if not bet_sequence:
-        return default.split(',')
+        def run():
+            result = simulate_strategy(**params, **trace)
+            if "error" in result:
+                logger.error("Simulation error: %s", result['error'])
+                raise ValueError(result["error"])
+            if save:
+                stored = {k: v for k, v in params.items() if k != 'checkpoint'}
+                result["run_id"] = save_run(stored, result)
+            return result
 
+        return cache_headers(run_planned(plan, run), etag)
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in simulate endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/montecarlo', methods=['GET'])
+def montecarlo():
+    """Batch simulation with optional adaptive stopping on target precision"""
     try:
-        # Parse and validate bet sequence
-        bets = [float(x.strip()) for x in bet_sequence.split(',') if x.strip()]
-        if not bets:
-            logger.warning(f"Empty bet sequence, using default: {default}")
-            return default.split(',')
+        params, error = parse_simulation_args(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+
+        adaptive = validate_bool(request.args.get('adaptive'), True)
+        max_trials = validate_int(request.args.get('max_trials'), 10000, 1, 1000000, "max_trials")
+        precision = validate_float(request.args.get('precision'), 0.005, 0.0001, 0.5, "precision")
+        balance_precision = request.args.get('balance_precision')
+        if balance_precision is not None:
+            balance_precision = validate_float(balance_precision, None, 0.0001, 1000000, "balance_precision")
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+
+        # Variance reduction options
+        loss_tilt = None
+        if validate_bool(request.args.get('importance_sampling'), False):
+            loss_tilt = validate_float(request.args.get('loss_tilt'), 0.8, 0.05, 0.99, "loss_tilt")
+
+        batch_params = build_request_batch_params(params)
+        max_seconds = validate_float(request.args.get('max_seconds'), 30, 0.1, 600, "max_seconds")
+        plan = plan_request(params['strategy'], params['rounds'], max_trials, max_seconds=max_seconds)
+        options = dict(
+            precision=precision if adaptive else None,
+            balance_precision=balance_precision if adaptive else None,
+            confidence=validate_float(request.args.get('confidence'), 0.95, 0.5, 0.999, "confidence"),
+            initial_trials=validate_int(request.args.get('initial_trials'), 256, 1, 100000, "initial_trials"),
+            max_trials=max_trials,
+            max_seconds=max_seconds,
+            seed=seed,
+            realistic_conditions=params['realistic_conditions'],
+            network_delay=params['network_delay'],
+            error_simulation=params['error_simulation'],
+            antithetic=validate_bool(request.args.get('antithetic'), False),
+            control_variate=validate_bool(request.args.get('control_variate'), False),
+            loss_tilt=loss_tilt,
+            tilt_after_losses=validate_int(request.args.get('tilt_after_losses'), 4, 0, 1000, "tilt_after_losses"),
+            chunk_elements=plan['chunk_elements']
+        )
+
+        def run():
+            result = run_monte_carlo(batch_params, params['rounds'], **options)
+            result['strategy'] = params['strategy']
+            result['rounds'] = params['rounds']
+            return result
 
-        # Ensure all bets are positive
-        valid_bets = [max(0.01, bet) for bet in bets]
-        if valid_bets != [float(x) for x in bets]:
-            logger.warning("Some bet values were below 0.01, adjusted to minimum")
+        return run_planned(plan, run)
 
-        return [str(bet) for bet in valid_bets]
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        logger.warning(f"Invalid bet sequence '{bet_sequence}': {e}, using default: {default}")
-        return default.split(',')
+        logger.error("Unexpected error in montecarlo endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 
-@app.route('/simulate', methods=['GET'])
-def simulate():
+@app.route('/fanchart', methods=['GET'])
+def fanchart():
+    """Per-round balance percentile bands across many trials of a strategy"""
     try:
-        # Basic parameters with validation
-        strategy = request.args.get('strategy', 'early')
-        if strategy not in ['early', 'mid', 'high', 'dual', 'martingale', 'paroli',
-                            'fixed_percent', 'target_profit', 'custom']:
-            return jsonify({"error": f"Invalid strategy: {strategy}"}), 400
+        params, error = parse_simulation_args(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+        trials = validate_int(request.args.get('trials'), 2000, 1, 1000000, "trials")
+        plan = plan_request(params['strategy'], params['rounds'], trials, parallel=True, record=True)
+        workers = request.args.get('workers')
+        if workers is not None:
+            plan['workers'] = validate_int(workers, 1, 1, 64, "workers")
+
+        batch_params = build_request_batch_params(params)
+        options = dict(
+            trials=trials,
+            points=validate_int(request.args.get('points'), DEFAULT_FAN_POINTS, 2, 2000, "points"),
+            relative_accuracy=validate_float(request.args.get('relative_accuracy'),
+                                             DEFAULT_RELATIVE_ACCURACY, 0.001, 0.1,
+                                             "relative_accuracy"),
+            workers=plan['workers'],
+            seed=seed,
+            realistic_conditions=params['realistic_conditions'],
+            network_delay=params['network_delay'],
+            error_simulation=params['error_simulation'],
+            chunk_elements=plan['chunk_elements']
+        )
+
+        def run():
+            result = fan_chart(batch_params, params['rounds'], **options)
+            result['strategy'] = params['strategy']
+            return result
+
+        return run_planned(plan, run)
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in fanchart endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/survival', methods=['GET'])
+def survival():
+    """Survival curve and time-to-ruin/target histograms of a bankroll strategy"""
+    try:
+        params, error = parse_simulation_args(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+        if params['strategy'] not in SURVIVAL_STRATEGIES:
+            return jsonify({"error": f"strategy must be one of {', '.join(SURVIVAL_STRATEGIES)}"}), 400
+
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+
+        trials = validate_int(request.args.get('trials'), 10000, 1, 1000000, "trials")
+        plan = plan_request(params['strategy'], params['rounds'], trials)
+        batch_params = build_request_batch_params(params)
+        options = dict(
+            trials=trials,
+            points=validate_int(request.args.get('points'), DEFAULT_SURVIVAL_POINTS, 2, 5000, "points"),
+            bins=validate_int(request.args.get('bins'), DEFAULT_HISTOGRAM_BINS, 1, 1000, "bins"),
+            confidence=validate_float(request.args.get('confidence'), 0.95, 0.5, 0.999, "confidence"),
+            seed=seed,
+            realistic_conditions=params['realistic_conditions'],
+            network_delay=params['network_delay'],
+            error_simulation=params['error_simulation'],
+            chunk_elements=plan['chunk_elements']
+        )
 
+        def run():
+            result = survival_analysis(batch_params, params['rounds'], **options)
+            result['strategy'] = params['strategy']
+            return result
+
+        return run_planned(plan, run)
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in survival endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/sessions', methods=['GET'])
+def sessions():
+    """Players playing many sessions with session stop rules over a carried bankroll"""
+    try:
+        params, error = parse_simulation_args(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+        loss_limit = request.args.get('session_loss_limit')
+        if loss_limit is not None:
+            loss_limit = validate_float(loss_limit, None, 0.01, 1000000, "session_loss_limit")
+        win_goal = request.args.get('session_win_goal')
+        if win_goal is not None:
+            win_goal = validate_float(win_goal, None, 0.01, 1000000, "session_win_goal")
+
+        trials = validate_int(request.args.get('players'), 1000, 1, 100000, "players")
+        session_count = validate_int(request.args.get('sessions'), 30, 1, 3650, "sessions")
+        session_rounds = validate_int(request.args.get('session_rounds'), 100, 1, 10000, "session_rounds")
+        if trials * session_count * session_rounds > MAX_SESSION_ELEMENTS:
+            return jsonify({"error": f"players x sessions x session_rounds must be at most "
+                                     f"{MAX_SESSION_ELEMENTS}"}), 400
+
+        plan = plan_request(params['strategy'], session_count * session_rounds, trials, record=True)
+        batch_params = build_request_batch_params(params)
+        options = dict(
+            bankroll=params['bankroll'],
+            session_loss_limit=loss_limit,
+            session_win_goal=win_goal,
+            paths=validate_int(request.args.get('paths'), 10, 0, 100, "paths"),
+            seed=seed,
+            realistic_conditions=params['realistic_conditions'],
+            network_delay=params['network_delay'],
+            error_simulation=params['error_simulation'],
+            chunk_elements=plan['chunk_elements']
+        )
+
+        def run():
+            result = simulate_sessions(batch_params, trials, session_count, session_rounds, **options)
+            result['strategy'] = params['strategy']
+            return result
+
+        return run_planned(plan, run)
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in sessions endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/portfolio', methods=['GET'])
+def portfolio():
+    """Several strategies played together from one shared bankroll"""
+    try:
+        components = request.args.get('components')
+        if not components:
+            return jsonify({"error": "components is required"}), 400
+        allocation = request.args.get('allocation', 'priority')
+        if allocation not in ALLOCATIONS:
+            return jsonify({"error": f"Invalid allocation: {allocation}"}), 400
+
+        trials = validate_int(request.args.get('trials'), 1000, 1, 100000, "trials")
         rounds = validate_int(request.args.get('rounds'), 1000, 1, 100000, "rounds")
-        bet = validate_float(request.args.get('bet'), 1.0, 0.01, 10000, "bet")
         bankroll = validate_float(request.args.get('bankroll'), 100, 1, 1000000, "bankroll")
-        target_profit = validate_float(request.args.get('target_profit'), 50, 1, 1000000, "target_profit")
-        percent_bet = validate_float(request.args.get('percent_bet'), 5, 0.1, 100, "percent_bet")
+        stop_loss = request.args.get('stop_loss')
+        if stop_loss is not None:
+            stop_loss = validate_float(stop_loss, None, 0, 1000000, "stop_loss")
+        take_profit = request.args.get('take_profit')
+        if take_profit is not None:
+            take_profit = validate_float(take_profit, None, 0, 100000000, "take_profit")
+        min_bet = validate_float(request.args.get('min_bet'), 0.10, 0.01, 1000, "min_bet")
+        max_bet = validate_float(request.args.get('max_bet'), 1000.0, 1, 100000, "max_bet")
+        if min_bet > max_bet:
+            logger.warning("min_bet (%s) > max_bet (%s), swapping values", min_bet, max_bet)
+            min_bet, max_bet = max_bet, min_bet
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
 
-        # Realistic conditions parameters with validation
-        realistic_conditions = validate_bool(request.args.get('realistic_conditions'), True)
+        components = parse_components(components, allocation, bankroll)
+        plan = plan_request('portfolio', rounds, trials,
+                            cost=estimate_portfolio_cost(components, rounds, trials))
+        options = dict(
+            allocation=allocation,
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+            seed=seed,
+            realistic_conditions=validate_bool(request.args.get('realistic_conditions'), True),
+            network_delay=validate_bool(request.args.get('network_delay'), True),
+            error_simulation=validate_bool(request.args.get('error_simulation'), True),
+            min_bet=min_bet,
+            max_bet=max_bet,
+            chunk_elements=plan['chunk_elements']
+        )
+        return run_planned(plan, lambda: simulate_portfolio(components, trials, rounds, bankroll,
+                                                            **options))
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in portfolio endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/solve', methods=['GET'])
+def solve():
+    """Find the bankroll/bet/threshold at which ruin or profit crosses a target"""
+    try:
+        params, error = parse_simulation_args(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+
+        parameter = request.args.get('parameter', 'bankroll')
+        if parameter not in SOLVER_PARAMETERS:
+            return jsonify({"error": f"Invalid parameter: {parameter}"}), 400
+        objective = request.args.get('objective', 'ruin_probability')
+        if objective not in OBJECTIVES:
+            return jsonify({"error": f"Invalid objective: {objective}"}), 400
+
+        if objective == 'ruin_probability':
+            target = validate_float(request.args.get('target'), 0.05, 0.0, 1.0, "target")
+        else:
+            target = validate_float(request.args.get('target'), 0.0, -1000000, 1000000, "target")
+        lower = request.args.get('lower')
+        upper = request.args.get('upper')
+
+        trials = validate_int(request.args.get('trials'), 2000, 10, 20000, "trials")
+        plan = plan_request(params['strategy'], params['rounds'], trials, repeats=SOLVER_EVALUATIONS)
+        batch_params = build_request_batch_params(params)
+        options = dict(
+            parameter=parameter,
+            objective=objective,
+            target=target,
+            lower=None if lower is None else validate_float(lower, None, 0, 1000000, "lower"),
+            upper=None if upper is None else validate_float(upper, None, 0, 100000000, "upper"),
+            trials=trials,
+            seed=validate_int(request.args.get('seed'), 0, 0, 2 ** 63 - 1, "seed"),
+            confidence=validate_float(request.args.get('confidence'), 0.95, 0.5, 0.999, "confidence"),
+            realistic_conditions=params['realistic_conditions'],
+            network_delay=params['network_delay'],
+            error_simulation=params['error_simulation'],
+            chunk_elements=plan['chunk_elements']
+        )
+
+        def run():
+            result = solve_threshold(batch_params, params['rounds'], **options)
+            result['strategy'] = params['strategy']
+            return result
+
+        return run_planned(plan, run)
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in solve endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/table', methods=['GET'])
+def table():
+    """Many players with mixed strategies betting on one shared crash stream"""
+    try:
+        players = request.args.get('players')
+        if not players:
+            return jsonify({"error": "players is required"}), 400
+
+        rounds = validate_int(request.args.get('rounds'), 1000, 1, 100000, "rounds")
         min_bet = validate_float(request.args.get('min_bet'), 0.10, 0.01, 1000, "min_bet")
         max_bet = validate_float(request.args.get('max_bet'), 1000.0, 1, 100000, "max_bet")
-        network_delay = validate_bool(request.args.get('network_delay'), True)
-        error_simulation = validate_bool(request.args.get('error_simulation'), True)
+        if min_bet > max_bet:
+            logger.warning("min_bet (%s) > max_bet (%s), swapping values", min_bet, max_bet)
+            min_bet, max_bet = max_bet, min_bet
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
 
-        # Ensure min_bet <= max_bet
+        groups = parse_player_groups(players)
+        plan = plan_request('table', rounds, cost=estimate_group_cost(groups, rounds))
+        options = dict(
+            seed=seed,
+            realistic_conditions=validate_bool(request.args.get('realistic_conditions'), True),
+            network_delay=validate_bool(request.args.get('network_delay'), True),
+            error_simulation=validate_bool(request.args.get('error_simulation'), True),
+            min_bet=min_bet,
+            max_bet=max_bet,
+            sample_every=validate_int(request.args.get('sample_every'), max(1, rounds // 1000),
+                                      1, rounds, "sample_every"),
+            chunk_elements=plan['chunk_elements']
+        )
+        return run_planned(plan, lambda: simulate_table(groups, rounds, **options))
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in table endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/optimize', methods=['GET'])
+def optimize():
+    """Search custom strategy parameters toward an objective under a ruin ceiling"""
+    try:
+        objective = request.args.get('objective', 'median_final_balance')
+        if objective not in OPTIMIZER_OBJECTIVES:
+            return jsonify({"error": f"Invalid objective: {objective}"}), 400
+
+        min_bet = validate_float(request.args.get('min_bet'), 0.10, 0.01, 1000, "min_bet")
+        max_bet = validate_float(request.args.get('max_bet'), 1000.0, 1, 100000, "max_bet")
         if min_bet > max_bet:
-            logger.warning(f"min_bet ({min_bet}) > max_bet ({max_bet}), swapping values")
+            logger.warning("min_bet (%s) > max_bet (%s), swapping values", min_bet, max_bet)
             min_bet, max_bet = max_bet, min_bet
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+        min_trials = validate_int(request.args.get('min_trials'), 100, 10, 10000, "min_trials")
+        rounds = validate_int(request.args.get('rounds'), 100, 1, 10000, "rounds")
+        candidates = validate_int(request.args.get('candidates'), 64, 2, 512, "candidates")
+        generations = validate_int(request.args.get('generations'), 3, 1, 20, "generations")
+        eta = validate_int(request.args.get('eta'), 3, 2, 8, "eta")
+        max_trials = validate_int(request.args.get('max_trials'), 3000, min_trials, 50000, "max_trials")
+        max_seconds = validate_float(request.args.get('max_seconds'), 30, 1, 300, "max_seconds")
 
-        # Custom strategy parameters with validation
-        custom_params = {}
-        if strategy == 'custom':
-            custom_params = {
-                'cashout_target': validate_float(request.args.get('cashout_target'), 2.0, 1.01, 1000, "cashout_target"),
-                'bet_sequence': ','.join(validate_bet_sequence(request.args.get('bet_sequence'))),
-                'max_bet': validate_float(request.args.get('max_bet'), 20, 1, 100000, "custom_max_bet"),
-                'stop_loss': validate_float(request.args.get('stop_loss'), 50, 0, 1000000, "stop_loss"),
-                'take_profit': validate_float(request.args.get('take_profit'), 200, 1, 1000000, "take_profit"),
-                'progression_type': request.args.get('progression_type', 'loss')
-            }
+        # Each successive-halving rung simulates about candidates x min_trials trials
+        rungs = 1 + math.ceil(math.log(max_trials / min_trials) / math.log(eta))
+        plan = plan_request('custom', rounds, candidates * min_trials * rungs, parallel=True,
+                            repeats=generations, max_seconds=max_seconds)
+        workers = request.args.get('workers')
+        if workers is not None:
+            plan['workers'] = validate_int(workers, 1, 1, 64, "workers")
+
+        options = dict(
+            bankroll=validate_float(request.args.get('bankroll'), 100, 1, 1000000, "bankroll"),
+            objective=objective,
+            max_ruin=validate_float(request.args.get('max_ruin'), 0.05, 0.0, 1.0, "max_ruin"),
+            candidates=candidates,
+            generations=generations,
+            eta=eta,
+            min_trials=min_trials,
+            max_trials=max_trials,
+            workers=plan['workers'],
+            max_seconds=max_seconds,
+            seed=seed,
+            confidence=validate_float(request.args.get('confidence'), 0.95, 0.5, 0.999, "confidence"),
+            min_bet=min_bet,
+            max_bet=max_bet,
+            realistic_conditions=validate_bool(request.args.get('realistic_conditions'), True),
+            network_delay=validate_bool(request.args.get('network_delay'), True),
+            error_simulation=validate_bool(request.args.get('error_simulation'), True)
+        )
+        return run_planned(plan, lambda: optimize_custom_strategy(rounds, **options))
 
-            # Validate progression type
-            if custom_params['progression_type'] not in ['loss', 'win']:
-                logger.warning(f"Invalid progression_type: {custom_params['progression_type']}, using 'loss'")
-                custom_params['progression_type'] = 'loss'
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in optimize endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
-        # Validate bankroll is sufficient for minimum bet
-        if bankroll < min_bet:
-            return jsonify({"error": f"Bankroll ({bankroll}) must be at least the minimum bet ({min_bet})"}), 400
 
-        logger.info(f"Simulating {strategy} strategy for {rounds} rounds")
+@app.route('/thresholds', methods=['GET'])
+def thresholds():
+    """Outcomes of many stop-loss/take-profit pairs from a single simulated path"""
+    try:
+        params, error = parse_simulation_args(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+        if params['strategy'] not in SWEEP_STRATEGIES:
+            return jsonify({"error": f"strategy must be one of {', '.join(SWEEP_STRATEGIES)}"}), 400
 
-        result = simulate_strategy(
-            strategy=strategy,
-            rounds=rounds,
-            bet=bet,
-            bankroll=bankroll,
-            target_profit=target_profit,
-            percent_bet=percent_bet,
-            realistic_conditions=realistic_conditions,
+        stop_losses = parse_threshold_list(request.args.get('stop_losses'), "stop_losses")
+        take_profits = parse_threshold_list(request.args.get('take_profits'), "take_profits")
+        if validate_bool(request.args.get('grid'), True):
+            pairs = list(itertools.product(stop_losses, take_profits))
+        elif len(stop_losses) != len(take_profits):
+            return jsonify({"error": "stop_losses and take_profits must have the same length"}), 400
+        else:
+            pairs = list(zip(stop_losses, take_profits))
+        if len(pairs) > MAX_SWEEP_PAIRS:
+            return jsonify({"error": f"At most {MAX_SWEEP_PAIRS} threshold pairs are supported"}), 400
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+
+        plan = plan_request(params['strategy'], params['rounds'], vectorized=False)
+        options = dict(
+            bet=params['bet'],
+            bankroll=params['bankroll'],
+            custom_params=params['custom_params'],
+            realistic_conditions=params['realistic_conditions'],
+            min_bet=params['min_bet'],
+            max_bet=params['max_bet'],
+            network_delay=params['network_delay'],
+            error_simulation=params['error_simulation'],
+            cents=params['cents'],
+            seed=seed,
+            crash_distribution=params['crash_distribution']
+        )
+        return run_planned(plan, lambda: sweep_thresholds(params['strategy'], params['rounds'],
+                                                          [p[0] for p in pairs],
+                                                          [p[1] for p in pairs], **options))
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in thresholds endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/latency', methods=['GET'])
+def latency():
+    """Cashout requests of many players racing the crash under network latency"""
+    try:
+        players = request.args.get('players')
+        if not players:
+            return jsonify({"error": "players is required"}), 400
+
+        rounds = validate_int(request.args.get('rounds'), 1000, 1, 1000000, "rounds")
+        min_bet = validate_float(request.args.get('min_bet'), 0.10, 0.01, 1000, "min_bet")
+        max_bet = validate_float(request.args.get('max_bet'), 1000.0, 1, 100000, "max_bet")
+        if min_bet > max_bet:
+            logger.warning("min_bet (%s) > max_bet (%s), swapping values", min_bet, max_bet)
+            min_bet, max_bet = max_bet, min_bet
+        seed = request.args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+
+        groups = parse_latency_groups(players)
+        plan = plan_request('latency', rounds, vectorized=False,
+                            cost=estimate_latency_cost(groups, rounds))
+        options = dict(
+            growth_rate=validate_float(request.args.get('growth_rate'), DEFAULT_GROWTH_RATE,
+                                       0.001, 10, "growth_rate"),
+            pause=validate_float(request.args.get('pause'), DEFAULT_ROUND_PAUSE, 0, 3600, "pause"),
             min_bet=min_bet,
             max_bet=max_bet,
-            network_delay=network_delay,
-            error_simulation=error_simulation,
-            custom_params=custom_params
+            seed=seed
         )
+        return run_planned(plan, lambda: simulate_latency(groups, rounds, **options))
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in latency endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
-        if "error" in result:
-            logger.error(f"Simulation error: {result['error']}")
-            return jsonify(result), 400
 
+@app.route('/runs', methods=['GET'])
+def runs():
+    """Page of stored run summaries, filtered by strategy, date and final balance"""
+    try:
+        strategy = request.args.get('strategy') or None
+        if strategy is not None and strategy not in STRATEGIES:
+            return jsonify({"error": f"Invalid strategy: {strategy}"}), 400
+        order = request.args.get('order', 'newest')
+        if order not in RUN_ORDERS:
+            return jsonify({"error": f"order must be one of {', '.join(RUN_ORDERS)}"}), 400
+        min_final_balance = request.args.get('min_final_balance') or None
+        if min_final_balance is not None:
+            min_final_balance = validate_float(min_final_balance, None, name="min_final_balance")
+        max_final_balance = request.args.get('max_final_balance') or None
+        if max_final_balance is not None:
+            max_final_balance = validate_float(max_final_balance, None, name="max_final_balance")
+
+        result = list_runs(
+            strategy=strategy,
+            since=parse_timestamp(request.args.get('since'), "since"),
+            until=parse_timestamp(request.args.get('until'), "until"),
+            min_final_balance=min_final_balance,
+            max_final_balance=max_final_balance,
+            order=order,
+            limit=validate_int(request.args.get('limit'), 50, 1, MAX_RUNS_PAGE, "limit"),
+            offset=validate_int(request.args.get('offset'), 0, 0, None, "offset")
+        )
         return jsonify(result)
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in runs endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/runs/<int:run_id>/history', methods=['GET'])
+def run_history(run_id):
+    """Balance history of one stored run"""
+    try:
+        history = get_run_history(run_id)
+        if history is None:
+            return jsonify({"error": f"Run {run_id} not found"}), 404
+        return jsonify({"id": run_id, "history": history})
+
     except Exception as e:
-        logger.error(f"Unexpected error in simulate endpoint: {str(e)}")
+        logger.error("Unexpected error in run history endpoint: %s", e)
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 
+@app.route('/runs/<int:run_id>', methods=['DELETE'])
+def remove_run(run_id):
+    """Delete one stored run"""
+    try:
+        if not delete_run(run_id):
+            return jsonify({"error": f"Run {run_id} not found"}), 404
+        return jsonify({"id": run_id, "deleted": True})
+
+    except Exception as e:
+        logger.error("Unexpected error in run delete endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/fair/chain', methods=['GET'])
+def fair_chain():
+    """Commitment, multipliers and hashes of a page of hash-chain games"""
+    try:
+        server_seed = request.args.get('server_seed')
+        if not server_seed:
+            return jsonify({"error": "server_seed is required"}), 400
+        length = validate_int(request.args.get('length'), 100000, 1, MAX_CHAIN_LENGTH, "length")
+        house_edge = validate_float(request.args.get('house_edge'), DEFAULT_HOUSE_EDGE, 0, 0.5, "house_edge")
+        offset = validate_int(request.args.get('offset'), 0, 0, length - 1, "offset")
+        limit = validate_int(request.args.get('limit'), 100, 1, 10000, "limit")
+        limit = min(limit, length - offset)
+
+        hashes = validate_bool(request.args.get('hashes'), False)
+        cost = estimate_chain_cost(length, chain_cached(server_seed, length, house_edge))
+        plan = plan_request('fair_chain', length, vectorized=False, cost=cost)
+
+        def run():
+            chain = load_chain(server_seed, length, house_edge)
+            crashes = chain["crashes"][offset:offset + limit] / 100.0
+            return {
+                "length": length,
+                "house_edge": house_edge,
+                "commitment": chain["commitment"],
+                "offset": offset,
+                "crashes": crashes.tolist(),
+                "game_hashes": game_hashes(chain, offset, limit) if hashes else None,
+            }
+
+        return run_planned(plan, run)
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in fair chain endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/fair/verify', methods=['GET'])
+def fair_verify():
+    """Verify revealed game hashes, or reported multipliers against a server seed"""
+    try:
+        house_edge = validate_float(request.args.get('house_edge'), DEFAULT_HOUSE_EDGE, 0, 0.5, "house_edge")
+        commitment = request.args.get('commitment') or None
+        hashes = request.args.get('game_hashes')
+        if hashes:
+            result = verify_game_hashes([h.strip() for h in hashes.split(',') if h.strip()],
+                                        house_edge, commitment)
+            return jsonify(result)
+
+        server_seed = request.args.get('server_seed')
+        crashes = request.args.get('crashes')
+        if not server_seed or not crashes:
+            return jsonify({"error": "Provide game_hashes, or server_seed and crashes"}), 400
+        try:
+            reported = [float(c) for c in crashes.split(',') if c.strip()]
+        except ValueError:
+            return jsonify({"error": "crashes must be a comma-separated list of numbers"}), 400
+
+        length = validate_int(request.args.get('length'), 100000, 1, MAX_CHAIN_LENGTH, "length")
+        offset = validate_int(request.args.get('offset'), 0, 0, MAX_CHAIN_LENGTH - 1, "offset")
+        cost = estimate_chain_cost(length, chain_cached(server_seed, length, house_edge))
+        plan = plan_request('fair_verify', length, vectorized=False, cost=cost)
+        return run_planned(plan, lambda: verify_server_seed(server_seed, length, reported,
+                                                            offset=offset, house_edge=house_edge,
+                                                            commitment=commitment))
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in fair verify endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+# Seconds between keep-alive comments on an idle live stream
+LIVE_KEEPALIVE_SECONDS = 15
+
+
+@app.route('/live', methods=['POST'])
+def live_create():
+    """Start a live room playing a player mix on one shared crash stream"""
+    try:
+        args = request.values
+        min_bet = validate_float(args.get('min_bet'), 0.10, 0.01, 1000, "min_bet")
+        max_bet = validate_float(args.get('max_bet'), 1000.0, 1, 100000, "max_bet")
+        if min_bet > max_bet:
+            logger.warning("min_bet (%s) > max_bet (%s), swapping values", min_bet, max_bet)
+            min_bet, max_bet = max_bet, min_bet
+        seed = args.get('seed')
+        if seed is not None:
+            seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+
+        groups = parse_player_groups(args.get('players', ''))
+        rounds = validate_int(args.get('rounds'), 10000, 1, 1000000, "rounds")
+        options = dict(
+            pace=validate_float(args.get('pace'), 1.0, 0.05, 60, "pace"),
+            rounds=rounds,
+            seed=seed,
+            realistic_conditions=validate_bool(args.get('realistic_conditions'), True),
+            network_delay=validate_bool(args.get('network_delay'), True),
+            error_simulation=validate_bool(args.get('error_simulation'), True),
+            min_bet=min_bet,
+            max_bet=max_bet
+        )
+        # The room plays on its own thread, so the request only starts it;
+        # the client is charged for all the rounds it will play
+        plan = plan_request('live', rounds, cost=estimate_group_cost(groups, rounds))
+        plan["path"] = 'inline'
+
+        def run():
+            room = create_room(groups, **options)
+            snapshot = room.snapshot()
+            snapshot["stream_url"] = f"/live/{room.id}/stream"
+            return snapshot
+
+        response = run_planned(plan, run)
+        response.status_code = 201
+        return response
+
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Unexpected error in live create endpoint: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/live', methods=['GET'])
+def live_rooms():
+    """Open live rooms"""
+    return jsonify({"rooms": list_rooms()})
+
+
+@app.route('/live/<room_id>', methods=['GET'])
+def live_room(room_id):
+    """Latest state of a live room"""
+    room = get_room(room_id)
+    if room is None:
+        return jsonify({"error": "Live room not found"}), 404
+    return jsonify(room.snapshot())
+
+
+@app.route('/live/<room_id>', methods=['DELETE'])
+def live_stop(room_id):
+    """Stop a live room"""
+    room = get_room(room_id)
+    if room is None:
+        return jsonify({"error": "Live room not found"}), 404
+    room.stop()
+    return jsonify({"stopped": room_id})
+
+
+@app.route('/live/<room_id>/stream', methods=['GET'])
+def live_stream(room_id):
+    """
+    Server-sent events of a live room: a "snapshot" event, then one "round"
+    event per round (id = round number, so reconnects resume from
+    Last-Event-ID)
+    """
+    room = get_room(room_id)
+    if room is None:
+        return jsonify({"error": "Live room not found"}), 404
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id is not None else None
+        subscriber = room.subscribe(last_event_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def events():
+        try:
+            yield sse_event('snapshot', room.snapshot())
+            while True:
+                try:
+                    message = subscriber.get(timeout=LIVE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    yield sse_event('end', {"round": room.round})
+                    return
+                yield message
+        finally:
+            room.unsubscribe(subscriber)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of a background simulation job, with its result once done"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job)
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "service": "aviator-simulator"}), 200
+    return jsonify({"status": "healthy", "service": "aviator-simulator",
+                    "load": admission_status()}), 200
 
 
 @app.errorhandler(404)
@@ -168,4 +1035,7 @@ def method_not_allowed(error):
 
 
 if __name__ == '__main__':
+    # Parallel requests share one worker pool; under a WSGI server it
+    # starts with the first request that needs it
+    start_pool()
     app.run(debug=True, port=8000, host='0.0.0.0')
\ No newline at end of file
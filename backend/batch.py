@@ -0,0 +1,706 @@
+import json
+import logging
+import numpy as np
+
+from strategy_dsl import compile_rules, table_stakes
+from money import CENTS, array_to_cents, percent_stake_cents, win_cents
+from distributions import crash_from_uniform, loss_threshold, load_distribution
+
+logger = logging.getLogger(__name__)
+
+# Strategies the vectorized engine can run
+BATCH_STRATEGIES = ('early', 'mid', 'high', 'dual', 'ladder', 'martingale', 'paroli',
+                    'fixed_percent', 'target_profit', 'custom', 'rules')
+
+# Strategies with no bankroll state: every round is independent of the last
+STATELESS_STRATEGIES = ('early', 'mid', 'high', 'dual', 'ladder')
+
+# Simultaneous bets a ladder may place per round
+MAX_LADDER_RUNGS = 20
+
+# Ladders up to this many rungs count the cashouts a crash reaches with one
+# comparison pass per rung, which beats a binary search per crash; longer
+# ladders use the search
+LADDER_SEARCH_RUNGS = 16
+
+# Strategies whose bets never depend on the balance, so a path is the same
+# for every bankroll up to the round where the balance cannot cover the bet
+BANKROLL_INVARIANT_STRATEGIES = ('martingale', 'paroli', 'target_profit')
+
+# Cashout targets used by simulate_strategy for the fixed strategies
+FIXED_CASHOUTS = {'early': 1.5, 'mid': 2.5, 'high': 10.0}
+
+NETWORK_ERROR_RATE = 0.05
+MIN_NETWORK_DELAY = 0.05
+MAX_NETWORK_DELAY = 0.5
+
+# Upper bound on trials x rounds elements generated per block of streams
+DEFAULT_CHUNK_ELEMENTS = 1 << 21
+
+# Parameters holding amounts of money, converted to int64 cents in cents mode
+MONEY_PARAMS = ('bet', 'bet1', 'bet2', 'base_bet', 'bankroll', 'target_profit', 'min_bet',
+                'max_bet', 'max_bet_custom', 'stop_loss', 'take_profit', 'bet_amounts',
+                'stakes')
+
+
+def generate_crash_batch(rng, size, distribution=None):
+    """Vectorized counterpart of simulator.generate_crash_multiplier"""
+    if distribution is not None:
+        return distribution.sample(rng, size)
+    return crash_from_uniform(rng.random(size))
+
+
+def win_probability(cashout):
+    """Probability that a bet cashed out at cashout wins"""
+    return 0.99 - loss_threshold(cashout)
+
+
+def expected_return(cashout, distribution=None):
+    """Analytic expected P&L per unit staked at cashout, under distribution if given"""
+    if distribution is not None:
+        return distribution.expected_return(cashout)
+    return cashout * win_probability(cashout) - 1.0
+
+
+def tilt_uniforms(v, cashout, loss_probability):
+    """
+    Importance-sample uniforms towards losses at cashout
+
+    Uses the inverse CDF of a tilted distribution that keeps the shape of
+    the crash distribution inside the loss and win regions but gives the
+    loss region probability loss_probability.
+
+    Returns:
+        Tuple of (uniforms under the tilted law, log likelihood ratios)
+    """
+    a = float(loss_threshold(cashout))
+    q = a + 0.01
+    p = 1.0 - q
+    q_tilt = loss_probability
+    p_tilt = 1.0 - q_tilt
+
+    first_loss = q_tilt * a / q
+    win_end = first_loss + p_tilt
+    r = np.where(
+        v < first_loss, v * q / q_tilt,
+        np.where(v < win_end, a + (v - first_loss) * p / p_tilt,
+                 0.99 + (v - win_end) * q / q_tilt))
+    r = np.minimum(r, np.nextafter(1.0, 0.0))
+    lost = (r < a) | (r >= 0.99)
+    log_lr = np.where(lost, np.log(q / q_tilt), np.log(p / p_tilt))
+    return r, log_lr
+
+
+def _uniforms(rng, trials, rounds, antithetic):
+    """Uniform draws, mirrored as (u, 1 - u) across trial halves when antithetic"""
+    if not antithetic:
+        return rng.random((trials, rounds))
+    half = (trials + 1) // 2
+    u = rng.random((half, rounds))
+    return np.concatenate([u, 1.0 - u])[:trials]
+
+
+def generate_streams(rng, trials, rounds, realistic_conditions=True,
+                     network_delay=True, error_simulation=True,
+                     antithetic=False, tilt_cashout=None, tilt_loss_probability=None,
+                     tilt_after_losses=0, distribution=None):
+    """
+    Draw crash multipliers and network outcomes for a block of rounds
+
+    Args:
+        antithetic: Pair trial i with trial i + ceil(trials / 2) using
+            mirrored crash uniforms
+        tilt_cashout: Cashout target that defines losses for importance sampling
+        tilt_loss_probability: Per-round loss probability under the tilted
+            law; importance sampling is off when None
+        tilt_after_losses: Loss streak from which a trial samples the
+            tilted law; shorter streaks use the untilted crash
+        distribution: Crash distribution (see distributions.py); the
+            simulator formula when None
+
+    Returns:
+        Dictionary with "crash", "net_ok", "delay", "tilted_crash" and
+        "log_lr" arrays of shape (trials, rounds). "net_ok" and "delay" are
+        None when network conditions are not simulated, the tilt arrays when
+        sampling is untilted.
+
+    Raises:
+        ValueError: If importance sampling is combined with a distribution
+    """
+    if tilt_loss_probability is not None and distribution is not None:
+        raise ValueError("Importance sampling requires the default crash distribution")
+    u = _uniforms(rng, trials, rounds, antithetic)
+    crash = crash_from_uniform(u) if distribution is None else distribution.from_uniform(u)
+    streams = {"crash": crash, "net_ok": None, "delay": None,
+               "tilted_crash": None, "log_lr": None, "tilt_after_losses": tilt_after_losses}
+    if tilt_loss_probability is not None:
+        tilted, streams["log_lr"] = tilt_uniforms(u, tilt_cashout, tilt_loss_probability)
+        streams["tilted_crash"] = crash_from_uniform(tilted)
+
+    if not (realistic_conditions and network_delay):
+        return streams
+
+    if error_simulation:
+        net_ok = rng.random((trials, rounds)) >= NETWORK_ERROR_RATE
+    else:
+        net_ok = np.ones((trials, rounds), dtype=bool)
+    streams["net_ok"] = net_ok
+    streams["delay"] = rng.uniform(MIN_NETWORK_DELAY, MAX_NETWORK_DELAY, (trials, rounds))
+    return streams
+
+
+def parse_bet_amounts(bet_sequence):
+    """Parse a comma-separated bet sequence into a float array"""
+    bet_amounts = [float(x.strip()) for x in bet_sequence.split(',') if x.strip()]
+    if not bet_amounts:
+        bet_amounts = [1.0]  # fallback
+    return np.asarray(bet_amounts, dtype=float)
+
+
+def parse_ladder(rungs):
+    """
+    Validate the rungs of a cashout ladder
+
+    Args:
+        rungs: List (or JSON list) of [stake, cashout] pairs or objects
+            with "stake" and "cashout"
+
+    Returns:
+        List of [stake, cashout] float pairs
+
+    Raises:
+        ValueError: If the ladder is malformed
+    """
+    if isinstance(rungs, str):
+        try:
+            rungs = json.loads(rungs)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid rungs JSON: {e}")
+    if not isinstance(rungs, list) or not 1 <= len(rungs) <= MAX_LADDER_RUNGS:
+        raise ValueError(f"rungs must be a list of 1 to {MAX_LADDER_RUNGS} [stake, cashout] pairs")
+
+    parsed = []
+    for n, rung in enumerate(rungs):
+        if isinstance(rung, dict):
+            rung = [rung.get('stake'), rung.get('cashout')]
+        try:
+            stake, cashout = (float(x) for x in rung)
+        except (TypeError, ValueError):
+            raise ValueError(f"rungs[{n}] must be a [stake, cashout] pair")
+        if not 0.01 <= stake <= 100000:
+            raise ValueError(f"rungs[{n}]: stake must be between 0.01 and 100000")
+        if not 1.01 <= cashout <= 1000:
+            raise ValueError(f"rungs[{n}]: cashout must be between 1.01 and 1000")
+        parsed.append([stake, cashout])
+    return parsed
+
+
+def ladder_table(legs, cents=False):
+    """
+    Per-round P&L of simultaneous bets by the number of cashouts reached
+
+    A round whose crash reaches the k lowest cashouts pays table[k], so a
+    whole block of rounds settles with one lookup per crash:
+    table[rungs_paid(cashouts, crash)]. Entries add the legs up in their
+    given order, as settling them one by one would.
+
+    Args:
+        legs: (stake, cashout) pairs, stakes after betting limits
+        cents: Whether stakes are int64 cents
+
+    Returns:
+        Tuple of (ascending cashouts, table of len(legs) + 1 P&Ls)
+    """
+    order = sorted(range(len(legs)), key=lambda i: legs[i][1])
+    rank = np.empty(len(legs), dtype=np.int64)
+    rank[order] = np.arange(len(legs))
+    cashouts = np.array([legs[i][1] for i in order], dtype=float)
+
+    table = []
+    for k in range(len(legs) + 1):
+        pnl = 0
+        for i, (stake, cashout) in enumerate(legs):
+            if rank[i] < k:
+                pnl = pnl + (win_cents(stake, cashout) if cents else (cashout - 1) * stake)
+            else:
+                pnl = pnl - stake
+        table.append(pnl)
+    return cashouts, np.array(table)
+
+
+def rungs_paid(cashouts, crash):
+    """Number of the ascending cashouts each crash reaches, as np.searchsorted(side='right')"""
+    if len(cashouts) > LADDER_SEARCH_RUNGS:
+        return np.searchsorted(cashouts, crash, side='right')
+    paid = np.zeros(np.shape(crash), dtype=np.int8)
+    for cashout in cashouts:
+        paid += crash >= cashout
+    return paid
+
+
+def build_batch_params(strategy, bet=1.0, bankroll=100, target_profit=50, percent_bet=5,
+                       min_bet=0.10, max_bet=1000.0, custom_params=None, cents=False,
+                       crash_distribution=None):
+    """
+    Translate simulate_strategy arguments into batch engine parameters
+
+    Mirrors the routing in simulator.simulate_strategy so that a batch run
+    and a single run of the same request play the same strategy. With cents
+    set, balances and bets are int64 cents (see money.py) and the state's
+    balances, stakes and P&L are in cents as well. A crash_distribution spec
+    (see distributions.normalize_distribution) is built into
+    "distribution" for the streams of the run.
+
+    Raises:
+        ValueError: If the strategy is unknown or custom parameters are missing
+    """
+    if strategy not in BATCH_STRATEGIES:
+        raise ValueError(f"Invalid strategy: {strategy}")
+
+    params = {"strategy": strategy, "min_bet": min_bet, "max_bet": max_bet}
+
+    if strategy in FIXED_CASHOUTS:
+        params.update(bet=bet, cashout=FIXED_CASHOUTS[strategy], bankroll=0.0)
+    elif strategy == 'dual':
+        params.update(bet1=bet, bet2=bet, cashout1=1.5, cashout2=5.0, bankroll=0.0)
+    elif strategy == 'ladder':
+        if not custom_params or 'rungs' not in custom_params:
+            raise ValueError("Ladder strategy requires rungs")
+        rungs = np.asarray(parse_ladder(custom_params['rungs']), dtype=float)
+        params.update(stakes=rungs[:, 0], cashouts=rungs[:, 1], bankroll=0.0)
+    elif strategy in ('martingale', 'paroli'):
+        params.update(base_bet=bet, cashout=2.0, bankroll=bankroll)
+    elif strategy == 'fixed_percent':
+        params.update(percent=percent_bet, cashout=2.0, bankroll=bankroll)
+    elif strategy == 'target_profit':
+        params.update(base_bet=bet, target_profit=target_profit, cashout=2.0, bankroll=bankroll)
+    elif strategy == 'custom':
+        if not custom_params:
+            raise ValueError("Custom strategy requires additional parameters")
+        params.update(
+            bankroll=bankroll,
+            cashout=custom_params['cashout_target'],
+            bet_amounts=parse_bet_amounts(custom_params['bet_sequence']),
+            max_bet_custom=custom_params['max_bet'],
+            stop_loss=custom_params['stop_loss'],
+            take_profit=custom_params['take_profit'],
+            progression_type=custom_params['progression_type'],
+        )
+    elif strategy == 'rules':
+        if not custom_params or 'rules' not in custom_params:
+            raise ValueError("Rules strategy requires a rules specification")
+        table = compile_rules(custom_params['rules'])
+        params.update(bankroll=bankroll, table=table,
+                      cashout=table["cashout"][table["initial"]])
+
+    if crash_distribution is not None:
+        params["distribution"] = load_distribution(crash_distribution)
+    if cents:
+        params = _cents_params(params)
+    return params
+
+
+def _cents_params(params):
+    """Convert the amounts in batch parameters to int64 cents"""
+    params = dict(params, cents=True)
+    for key in MONEY_PARAMS:
+        if key in params:
+            params[key] = array_to_cents(params[key])
+            if params[key].ndim == 0:
+                params[key] = int(params[key])
+
+    if "table" in params:
+        table = dict(params["table"])
+        # Percent stakes become hundredths of a percent, fixed stakes cents
+        table["stake"] = array_to_cents(table["stake"])
+        table["balance_breaks"] = array_to_cents(table["balance_breaks"])
+        for key in ('max_bet', 'stop_loss', 'take_profit'):
+            if table[key] is not None:
+                table[key] = int(array_to_cents(table[key]))
+        table["cents"] = True
+        params["table"] = table
+    return params
+
+
+def min_stake(params):
+    """Smallest stake that can be placed, in the units of the parameters"""
+    return 1 if params.get("cents") else 0.01
+
+
+def money_scale(params):
+    """Divisor that turns state balances and stakes into currency amounts"""
+    return CENTS if params.get("cents") else 1
+
+
+def init_batch_state(params, trials):
+    """Create the per-trial state arrays for a batch run"""
+    dtype = np.int64 if params.get("cents") else float
+    bankroll = np.asarray(params.get("bankroll", 0.0), dtype=dtype)
+    strategy = params["strategy"]
+
+    if strategy == 'custom':
+        first_bet = params["bet_amounts"][0]
+    else:
+        first_bet = params.get("base_bet", 0.0)
+
+    return {
+        "balance": np.broadcast_to(bankroll, (trials,)).copy(),
+        "bet": np.broadcast_to(np.asarray(first_bet, dtype=dtype), (trials,)).copy(),
+        "profit": np.zeros(trials, dtype=dtype),
+        "loss_streak": np.zeros(trials, dtype=np.int64),
+        "win_streak": np.zeros(trials, dtype=np.int64),
+        "max_loss_streak": np.zeros(trials, dtype=np.int64),
+        "sequence_index": np.zeros(trials, dtype=np.int64),
+        "rule_state": np.full(trials, params["table"]["initial"] if strategy == 'rules' else 0,
+                              dtype=np.int64),
+        "active": np.ones(trials, dtype=bool),
+        "ruin": np.zeros(trials, dtype=bool),
+        "target_reached": np.zeros(trials, dtype=bool),
+        "stop_round": np.full(trials, -1, dtype=np.int64),
+        "rounds_played": np.zeros(trials, dtype=np.int64),
+        "network_errors": np.zeros(trials, dtype=np.int64),
+        "bet_limit_hits": np.zeros(trials, dtype=np.int64),
+        "total_delay": np.zeros(trials),
+        "wagered": np.zeros(trials, dtype=dtype),
+        # Closest approach to ruin: smallest balance minus stake seen before betting
+        "min_headroom": np.full(trials, np.inf),
+        # Sum of realized minus analytic expected P&L (control variate)
+        "control": np.zeros(trials),
+        # Log likelihood ratio of the crash draws used (importance sampling)
+        "log_weight": np.zeros(trials),
+        "round": 0,
+    }
+
+
+def _stop(state, mask, flag):
+    """Deactivate the trials in mask and record why and when they stopped"""
+    if not mask.any():
+        return
+    state[flag] |= mask
+    state["active"] &= ~mask
+    state["stop_round"][mask] = state["round"]
+
+
+def _apply_network(state, active, net_ok, delay):
+    """Account for network errors and delays; return the lanes that play"""
+    if net_ok is None:
+        return active
+    state["total_delay"] += np.where(active & net_ok, delay, 0.0)
+    state["network_errors"] += active & ~net_ok
+    return active & net_ok
+
+
+def _update_streaks(state, wins, losses):
+    """Advance win/loss streak counters for the lanes that played"""
+    state["loss_streak"] = np.where(losses, state["loss_streak"] + 1,
+                                    np.where(wins, 0, state["loss_streak"]))
+    state["win_streak"] = np.where(wins, state["win_streak"] + 1,
+                                   np.where(losses, 0, state["win_streak"]))
+    np.maximum(state["max_loss_streak"], state["loss_streak"], out=state["max_loss_streak"])
+
+
+def _step(params, state, crash, net_ok, delay, tilted_crash, log_lr, tilt_after_losses):
+    """Advance every active trial of a stateful strategy by one round"""
+    strategy = params["strategy"]
+    balance = state["balance"]
+
+    # Stop conditions checked before the bet is placed
+    if strategy == 'target_profit':
+        _stop(state, state["active"] & (state["profit"] >= params["target_profit"]),
+              "target_reached")
+    elif strategy == 'custom':
+        _stop(state, state["active"] & (balance <= params["stop_loss"]), "ruin")
+        _stop(state, state["active"] & (balance >= params["take_profit"]), "target_reached")
+    elif strategy == 'rules':
+        table = params["table"]
+        if table["stop_loss"] is not None:
+            _stop(state, state["active"] & (balance <= table["stop_loss"]), "ruin")
+        if table["take_profit"] is not None:
+            _stop(state, state["active"] & (balance >= table["take_profit"]), "target_reached")
+
+    active = state["active"]
+    if not active.any():
+        return
+
+    # Desired bet for this round
+    if strategy in ('martingale', 'paroli'):
+        wanted = state["bet"]
+    elif strategy == 'fixed_percent':
+        if params.get("cents"):
+            wanted = percent_stake_cents(balance, params["percent"])
+        else:
+            wanted = np.round((params["percent"] / 100.0) * balance, 2)
+    elif strategy == 'target_profit':
+        wanted = np.broadcast_to(np.asarray(params["base_bet"], dtype=balance.dtype), balance.shape)
+    elif strategy == 'rules':
+        wanted = table_stakes(params["table"], state["rule_state"], balance)
+    else:  # custom
+        wanted = np.minimum(np.minimum(state["bet"], params["max_bet_custom"]), balance)
+        state["bet"] = np.where(active, wanted, state["bet"])
+
+    actual = np.clip(wanted, params["min_bet"], params["max_bet"])
+    state["bet_limit_hits"] += active & (actual != wanted)
+
+    # Ruin check
+    if strategy in ('fixed_percent', 'custom', 'rules'):
+        broke = active & ((actual < min_stake(params)) | (balance < actual))
+    else:
+        broke = active & (balance < actual)
+    np.minimum(state["min_headroom"], np.where(active, balance - actual, np.inf),
+               out=state["min_headroom"])
+    _stop(state, broke, "ruin")
+    active = state["active"]
+
+    play = _apply_network(state, active, net_ok, delay)
+    state["rounds_played"] += play
+    state["wagered"] += np.where(play, actual, 0)
+
+    if tilted_crash is not None:
+        # State-dependent importance sampling: only trials deep enough into
+        # a loss streak draw from the tilted law
+        tilted = state["loss_streak"] >= tilt_after_losses
+        crash = np.where(tilted, tilted_crash, crash)
+        state["log_weight"] += np.where(play & tilted, log_lr, 0.0)
+
+    if strategy == 'rules':
+        cashout = params["table"]["cashout"][state["rule_state"]]
+    else:
+        cashout = params["cashout"]
+    won = crash >= cashout
+    wins = play & won
+    losses = play & ~won
+
+    if params.get("cents"):
+        pnl = np.where(won, win_cents(actual, cashout), -actual)
+    else:
+        pnl = np.where(won, (cashout - 1) * actual, -actual)
+    balance += np.where(play, pnl, 0)
+    expected = actual * expected_return(cashout, params.get("distribution"))
+    state["control"] += np.where(play, pnl - expected, 0.0)
+    if strategy == 'target_profit':
+        state["profit"] += np.where(play, pnl, 0)
+    _update_streaks(state, wins, losses)
+
+    # Progression for the next round
+    if strategy == 'martingale':
+        state["bet"] = np.where(wins, params["base_bet"],
+                                np.where(losses, state["bet"] * 2, state["bet"]))
+    elif strategy == 'paroli':
+        boosted = params["base_bet"] * 2 ** np.minimum(state["win_streak"], 3)
+        state["bet"] = np.where(wins, boosted,
+                                np.where(losses, params["base_bet"], state["bet"]))
+    elif strategy == 'custom':
+        last = len(params["bet_amounts"]) - 1
+        advanced = np.minimum(state["sequence_index"] + 1, last)
+        if params["progression_type"] == "win":
+            index = np.where(wins, advanced, np.where(losses, 0, state["sequence_index"]))
+        else:
+            index = np.where(losses, advanced, np.where(wins, 0, state["sequence_index"]))
+        state["sequence_index"] = index
+        state["bet"] = np.where(play, params["bet_amounts"][index], state["bet"])
+    elif strategy == 'rules':
+        moved = params["table"]["next"][state["rule_state"], won.astype(np.int64)]
+        state["rule_state"] = np.where(play, moved, state["rule_state"])
+
+
+def stateless_legs(params):
+    """(bet, cashout) pairs placed every round by a strategy without bankroll state"""
+    if params["strategy"] == 'dual':
+        return [(params["bet1"], params["cashout1"]), (params["bet2"], params["cashout2"])]
+    if params["strategy"] == 'ladder':
+        return list(zip(params["stakes"], params["cashouts"]))
+    return [(params["bet"], params["cashout"])]
+
+
+def stateless_stake(params):
+    """Total stake a stateless strategy places per round played, after limits"""
+    return sum(np.clip(bet, params["min_bet"], params["max_bet"]).item()
+               for bet, _ in stateless_legs(params))
+
+
+def _stateless_round(params):
+    """
+    Per-round settlement of a stateless strategy after bet limits
+
+    Returns:
+        Tuple of (sorted cashouts, P&L table indexed by rungs paid,
+        analytic expected P&L, whether a limit changed a bet)
+    """
+    legs = []
+    expected = 0.0
+    limited = False
+    for bet, cashout in stateless_legs(params):
+        actual = np.clip(bet, params["min_bet"], params["max_bet"])
+        limited = limited | (actual != bet)
+        legs.append((actual, cashout))
+        expected = expected + actual * expected_return(cashout, params.get("distribution"))
+    cashouts, table = ladder_table(legs, params.get("cents"))
+    return cashouts, table, expected, limited
+
+
+def _step_stateless(params, state, crash, net_ok, delay):
+    """
+    Advance a stateless strategy by one round, betting from the balance
+
+    Unlike _advance_stateless, a trial whose balance cannot cover the
+    round's total stake is ruined, as for the stateful strategies.
+    """
+    cashouts, table, expected, limited = _stateless_round(params)
+    stake = stateless_stake(params)
+    active = state["active"]
+    np.minimum(state["min_headroom"], np.where(active, state["balance"] - stake, np.inf),
+               out=state["min_headroom"])
+    _stop(state, active & (state["balance"] < stake), "ruin")
+    active = state["active"]
+    state["bet_limit_hits"] += active & np.asarray(limited)
+
+    play = _apply_network(state, active, net_ok, delay)
+    pnl = np.where(play, table.take(rungs_paid(cashouts, crash)), 0)
+    state["balance"] += pnl
+    state["rounds_played"] += play
+    state["wagered"] += np.where(play, stake, 0)
+    state["control"] += pnl - np.where(play, expected, 0.0)
+    _update_streaks(state, play & (pnl > 0), play & (pnl <= 0))
+
+
+def step_round(params, state, crash, net_ok=None, delay=None):
+    """
+    Advance every active trial by one round, betting from its balance
+
+    Stateful strategies play the round as in advance_batch. Stateless
+    strategies, which advance_batch settles as P&L from zero, place their
+    bets from state["balance"] here and are ruined when it cannot cover
+    them.
+
+    Args:
+        crash: Crash multiplier of every trial, shape (trials,)
+        net_ok: Whether each trial's bet went through, or None
+        delay: Network delay of each trial, or None
+    """
+    if params["strategy"] in STATELESS_STRATEGIES:
+        _step_stateless(params, state, crash, net_ok, delay)
+    else:
+        _step(params, state, crash, net_ok, delay, None, None, 0)
+    state["round"] += 1
+
+
+def _advance_stateless(params, state, crash, net_ok, delay, log_lr, record):
+    """Advance a strategy without bankroll state across a whole block at once"""
+    trials = state["balance"].shape[0]
+    rounds = crash.shape[1]
+
+    cashouts, table, expected, limited = _stateless_round(params)
+    pnl = np.broadcast_to(table.take(rungs_paid(cashouts, crash)), (trials, rounds))
+    if log_lr is None:
+        log_lr = np.zeros((1, rounds))
+
+    state["bet_limit_hits"] += rounds * np.asarray(limited, dtype=np.int64)
+    if net_ok is not None:
+        net_ok = np.broadcast_to(net_ok, (trials, rounds))
+        pnl = np.where(net_ok, pnl, 0)
+        state["network_errors"] += rounds - net_ok.sum(axis=1)
+        state["total_delay"] += np.where(net_ok, delay, 0.0).sum(axis=1)
+        played = net_ok.sum(axis=1)
+        state["log_weight"] += np.where(net_ok, log_lr, 0.0).sum(axis=1)
+    else:
+        played = rounds
+        state["log_weight"] += log_lr.sum(axis=1)
+    state["rounds_played"] += played
+    state["wagered"] += played * stateless_stake(params)
+    state["control"] += pnl.sum(axis=1) - played * expected
+
+    path = state["balance"][:, None] + np.cumsum(pnl, axis=1)
+    state["balance"][:] = path[:, -1]
+    state["round"] += rounds
+    return path if record else None
+
+
+def advance_batch(params, state, streams, record=False):
+    """
+    Advance a batch state through a block of rounds
+
+    Args:
+        params: Parameters from build_batch_params
+        state: State from init_batch_state, updated in place
+        streams: Dictionary of "crash", "net_ok", "delay" and optional
+            tilt arrays shaped (trials, rounds) as from generate_streams; a
+            leading dimension of 1 shares the stream across all trials
+        record: Return the balance of every trial after every round
+
+    Returns:
+        Array of balances shaped (trials, rounds) when record is set, else None.
+        Trials that have stopped keep their final balance.
+    """
+    crash, net_ok, delay = streams["crash"], streams["net_ok"], streams["delay"]
+    tilted_crash, log_lr = streams.get("tilted_crash"), streams.get("log_lr")
+    tilt_after_losses = streams.get("tilt_after_losses", 0)
+
+    if params["strategy"] in STATELESS_STRATEGIES:
+        if tilted_crash is not None:
+            crash = tilted_crash
+        return _advance_stateless(params, state, crash, net_ok, delay, log_lr, record)
+
+    trials = state["balance"].shape[0]
+    rounds = crash.shape[1]
+    path = np.empty((trials, rounds), dtype=state["balance"].dtype) if record else None
+
+    for j in range(rounds):
+        _step(params, state, crash[:, j],
+              None if net_ok is None else net_ok[:, j],
+              None if delay is None else delay[:, j],
+              None if tilted_crash is None else tilted_crash[:, j],
+              None if log_lr is None else log_lr[:, j],
+              tilt_after_losses)
+        state["round"] += 1
+        if record:
+            path[:, j] = state["balance"]
+
+    return path
+
+
+def primary_cashout(params):
+    """Cashout target that decides wins and losses for importance sampling"""
+    if params["strategy"] == 'ladder':
+        return float(params["cashouts"].min())
+    return params.get("cashout", params.get("cashout1"))
+
+
+def simulate_batch(params, trials, rounds, rng=None, realistic_conditions=True,
+                   network_delay=True, error_simulation=True,
+                   chunk_elements=DEFAULT_CHUNK_ELEMENTS,
+                   antithetic=False, tilt_loss_probability=None, tilt_after_losses=0,
+                   record=False, state=None):
+    """
+    Run many independent trials of a strategy with vectorized state
+
+    Streams are drawn in blocks of rounds so memory stays bounded by
+    chunk_elements regardless of trials x rounds. See generate_streams for
+    the variance-reduction options.
+
+    Args:
+        state: Optional state of an earlier run to continue for another
+            rounds rounds
+
+    Returns:
+        Final batch state (see init_batch_state). With record set, "path"
+        holds every trial's balance after each round simulated.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if state is None:
+        state = init_batch_state(params, trials)
+    chunk_rounds = max(1, chunk_elements // max(1, trials))
+
+    paths = []
+    done = 0
+    while done < rounds and state["active"].any():
+        n = min(chunk_rounds, rounds - done)
+        streams = generate_streams(rng, trials, n, realistic_conditions,
+                                   network_delay, error_simulation, antithetic,
+                                   primary_cashout(params), tilt_loss_probability,
+                                   tilt_after_losses, params.get("distribution"))
+        paths.append(advance_batch(params, state, streams, record))
+        done += n
+
+    if record:
+        state["path"] = np.concatenate(paths, axis=1) if paths else np.empty((trials, 0))
+    return state
@@ -0,0 +1,129 @@
+import os
+import hmac
+import json
+import zlib
+import base64
+import random
+import hashlib
+from array import array
+
+import numpy as np
+
+from fair import HashChainRandom, load_chain
+
+CHECKPOINT_VERSION = 1
+
+# Key checkpoint tokens are signed with, so a client cannot edit the
+# parameters or state it resumes from. Set it when several server processes
+# must accept each other's tokens or tokens must outlive a restart.
+CHECKPOINT_SECRET = os.environ.get('CHECKPOINT_SECRET', '').encode('utf-8') or os.urandom(32)
+
+
+def random_state(rng):
+    """
+    Serializable position of a random.Random, or an integer block seed as is
+
+    Hash-chain sources also record their chain and next game.
+    """
+    if isinstance(rng, int):
+        return {"seed": rng}
+    version, internal, gauss_next = rng.getstate()
+    packed = base64.b64encode(array('I', internal).tobytes()).decode('ascii')
+    saved = {"mt": [version, packed, gauss_next]}
+    if isinstance(rng, HashChainRandom):
+        saved["chain"] = dict(rng.chain["spec"], position=rng.position)
+    return saved
+
+
+def restore_random(saved):
+    """Rebuild the random source saved by random_state"""
+    if "seed" in saved:
+        return int(saved["seed"])
+    version, packed, gauss_next = saved["mt"]
+    internal = array('I')
+    internal.frombytes(base64.b64decode(packed))
+    if "chain" in saved:
+        spec = saved["chain"]
+        chain = load_chain(spec["server_seed"], spec["length"], spec["house_edge"])
+        rng = HashChainRandom(chain, spec["position"])
+    else:
+        rng = random.Random()
+    rng.setstate((version, tuple(internal), gauss_next))
+    return rng
+
+
+def _plain(value):
+    """JSON-compatible copy of a state value (NumPy arrays and scalars included)"""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return {"array": value.tolist(), "dtype": value.dtype.str}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _restore(value):
+    """Inverse of _plain"""
+    if isinstance(value, dict):
+        if set(value) == {"array", "dtype"}:
+            return np.asarray(value["array"], dtype=value["dtype"])
+        return {k: _restore(v) for k, v in value.items()}
+    return value
+
+
+def _signature(body):
+    """URL-safe HMAC-SHA256 of a token body under CHECKPOINT_SECRET"""
+    digest = hmac.new(CHECKPOINT_SECRET, body.encode('ascii'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+
+def encode_checkpoint(payload):
+    """
+    Pack a checkpoint into a URL-safe token
+
+    The payload holds the strategy parameters, the strategy's state, the
+    random generator position and the number of rounds simulated so far.
+    The token is signed with CHECKPOINT_SECRET.
+    """
+    data = json.dumps(_plain(payload), separators=(',', ':')).encode('utf-8')
+    body = base64.urlsafe_b64encode(zlib.compress(data, 9)).decode('ascii')
+    return f"{body}.{_signature(body)}"
+
+
+def decode_checkpoint(token):
+    """
+    Unpack a token made by encode_checkpoint
+
+    Raises:
+        ValueError: If the token is malformed, not signed by this server or
+            from another version
+    """
+    body, _, signature = token.rpartition('.')
+    try:
+        signed = hmac.compare_digest(signature.encode('ascii'), _signature(body).encode('ascii'))
+    except UnicodeError:
+        signed = False
+    if not signed:
+        raise ValueError("Invalid checkpoint: bad signature")
+    try:
+        payload = json.loads(zlib.decompress(base64.urlsafe_b64decode(body.encode('ascii'))))
+    except (ValueError, zlib.error, UnicodeError) as e:
+        raise ValueError(f"Invalid checkpoint: {e}")
+    if not isinstance(payload, dict) or payload.get("version") != CHECKPOINT_VERSION:
+        raise ValueError("Invalid checkpoint: unsupported version")
+    return _restore(payload)
+
+
+def checkpoint_chain(token):
+    """
+    Hash-chain spec the run in a checkpoint token draws its crashes from
+
+    Returns:
+        Dictionary with server_seed, length and house_edge, or None
+
+    Raises:
+        ValueError: If the token is invalid (see decode_checkpoint)
+    """
+    spec = decode_checkpoint(token)["rng"].get("chain")
+    return spec and {key: spec[key] for key in ("server_seed", "length", "house_edge")}
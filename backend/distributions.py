@@ -0,0 +1,430 @@
+import json
+import math
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from fair import DEFAULT_HOUSE_EDGE
+
+# Crash multiplier distributions
+#
+# Every distribution maps a uniform on [0, 1) to a multiplier, so the batch
+# engine keeps drawing one uniform per round whatever the law (antithetic
+# pairs and common random numbers work unchanged) and the scalar simulator
+# can feed it random.Random draws. Sampling structures (inverse-CDF tables,
+# alias tables) are built once per spec and cached, so a distribution costs
+# a few vectorized operations per block of rounds.
+
+CRASH_DISTRIBUTIONS = ('default', 'house_edge', 'pareto', 'lognormal', 'empirical')
+
+DEFAULT_EMPIRICAL_BINS = 256
+MAX_EMPIRICAL_BINS = 100_000
+MAX_CRASH_SAMPLES = 1_000_000
+MAX_CRASH = 1_000_000.0
+
+# Points of tabulated inverse CDFs (equally spaced in probability) and the
+# standard deviations tabulated normal CDFs span
+INVERSE_CDF_POINTS = 65537
+INVERSE_CDF_SPAN = 8.5
+
+# Distributions kept built in this process
+MAX_CACHED_DISTRIBUTIONS = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def crash_from_uniform(r):
+    """Map uniforms on [0, 1) to crash multipliers (simulator formula)"""
+    crash = np.maximum(1.01, 1.0 / (1.0 - r))
+    crash[r >= 0.99] = 1.0
+    return crash
+
+
+def loss_threshold(cashout):
+    """Largest uniform that still crashes below cashout (ignoring the r >= 0.99 tail)"""
+    cashout = np.asarray(cashout, dtype=float)
+    return np.where(cashout <= 1.01, 0.0, np.clip(1.0 - 1.0 / cashout, 0.0, 0.99))
+
+
+class CrashDistribution:
+    """
+    Law of the crash multiplier, sampled through a map from uniforms
+
+    Subclasses implement _from_uniform and _survival on arrays; the
+    optional max_crash cap is applied here.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.max_crash = spec.get("max_crash")
+
+    def from_uniform(self, u):
+        """Crash multipliers of an array of uniforms on [0, 1)"""
+        crash = self._from_uniform(np.asarray(u, dtype=float))
+        if self.max_crash is not None:
+            np.minimum(crash, self.max_crash, out=crash)
+        return crash
+
+    def sample(self, rng, size):
+        """Draw an array of crash multipliers from a NumPy generator"""
+        return self.from_uniform(rng.random(size))
+
+    def crash(self, r):
+        """Crash multiplier of a single uniform"""
+        return float(self.from_uniform(np.array([r]))[0])
+
+    def survival(self, m):
+        """Probability that the crash reaches at least m (a bet cashed out at m wins)"""
+        m = np.asarray(m, dtype=float)
+        p = self._survival(m)
+        if self.max_crash is not None:
+            p = np.where(m > self.max_crash, 0.0, p)
+        return p
+
+    def expected_return(self, cashout):
+        """Expected P&L per unit staked at cashout"""
+        return cashout * self.survival(cashout) - 1.0
+
+
+class DefaultCrash(CrashDistribution):
+    """The simulator's formula: 1% instant crashes, otherwise max(1.01, 1 / (1 - r))"""
+
+    def _from_uniform(self, u):
+        return crash_from_uniform(u)
+
+    def crash(self, r):
+        # Plain floats keep the scalar simulator fast
+        if r >= 0.99:
+            return 1.0
+        crash = max(1.01, 1 / (1 - r))
+        return crash if self.max_crash is None else min(crash, self.max_crash)
+
+    def _survival(self, m):
+        return np.where(m <= 1.0, 1.0, 0.99 - loss_threshold(m))
+
+
+class HouseEdgeCrash(CrashDistribution):
+    """
+    Multipliers in hundredths with P(crash >= m) = (1 - house_edge) / m
+
+    The rule of hash-chain games (see fair.crash_hundredths), with the
+    uniform taking the place of the game hash.
+    """
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.house_edge = spec["house_edge"]
+
+    def _from_uniform(self, u):
+        crash = np.floor(100.0 * (1.0 - self.house_edge) / (1.0 - u))
+        return np.maximum(crash, 100.0) / 100.0
+
+    def _survival(self, m):
+        # Multipliers are whole hundredths, so reaching m means reaching the
+        # next hundredth up
+        hundredths = np.maximum(np.ceil(np.round(m * 100.0, 6)) / 100.0, 1.0)
+        return np.where(m <= 1.0, 1.0, np.minimum(1.0, (1.0 - self.house_edge) / hundredths))
+
+
+class ParetoCrash(CrashDistribution):
+    """Instant crashes with probability instant, otherwise P(crash >= m) = m^-alpha"""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.alpha = spec["alpha"]
+        self.instant = spec["instant"]
+
+    def _from_uniform(self, u):
+        tail = np.maximum((1.0 - u) / (1.0 - self.instant), 1e-300)
+        return np.where(u < self.instant, 1.0, np.minimum(tail ** (-1.0 / self.alpha), MAX_CRASH))
+
+    def _survival(self, m):
+        return np.where(m <= 1.0, 1.0, (1.0 - self.instant) * np.maximum(m, 1.0) ** -self.alpha)
+
+
+def inverse_cdf_table(values, cdf, points=INVERSE_CDF_POINTS):
+    """
+    Inverse of a tabulated CDF at equally spaced probabilities
+
+    Args:
+        values: Increasing grid of values
+        cdf: CDF at values, from 0 to 1
+
+    Returns:
+        Array of points quantiles, the k-th at probability k / (points - 1)
+    """
+    return np.interp(np.linspace(0.0, 1.0, points), cdf, values)
+
+
+def interpolate_quantiles(table, p):
+    """
+    Quantiles at probabilities p from an inverse_cdf_table
+
+    The table is equally spaced in probability, so each lookup is an index
+    computation and one linear interpolation, with no search.
+    """
+    position = np.clip(p, 0.0, 1.0) * (len(table) - 1)
+    index = np.minimum(position.astype(np.int64), len(table) - 2)
+    fraction = position - index
+    return table[index] + fraction * (table[index + 1] - table[index])
+
+
+class LogNormalCrash(CrashDistribution):
+    """
+    Instant crashes with probability instant, otherwise 1 + exp(N(mu, sigma^2))
+
+    The normal inverse CDF has no closed form, so the CDF of the log-excess
+    is tabulated once over INVERSE_CDF_SPAN standard deviations and inverted
+    into an inverse_cdf_table; draws interpolate linearly within it and
+    survival probabilities are read from the same piecewise-linear law.
+    """
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.instant = spec["instant"]
+        mu, sigma = spec["mu"], spec["sigma"]
+        x = np.linspace(mu - INVERSE_CDF_SPAN * sigma, mu + INVERSE_CDF_SPAN * sigma,
+                        INVERSE_CDF_POINTS)
+        erf = np.frompyfunc(math.erf, 1, 1)
+        cdf = 0.5 * (1.0 + erf((x - mu) / (sigma * math.sqrt(2.0))).astype(float))
+        cdf[0], cdf[-1] = 0.0, 1.0
+        self.quantiles = inverse_cdf_table(x, cdf)
+
+    def _from_uniform(self, u):
+        p = (u - self.instant) / (1.0 - self.instant)
+        crash = 1.0 + np.exp(interpolate_quantiles(self.quantiles, p))
+        return np.where(u < self.instant, 1.0, np.minimum(crash, MAX_CRASH))
+
+    def _survival(self, m):
+        with np.errstate(divide='ignore'):
+            x = np.log(np.maximum(m - 1.0, 0.0))
+        probability = np.linspace(0.0, 1.0, len(self.quantiles))
+        tail = 1.0 - np.interp(x, self.quantiles, probability, left=0.0, right=1.0)
+        return np.where(m <= 1.0, 1.0, (1.0 - self.instant) * tail)
+
+
+def alias_table(weights):
+    """
+    Walker alias table of a discrete distribution (Vose's construction)
+
+    Returns:
+        Tuple of (probability, alias) arrays: column i keeps outcome i with
+        probability[i] and otherwise yields alias[i]
+    """
+    n = len(weights)
+    scaled = np.asarray(weights, dtype=float) * n / np.sum(weights)
+    probability = np.ones(n)
+    alias = np.arange(n)
+    small = [i for i in range(n) if scaled[i] < 1.0]
+    large = [i for i in range(n) if scaled[i] >= 1.0]
+    while small and large:
+        s, g = small.pop(), large.pop()
+        probability[s] = scaled[s]
+        alias[s] = g
+        scaled[g] -= 1.0 - scaled[s]
+        (small if scaled[g] < 1.0 else large).append(g)
+    # Leftovers are 1 up to rounding
+    return probability, alias
+
+
+class EmpiricalCrash(CrashDistribution):
+    """
+    Crash multipliers resampled from recorded rounds
+
+    With at most bins distinct values the recorded values are resampled
+    exactly. Otherwise instant crashes (1.00) stay a point mass and the rest
+    are binned on a log scale, each bin drawn log-uniformly between its
+    edges. Either way outcomes come from a Walker alias table, so a draw is
+    O(1) however many outcomes there are; the part of the uniform left over
+    after choosing the alias column places the draw within its bin.
+    """
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        samples = np.asarray(spec["samples"], dtype=float)
+        values, counts = np.unique(np.maximum(samples, 1.0), return_counts=True)
+
+        if len(values) <= spec["bins"]:
+            self.low = self.high = values
+            weights = counts
+        else:
+            instant = values <= 1.0
+            rest = np.repeat(values[~instant], counts[~instant])
+            edges = np.geomspace(rest.min(), rest.max(), spec["bins"] + 1)
+            binned = np.bincount(np.minimum(np.searchsorted(edges, rest, side='right') - 1,
+                                            spec["bins"] - 1), minlength=spec["bins"])
+            self.low, self.high, weights = edges[:-1], edges[1:], binned
+            if instant.any():
+                self.low = np.concatenate([[1.0], self.low])
+                self.high = np.concatenate([[1.0], self.high])
+                weights = np.concatenate([[counts[instant].sum()], weights])
+
+        self.weights = np.asarray(weights, dtype=float) / np.sum(weights)
+        self.probability, self.alias = alias_table(self.weights)
+        # P(crash >= low of outcome k), outcomes in increasing order
+        self.tail = np.concatenate([np.cumsum(self.weights[::-1])[::-1], [0.0]])
+
+    def _from_uniform(self, u):
+        n = len(self.probability)
+        column = np.minimum((u * n).astype(np.int64), n - 1)
+        fraction = u * n - column
+        keep = fraction < self.probability[column]
+        outcome = np.where(keep, column, self.alias[column])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            within = np.where(keep, fraction / self.probability[column],
+                              (fraction - self.probability[column]) / (1.0 - self.probability[column]))
+        within = np.clip(np.nan_to_num(within), 0.0, 1.0)
+        low, high = self.low[outcome], self.high[outcome]
+        return low * (high / low) ** within
+
+    def _survival(self, m):
+        k = np.searchsorted(self.low, m, side='left')
+        # Outcomes from k up reach m; the bin below may straddle it
+        p = self.tail[k]
+        below = np.maximum(k - 1, 0)
+        low, high = self.low[below], self.high[below]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inside = np.clip(np.log(high / m) / np.log(high / low), 0.0, 1.0)
+        straddles = (k > 0) & (high > low) & (m < high)
+        return p + np.where(straddles, self.weights[below] * np.nan_to_num(inside), 0.0)
+
+
+_DISTRIBUTION_TYPES = {
+    'default': DefaultCrash,
+    'house_edge': HouseEdgeCrash,
+    'pareto': ParetoCrash,
+    'lognormal': LogNormalCrash,
+    'empirical': EmpiricalCrash,
+}
+
+
+def _fit(kind, samples):
+    """Parameters of a parametric law fitted to recorded multipliers by maximum likelihood"""
+    samples = np.asarray(samples, dtype=float)
+    above = samples[samples > 1.0]
+    if above.size < 2:
+        raise ValueError("Fitting a crash distribution needs at least 2 samples above 1.00")
+    instant = 1.0 - above.size / samples.size
+    if kind == 'pareto':
+        return {"alpha": float(above.size / np.log(above).sum()), "instant": instant}
+    log_excess = np.log(above - 1.0)
+    return {"mu": float(log_excess.mean()), "sigma": float(max(log_excess.std(), 1e-6)),
+            "instant": instant}
+
+
+def normalize_distribution(spec):
+    """
+    Complete and validate a crash distribution spec
+
+    Args:
+        spec: Dictionary with "type" (one of CRASH_DISTRIBUTIONS), optional
+            "max_crash" and per type: "house_edge"; "alpha" and "instant"
+            (pareto); "mu", "sigma" and "instant" (lognormal); "samples"
+            and "bins" (empirical). Pareto and lognormal parameters not
+            given are fitted to "samples", or "instant" is 0 without them.
+
+    Returns:
+        Spec with every parameter filled in (samples as a float array)
+
+    Raises:
+        ValueError: If the type is unknown or a parameter is out of range
+    """
+    kind = spec.get("type", "default")
+    if kind not in CRASH_DISTRIBUTIONS:
+        raise ValueError(f"crash distribution must be one of {', '.join(CRASH_DISTRIBUTIONS)}")
+    normalized = {"type": kind, "max_crash": spec.get("max_crash")}
+    if normalized["max_crash"] is not None and not 1.0 <= normalized["max_crash"] <= MAX_CRASH:
+        raise ValueError(f"max_crash must be between 1 and {MAX_CRASH:g}")
+
+    samples = spec.get("samples")
+    if samples is not None:
+        samples = np.asarray(samples, dtype=float).ravel()
+        if not 1 <= samples.size <= MAX_CRASH_SAMPLES:
+            raise ValueError(f"Between 1 and {MAX_CRASH_SAMPLES} crash samples are supported")
+        if not np.all((samples >= 1.0) & (samples <= MAX_CRASH)):
+            raise ValueError(f"Crash samples must be between 1 and {MAX_CRASH:g}")
+
+    if kind == 'house_edge':
+        normalized["house_edge"] = spec.get("house_edge", DEFAULT_HOUSE_EDGE)
+        if not 0 <= normalized["house_edge"] < 1:
+            raise ValueError("house_edge must be in [0, 1)")
+    elif kind in ('pareto', 'lognormal'):
+        keys = ('alpha', 'instant') if kind == 'pareto' else ('mu', 'sigma', 'instant')
+        given = {key: spec[key] for key in keys if spec.get(key) is not None}
+        if samples is None:
+            given.setdefault("instant", 0.0)
+        if len(given) < len(keys):
+            if samples is None:
+                raise ValueError(f"A {kind} crash distribution needs {', '.join(keys[:-1])} or samples")
+            given = dict(_fit(kind, samples), **given)
+        normalized.update({key: float(given[key]) for key in keys})
+        if not 0 <= normalized["instant"] < 1:
+            raise ValueError("instant must be in [0, 1)")
+        if kind == 'pareto' and normalized["alpha"] <= 0:
+            raise ValueError("alpha must be positive")
+        if kind == 'lognormal' and normalized["sigma"] <= 0:
+            raise ValueError("sigma must be positive")
+    elif kind == 'empirical':
+        if samples is None:
+            raise ValueError("An empirical crash distribution needs samples")
+        normalized["samples"] = samples
+        normalized["bins"] = int(spec.get("bins") or DEFAULT_EMPIRICAL_BINS)
+        if not 1 <= normalized["bins"] <= MAX_EMPIRICAL_BINS:
+            raise ValueError(f"bins must be between 1 and {MAX_EMPIRICAL_BINS}")
+    return normalized
+
+
+def load_distribution(spec):
+    """
+    Crash distribution of a spec, built once and cached
+
+    The last MAX_CACHED_DISTRIBUTIONS distributions built stay in the
+    process keyed by their normalized spec, so repeated requests for the
+    same distribution reuse its tables.
+
+    Raises:
+        ValueError: If the spec is invalid (see normalize_distribution)
+    """
+    spec = normalize_distribution(spec)
+    digest = hashlib.sha256(json.dumps({k: v for k, v in spec.items() if k != "samples"},
+                                       sort_keys=True).encode('utf-8'))
+    if "samples" in spec:
+        digest.update(spec["samples"].tobytes())
+    key = digest.hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    distribution = _DISTRIBUTION_TYPES[spec["type"]](spec)
+    with _cache_lock:
+        _cache[key] = distribution
+        if len(_cache) > MAX_CACHED_DISTRIBUTIONS:
+            _cache.popitem(last=False)
+    return distribution
+
+
+DEFAULT_DISTRIBUTION = DefaultCrash({"type": "default", "max_crash": None})
+
+
+class DistributionRandom(random.Random):
+    """
+    random.Random whose crash multipliers follow a crash distribution
+
+    generate_crash_multiplier maps the generator's next uniform through
+    the distribution; the generator state alone still determines the run,
+    so checkpoints of plain random.Random runs apply.
+    """
+
+    def __init__(self, distribution, source=None):
+        super().__init__()
+        self.distribution = distribution
+        if source is not None:
+            self.setstate(source.getstate())
+
+    def next_crash(self):
+        """Multiplier of the next round"""
+        return self.distribution.crash(self.random())
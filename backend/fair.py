@@ -0,0 +1,378 @@
+import os
+import json
+import time
+import random
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Provably-fair crash multipliers from a SHA-256 hash chain
+#
+# A chain of N games is generated from a server seed: g_0 = SHA256(seed)
+# and g_j = SHA256(g_{j-1}) over raw 32-byte digests. Games are played in
+# reverse, so game i uses hash g_{N-1-i} and the commitment published before
+# play is SHA256(hash of game 0). Anyone holding a revealed game hash can
+# check it hashes to the previous game's hash, while future games cannot be
+# predicted from past ones.
+#
+# A game hash maps to a multiplier with the usual house-edge rule: the
+# first 52 bits give X uniform in [0, 1) and the crash is
+# floor(100 * (1 - house_edge) / (1 - X)) / 100, at least 1.00, so a
+# multiplier of at least m comes up with probability (1 - house_edge) / m.
+
+DEFAULT_HOUSE_EDGE = 0.01
+MAX_CHAIN_LENGTH = 20_000_000
+
+CHAIN_CACHE_DIR = os.environ.get('CHAIN_CACHE_DIR',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), '.chains'))
+
+# Every CHECKPOINT_STRIDE-th generated hash is kept so any game's hash can be
+# recomputed with at most that many SHA-256 steps
+CHECKPOINT_STRIDE = 4096
+
+# Hashes generated per batch before they are mapped to multipliers
+CHAIN_BLOCK = 1 << 20
+
+# Chains kept loaded (memory-mapped) in this process
+MAX_LOADED_CHAINS = 8
+
+# Disk space the chain cache may use; least recently loaded chains go first
+MAX_CHAIN_CACHE_BYTES = int(os.environ.get('MAX_CHAIN_CACHE_BYTES', 2 * 1024 ** 3))
+
+_loaded = OrderedDict()
+_load_lock = threading.Lock()
+# Per-chain locks, so one chain being built does not hold up the others
+_chain_locks = {}
+
+
+def _seed_bytes(server_seed):
+    """Bytes hashed into the first link of a chain"""
+    if not isinstance(server_seed, str) or not server_seed:
+        raise ValueError("server_seed must be a non-empty string")
+    return server_seed.encode('utf-8')
+
+
+def _validate_spec(length, house_edge):
+    """Raise ValueError for chain lengths or house edges out of range"""
+    if not isinstance(length, int) or not 1 <= length <= MAX_CHAIN_LENGTH:
+        raise ValueError(f"Chain length must be between 1 and {MAX_CHAIN_LENGTH}")
+    if not 0 <= house_edge < 1:
+        raise ValueError("house_edge must be in [0, 1)")
+
+
+def crash_hundredths(hashes, house_edge=DEFAULT_HOUSE_EDGE):
+    """
+    Crash multipliers in hundredths for game hashes
+
+    Args:
+        hashes: uint8 array shaped (games, 32) of raw SHA-256 digests
+
+    Returns:
+        uint64 array of crash multipliers x 100
+    """
+    head = np.ascontiguousarray(hashes[:, :8]).view('>u8').ravel()
+    x = (head >> np.uint64(12)).astype(np.float64) / float(1 << 52)
+    crash = np.floor(100.0 * (1.0 - house_edge) / (1.0 - x))
+    return np.maximum(crash, 100.0).astype(np.uint64)
+
+
+def commitment_of(game_zero_hash):
+    """Public commitment of a chain: SHA-256 of its first game's hash (hex)"""
+    return hashlib.sha256(game_zero_hash).hexdigest()
+
+
+def build_chain(server_seed, length, house_edge=DEFAULT_HOUSE_EDGE):
+    """
+    Generate a hash chain and the multipliers of its games
+
+    Hashes are generated in blocks of CHAIN_BLOCK and each block is mapped
+    to multipliers with NumPy, so memory stays at the multipliers plus one
+    block of digests.
+
+    Returns:
+        Dictionary with "crashes" (uint64 hundredths in game order),
+        "checkpoints" (every CHECKPOINT_STRIDE-th generated hash) and the
+        hex "commitment"
+    """
+    _validate_spec(length, house_edge)
+    sha256 = hashlib.sha256
+    crashes = np.empty(length, dtype=np.uint64)
+    checkpoints = np.empty(((length - 1) // CHECKPOINT_STRIDE + 1, 32), dtype=np.uint8)
+
+    digest = _seed_bytes(server_seed)
+    generated = 0
+    while generated < length:
+        count = min(CHAIN_BLOCK, length - generated)
+        digests = [None] * count
+        for k in range(count):
+            digest = sha256(digest).digest()
+            digests[k] = digest
+        block = np.frombuffer(b''.join(digests), dtype=np.uint8).reshape(count, 32)
+        del digests
+
+        # Generated hash j is game length - 1 - j
+        games = length - 1 - np.arange(generated, generated + count)
+        crashes[games] = crash_hundredths(block, house_edge)
+        first = -(-generated // CHECKPOINT_STRIDE) * CHECKPOINT_STRIDE
+        kept = np.arange(first, generated + count, CHECKPOINT_STRIDE)
+        checkpoints[kept // CHECKPOINT_STRIDE] = block[kept - generated]
+        generated += count
+
+    return {
+        "crashes": crashes,
+        "checkpoints": checkpoints,
+        "commitment": commitment_of(digest),
+    }
+
+
+def _chain_key(server_seed, length, house_edge):
+    """Cache directory name of a chain; does not reveal the seed or any game hash"""
+    tag = hashlib.sha256(b'aviator-chain\x00' + _seed_bytes(server_seed)).hexdigest()[:32]
+    return f"{tag}-{length}-{round(house_edge * 10000)}"
+
+
+def chain_cached(server_seed, length, house_edge=DEFAULT_HOUSE_EDGE):
+    """Whether a chain is already built, so loading it costs no hashing"""
+    _validate_spec(length, house_edge)
+    key = _chain_key(server_seed, length, house_edge)
+    with _load_lock:
+        if key in _loaded:
+            return True
+    return os.path.exists(os.path.join(CHAIN_CACHE_DIR, key, 'meta.json'))
+
+
+def load_chain(server_seed, length, house_edge=DEFAULT_HOUSE_EDGE):
+    """
+    Hash chain of a server seed, built once and cached
+
+    Chains are cached on disk under CHAIN_CACHE_DIR (up to
+    MAX_CHAIN_CACHE_BYTES) and memory-mapped when loaded, and the last
+    MAX_LOADED_CHAINS loaded chains stay open in the process, so later
+    requests for the same chain reuse it. A chain is built at most once at
+    a time; requests for other chains are not blocked meanwhile.
+
+    Returns:
+        Dictionary as from build_chain plus "spec" (server_seed, length,
+        house_edge) and "length"
+    """
+    _validate_spec(length, house_edge)
+    key = _chain_key(server_seed, length, house_edge)
+    with _load_lock:
+        if key in _loaded:
+            _loaded.move_to_end(key)
+            return _loaded[key]
+        chain_lock = _chain_locks.setdefault(key, threading.Lock())
+
+    with chain_lock:
+        with _load_lock:
+            # Loaded by another request while this one waited
+            if key in _loaded:
+                _loaded.move_to_end(key)
+                return _loaded[key]
+
+        path = os.path.join(CHAIN_CACHE_DIR, key)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            # Mark it recently used for the cache limit
+            os.utime(meta_path)
+        else:
+            started = time.perf_counter()
+            chain = build_chain(server_seed, length, house_edge)
+            _save_chain(path, chain)
+            logger.info("Built hash chain of %d games in %.2fs", length, time.perf_counter() - started)
+            _prune_cache()
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        chain = {
+            "spec": {"server_seed": server_seed, "length": length, "house_edge": house_edge},
+            "length": length,
+            "commitment": meta["commitment"],
+            "crashes": np.load(os.path.join(path, 'crashes.npy'), mmap_mode='r'),
+            "checkpoints": np.load(os.path.join(path, 'checkpoints.npy'), mmap_mode='r'),
+        }
+        with _load_lock:
+            _loaded[key] = chain
+            if len(_loaded) > MAX_LOADED_CHAINS:
+                _loaded.popitem(last=False)
+            _chain_locks.pop(key, None)
+        return chain
+
+
+def _prune_cache():
+    """
+    Delete the least recently used cached chains beyond MAX_CHAIN_CACHE_BYTES
+
+    Chains loaded or being loaded in this process are kept; their files
+    stay readable through existing memory maps even once deleted.
+    """
+    with _load_lock:
+        keep = set(_loaded) | set(_chain_locks)
+    entries = []
+    for name in os.listdir(CHAIN_CACHE_DIR):
+        path = os.path.join(CHAIN_CACHE_DIR, name)
+        meta_path = os.path.join(path, 'meta.json')
+        if name.startswith('.') or not os.path.exists(meta_path):
+            continue
+        try:
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(meta_path), size, name))
+        except OSError:
+            # Removed by another process meanwhile
+            continue
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= MAX_CHAIN_CACHE_BYTES:
+            break
+        if name in keep:
+            continue
+        shutil.rmtree(os.path.join(CHAIN_CACHE_DIR, name), ignore_errors=True)
+        total -= size
+        logger.info("Evicted cached hash chain %s", name)
+
+
+def _save_chain(path, chain):
+    """Write a chain to its cache directory atomically"""
+    os.makedirs(CHAIN_CACHE_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=CHAIN_CACHE_DIR, prefix='.building-')
+    try:
+        np.save(os.path.join(staging, 'crashes.npy'), chain["crashes"])
+        np.save(os.path.join(staging, 'checkpoints.npy'), chain["checkpoints"])
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump({"commitment": chain["commitment"]}, f)
+        os.replace(staging, path)
+    except OSError:
+        # Another process finished the same chain first
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            raise
+
+
+def game_hashes(chain, first, count):
+    """
+    Hex hashes of consecutive games, recomputed from the nearest checkpoint
+
+    Args:
+        chain: Chain from load_chain
+        first: First game
+        count: Number of games
+    """
+    last = first + count - 1
+    if first < 0 or count < 1 or last >= chain["length"]:
+        raise ValueError(f"Games must be within 0..{chain['length'] - 1}")
+
+    # The last game was generated first; walk forward to it, then on to the
+    # earlier games
+    generated = chain["length"] - 1 - last
+    checkpoint = generated // CHECKPOINT_STRIDE
+    digest = bytes(chain["checkpoints"][checkpoint])
+    for _ in range(generated - checkpoint * CHECKPOINT_STRIDE):
+        digest = hashlib.sha256(digest).digest()
+
+    hashes = [digest.hex()]
+    for _ in range(count - 1):
+        digest = hashlib.sha256(digest).digest()
+        hashes.append(digest.hex())
+    return hashes[::-1]
+
+
+def verify_game_hashes(hashes, house_edge=DEFAULT_HOUSE_EDGE, commitment=None):
+    """
+    Check revealed game hashes link up and recompute their multipliers
+
+    Args:
+        hashes: Hex hashes of consecutive games, earliest first
+        commitment: Optional published commitment; the first hash must then
+            be game 0
+
+    Returns:
+        Dictionary with validity, the first broken link (index of the game
+        whose hash does not hash to its predecessor's) and the multipliers
+    """
+    try:
+        raw = [bytes.fromhex(h) for h in hashes]
+    except ValueError:
+        raise ValueError("Game hashes must be hex strings")
+    if not raw or any(len(h) != 32 for h in raw):
+        raise ValueError("Game hashes must be 64 hex characters")
+
+    sha256 = hashlib.sha256
+    broken = next((i for i in range(1, len(raw)) if sha256(raw[i]).digest() != raw[i - 1]), None)
+    commitment_ok = None if commitment is None else commitment_of(raw[0]) == commitment.lower()
+    block = np.frombuffer(b''.join(raw), dtype=np.uint8).reshape(len(raw), 32)
+    crashes = crash_hundredths(block, house_edge) / 100.0
+
+    return {
+        "valid": broken is None and commitment_ok is not False,
+        "games": len(raw),
+        "first_broken_link": broken,
+        "commitment_matches": commitment_ok,
+        "crashes": crashes.tolist(),
+    }
+
+
+def verify_server_seed(server_seed, length, crashes, offset=0, house_edge=DEFAULT_HOUSE_EDGE,
+                       commitment=None):
+    """
+    Check reported multipliers against the chain of a revealed server seed
+
+    The chain is rebuilt (or loaded from the cache) and compared with the
+    reported multipliers in one vectorized pass.
+
+    Args:
+        crashes: Reported multipliers of consecutive games from offset
+        commitment: Optional commitment published for the chain
+
+    Returns:
+        Dictionary with validity, mismatch count and first mismatching game
+    """
+    chain = load_chain(server_seed, length, house_edge)
+    reported = np.rint(np.asarray(crashes, dtype=float) * 100)
+    if offset < 0 or offset + reported.size > length:
+        raise ValueError(f"Games must be within 0..{length - 1}")
+    expected = np.asarray(chain["crashes"][offset:offset + reported.size], dtype=np.float64)
+    mismatch = np.flatnonzero(expected != reported)
+    commitment_ok = None if commitment is None else chain["commitment"] == commitment.lower()
+
+    return {
+        "valid": mismatch.size == 0 and commitment_ok is not False,
+        "games": int(reported.size),
+        "mismatches": int(mismatch.size),
+        "first_mismatch": int(offset + mismatch[0]) if mismatch.size else None,
+        "commitment": chain["commitment"],
+        "commitment_matches": commitment_ok,
+    }
+
+
+class HashChainRandom(random.Random):
+    """
+    random.Random whose crash multipliers come from a hash chain
+
+    generate_crash_multiplier takes the next game of the chain instead of
+    drawing from the generator, which still supplies network conditions.
+    """
+
+    def __init__(self, chain, position=0, seed=None):
+        super().__init__(seed)
+        self.chain = chain
+        self.position = position
+
+    def next_crash(self):
+        """Multiplier of the next game"""
+        if self.position >= self.chain["length"]:
+            raise ValueError(f"Hash chain exhausted after {self.chain['length']} games")
+        crash = int(self.chain["crashes"][self.position]) / 100.0
+        self.position += 1
+        return crash
+
+    def remaining(self):
+        """Games left in the chain"""
+        return self.chain["length"] - self.position
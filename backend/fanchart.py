@@ -0,0 +1,235 @@
+import os
+import time
+import logging
+
+import numpy as np
+
+from batch import (
+    DEFAULT_CHUNK_ELEMENTS, init_batch_state, advance_batch, generate_streams, money_scale
+)
+from worker_pool import shared_pool
+
+logger = logging.getLogger(__name__)
+
+FAN_PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_FAN_POINTS = 500
+DEFAULT_RELATIVE_ACCURACY = 0.01
+MAX_FAN_CELLS = 8_000_000
+
+# Balances are bucketed by magnitude from a cent up to MAX_SKETCH_VALUE;
+# smaller magnitudes count as zero, larger ones land in the top bucket
+MIN_SKETCH_VALUE = 0.01
+MAX_SKETCH_VALUE = 1e9
+
+
+def sketch_layout(relative_accuracy):
+    """(gamma, buckets per sign) of sketches with the given relative accuracy"""
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    buckets = int(np.ceil(np.log(MAX_SKETCH_VALUE / MIN_SKETCH_VALUE) / np.log(gamma))) + 1
+    return gamma, buckets
+
+
+def new_sketch(points, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    Empty per-round balance sketches
+
+    Each sampled round gets a histogram of log-spaced buckets (negative
+    magnitudes, zero, positive magnitudes, in value order) in which every
+    bucket's values are within relative_accuracy of its midpoint, plus the
+    exact minimum, maximum and sum of the balances seen. The bucket layout
+    does not depend on the data, so sketches merge by addition.
+    """
+    _, buckets = sketch_layout(relative_accuracy)
+    return {
+        "relative_accuracy": relative_accuracy,
+        "counts": np.zeros((points, 2 * buckets + 1), dtype=np.int32),
+        "min": np.full(points, np.inf),
+        "max": np.full(points, -np.inf),
+        "sum": np.zeros(points),
+    }
+
+
+def _bucket_index(sketch, values):
+    """Column of every value in a sketch's histograms"""
+    gamma, buckets = sketch_layout(sketch["relative_accuracy"])
+    magnitude = np.abs(values)
+    with np.errstate(divide='ignore'):
+        key = np.ceil(np.log(np.maximum(magnitude, MIN_SKETCH_VALUE) / MIN_SKETCH_VALUE)
+                      / np.log(gamma)).astype(np.int64)
+    np.clip(key, 0, buckets - 1, out=key)
+    index = np.where(values > 0, buckets + 1 + key, buckets - 1 - key)
+    return np.where(magnitude < MIN_SKETCH_VALUE, buckets, index)
+
+
+def _bucket_values(sketch):
+    """Representative value of every histogram column"""
+    gamma, buckets = sketch_layout(sketch["relative_accuracy"])
+    # Midpoint of (gamma^(k-1), gamma^k] in relative terms
+    magnitude = MIN_SKETCH_VALUE * 2 * gamma ** np.arange(buckets) / (gamma + 1)
+    return np.concatenate([-magnitude[::-1], [0.0], magnitude])
+
+
+def update_sketch(sketch, rows, balances):
+    """
+    Add a block of balances to a sketch
+
+    Args:
+        sketch: Sketch from new_sketch, updated in place
+        rows: Sketch rows of the block's columns
+        balances: Array shaped (trials, len(rows))
+    """
+    if len(rows) == 0:
+        return
+    counts = sketch["counts"]
+    columns = counts.shape[1]
+    flat = _bucket_index(sketch, balances) + np.arange(len(rows), dtype=np.int64) * columns
+    block = np.bincount(flat.ravel(), minlength=len(rows) * columns)
+    counts[rows] += block.reshape(len(rows), columns).astype(counts.dtype)
+    sketch["min"][rows] = np.minimum(sketch["min"][rows], balances.min(axis=0))
+    sketch["max"][rows] = np.maximum(sketch["max"][rows], balances.max(axis=0))
+    sketch["sum"][rows] += balances.sum(axis=0)
+
+
+def merge_sketches(a, b):
+    """Combine two sketches of the same layout into a new one"""
+    if a["relative_accuracy"] != b["relative_accuracy"] or a["counts"].shape != b["counts"].shape:
+        raise ValueError("Sketches with different layouts cannot be merged")
+    return {
+        "relative_accuracy": a["relative_accuracy"],
+        "counts": a["counts"] + b["counts"],
+        "min": np.minimum(a["min"], b["min"]),
+        "max": np.maximum(a["max"], b["max"]),
+        "sum": a["sum"] + b["sum"],
+    }
+
+
+def sketch_quantiles(sketch, q):
+    """
+    Quantile q of every sketched round
+
+    The bucket holding the q-th balance is found from cumulative counts and
+    its representative value returned, which is within the sketch's
+    relative accuracy of a balance in that bucket (or within a cent of
+    zero), clamped to the exact extremes.
+    """
+    counts = sketch["counts"]
+    cumulative = np.cumsum(counts, axis=1, dtype=np.int64)
+    rank = q * (cumulative[:, -1] - 1)
+    index = np.minimum((cumulative <= rank[:, None]).sum(axis=1), counts.shape[1] - 1)
+    value = _bucket_values(sketch)[index]
+    return np.clip(value, sketch["min"], sketch["max"])
+
+
+def sample_rounds(rounds, points):
+    """Rounds (1-based) at which the fan chart is sketched"""
+    return np.unique(np.linspace(1, rounds, min(points, rounds)).round().astype(np.int64))
+
+
+def _fan_chart_worker(task):
+    """
+    Sketch one share of the trials
+
+    Runs in worker processes. Rounds are simulated in blocks bounded by
+    chunk_elements and only the sampled rounds of each block are folded
+    into the sketch, so no trials x rounds matrix is kept.
+
+    Args:
+        task: Tuple of (params, trials, rounds, sampled, relative_accuracy,
+            seed_sequence, conditions, chunk_elements)
+
+    Returns:
+        Sketch of the share's balances
+    """
+    params, trials, rounds, sampled, relative_accuracy, seed, conditions, chunk_elements = task
+    rng = np.random.default_rng(seed)
+    sketch = new_sketch(len(sampled), relative_accuracy)
+    state = init_batch_state(params, trials)
+    scale = money_scale(params)
+    chunk_rounds = max(1, chunk_elements // max(1, trials))
+
+    done = 0
+    while done < rounds and state["active"].any():
+        n = min(chunk_rounds, rounds - done)
+        streams = generate_streams(rng, trials, n, *conditions,
+                                   distribution=params.get("distribution"))
+        path = advance_batch(params, state, streams, record=True)
+        first, last = np.searchsorted(sampled, [done + 1, done + n + 1])
+        columns = sampled[first:last] - done - 1
+        update_sketch(sketch, np.arange(first, last), path[:, columns] / scale)
+        done += n
+
+    # Every trial has stopped: the rest of the rounds hold final balances
+    first = np.searchsorted(sampled, done + 1)
+    if first < len(sampled):
+        final = (state["balance"] / scale)[:, None]
+        rows = np.arange(first, len(sampled))
+        update_sketch(sketch, rows, np.broadcast_to(final, (trials, len(rows))))
+    return sketch
+
+
+def fan_chart(params, rounds, trials=2000, points=DEFAULT_FAN_POINTS,
+              relative_accuracy=DEFAULT_RELATIVE_ACCURACY, workers=None, seed=None,
+              realistic_conditions=True, network_delay=True, error_simulation=True,
+              chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Per-round balance percentiles across many trials of a strategy
+
+    Each worker sketches its share of the trials into per-round
+    log-bucketed histograms (see new_sketch), which are merged before the
+    5th/25th/50th/75th/95th percentiles are read off. Memory is points x
+    buckets per worker plus one block of streams, independent of trials x
+    rounds.
+
+    Args:
+        params: Parameters from batch.build_batch_params
+        rounds: Rounds per trial
+        trials: Number of trials
+        points: At most this many rounds are sketched, evenly spaced
+        relative_accuracy: Relative error bound of the percentiles
+        workers: Shares the trials are split into (default CPU count); 1
+            runs inline, otherwise the shares run in the shared worker pool
+        seed: Optional seed for reproducible runs
+
+    Returns:
+        Dictionary with the sampled rounds, one band series per percentile
+        and the mean balance per round
+    """
+    started = time.perf_counter()
+    sampled = sample_rounds(rounds, points)
+    _, buckets = sketch_layout(relative_accuracy)
+    if len(sampled) * (2 * buckets + 1) > MAX_FAN_CELLS:
+        raise ValueError("Sketch too large: reduce points or increase relative_accuracy")
+
+    workers = max(1, min(workers or os.cpu_count() or 1, trials))
+    shares = [len(part) for part in np.array_split(np.arange(trials), workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    conditions = (realistic_conditions, network_delay, error_simulation)
+    tasks = [(params, share, rounds, sampled, relative_accuracy, child, conditions, chunk_elements)
+             for share, child in zip(shares, seeds)]
+
+    if workers > 1:
+        sketches = list(shared_pool().map(_fan_chart_worker, tasks))
+    else:
+        sketches = [_fan_chart_worker(task) for task in tasks]
+
+    sketch = sketches[0]
+    for other in sketches[1:]:
+        sketch = merge_sketches(sketch, other)
+
+    elapsed = time.perf_counter() - started
+    logger.info("Fan chart: %s trials x %s rounds sketched at %s rounds in %.2fs",
+                trials, rounds, len(sampled), elapsed)
+
+    return {
+        "trials": trials,
+        "rounds": rounds,
+        "round": sampled.tolist(),
+        "percentiles": {f"p{p}": np.round(sketch_quantiles(sketch, p / 100.0), 2).tolist()
+                        for p in FAN_PERCENTILES},
+        "mean": np.round(sketch["sum"] / trials, 2).tolist(),
+        "min": np.round(sketch["min"], 2).tolist(),
+        "max": np.round(sketch["max"], 2).tolist(),
+        "relative_accuracy": relative_accuracy,
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+    }
@@ -0,0 +1,250 @@
+import json
+import time
+import logging
+import numpy as np
+
+from batch import FIXED_CASHOUTS, MIN_NETWORK_DELAY, MAX_NETWORK_DELAY, generate_crash_batch
+
+logger = logging.getLogger(__name__)
+
+LATENCY_STRATEGIES = ('early', 'mid', 'high', 'martingale', 'paroli')
+
+# Multiplier growth m(t) = exp(GROWTH_RATE * t), t in seconds since takeoff
+DEFAULT_GROWTH_RATE = 0.06
+
+# Betting phase between a crash and the next takeoff
+DEFAULT_ROUND_PAUSE = 5.0
+
+MAX_LATENCY_EVENTS = 50_000_000
+
+# Strategies whose stake depends on the previous outcome, stepped per round
+PROGRESSION_STRATEGIES = ('martingale', 'paroli')
+
+# Player-rounds settled per block for players without a progression
+LATENCY_BLOCK_ELEMENTS = 1 << 20
+
+
+def parse_latency_groups(groups):
+    """
+    Validate the player mix of a latency simulation
+
+    Each group is an object with "strategy" (early, mid, high, martingale or
+    paroli), "count", "bet", an optional "cashout" overriding the strategy's
+    target and "latency": round-trip seconds as a number or [low, high] to
+    draw uniformly per request.
+
+    Raises:
+        ValueError: If the mix is malformed
+    """
+    if isinstance(groups, str):
+        try:
+            groups = json.loads(groups)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid players JSON: {e}")
+    if not isinstance(groups, list) or not groups:
+        raise ValueError("players must be a non-empty list of player groups")
+
+    for n, group in enumerate(groups):
+        if not isinstance(group, dict):
+            raise ValueError(f"players[{n}] must be an object")
+        if group.get('strategy') not in LATENCY_STRATEGIES:
+            raise ValueError(f"players[{n}]: strategy must be one of {', '.join(LATENCY_STRATEGIES)}")
+        count = group.get('count', 1)
+        if not isinstance(count, int) or count < 1:
+            raise ValueError(f"players[{n}]: count must be a positive integer")
+        latency = group.get('latency', [MIN_NETWORK_DELAY, MAX_NETWORK_DELAY])
+        if isinstance(latency, list):
+            if len(latency) != 2 or not 0 <= latency[0] <= latency[1]:
+                raise ValueError(f"players[{n}]: latency range must be [low, high] seconds")
+        elif not isinstance(latency, (int, float)) or latency < 0:
+            raise ValueError(f"players[{n}]: latency must be non-negative")
+        cashout = group.get('cashout')
+        if cashout is not None and (not isinstance(cashout, (int, float)) or cashout < 1.01):
+            raise ValueError(f"players[{n}]: cashout must be at least 1.01")
+    return groups
+
+
+def _latency_range(group):
+    """(low, high) round-trip latency in seconds for a group"""
+    latency = group.get('latency', [MIN_NETWORK_DELAY, MAX_NETWORK_DELAY])
+    if isinstance(latency, list):
+        return float(latency[0]), float(latency[1])
+    return float(latency), float(latency)
+
+
+def _settle(stats, players, stake, crash, duration, target, fire_offset, latency_low,
+            latency_high, growth_rate, rng):
+    """
+    Settle some players' bets over a block of rounds at a fixed stake each
+
+    Args:
+        players: Indices of the players into stats, shape (P,)
+        stake: Their stakes after bet limits, shape (P,)
+        crash, duration: Crash multiplier of each round and the seconds from
+            takeoff to it, shape (B,)
+        target, fire_offset, latency_low, latency_high: The players'
+            cashout targets, seconds from takeoff to reaching them and
+            latency ranges, shape (P,)
+
+    Returns:
+        Tuple of (won, requests): which bets won, shape (P, B), and the
+        number of cashout requests fired
+    """
+    rounds = crash.size
+    # Requests only fire for targets the multiplier reaches before the crash
+    firing = target[:, None] <= crash[None, :]
+    rows, cols = np.nonzero(firing)
+    fired_at = fire_offset[rows] + rng.uniform(latency_low[rows], latency_high[rows])
+    # The crash is the only event that changes round state, so a request
+    # settles if and only if it arrives before it
+    arrived = fired_at < duration[cols]
+    rows = rows[arrived]
+    won = np.zeros_like(firing)
+    won[rows, cols[arrived]] = True
+    multiplier = np.exp(growth_rate * fired_at[arrived])
+
+    wins = won.sum(axis=1)
+    ideal_wins = firing.sum(axis=1)
+    profit = np.bincount(rows, weights=stake[rows] * (multiplier - 1), minlength=len(players))
+    stats['staked'][players] += stake * rounds
+    stats['pnl'][players] += profit - stake * (rounds - wins)
+    stats['ideal_pnl'][players] += stake * (target - 1) * ideal_wins - stake * (rounds - ideal_wins)
+    stats['settle_sum'][players] += np.bincount(rows, weights=multiplier, minlength=len(players))
+    stats['wins'][players] += wins
+    stats['late_losses'][players] += ideal_wins - wins
+    stats['crash_losses'][players] += rounds - ideal_wins
+    stats['ideal_wins'][players] += ideal_wins
+    return won, int(ideal_wins.sum())
+
+
+def simulate_latency(groups, rounds, growth_rate=DEFAULT_GROWTH_RATE, pause=DEFAULT_ROUND_PAUSE,
+                     min_bet=0.10, max_bet=1000.0, seed=None):
+    """
+    Simulation of cashout requests racing the crash under network latency
+
+    Each round the multiplier grows as exp(growth_rate * t) until the crash
+    time log(crash) / growth_rate. A player sees the multiplier reach their
+    target, fires a cashout request and the server settles it at the
+    multiplier reached when the request arrives, latency seconds later, or
+    as a loss if it arrives after the crash. Nothing else happens within a
+    round, so each round's requests are settled at once against the crash
+    time.
+
+    Players of early, mid and high groups bet the same stake every round,
+    so their rounds are settled a block at a time as arrays. Martingale and
+    paroli stakes depend on the previous outcome, so those players are
+    stepped round by round and the rate of bets settled grows with how
+    many of them share a round.
+
+    Every bet is also settled as if there were no latency (win at exactly
+    the target when the crash reaches it), so slippage and late losses can
+    be compared per group against the same stakes.
+
+    Args:
+        groups: Player groups, see parse_latency_groups
+        rounds: Number of rounds
+        growth_rate: Multiplier growth rate per second
+        pause: Seconds between a crash and the next takeoff
+        seed: Optional seed for reproducible runs
+
+    Returns:
+        Dictionary with per-group latency statistics, the number of cashout
+        requests and the bets settled per second
+    """
+    groups = parse_latency_groups(groups)
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+
+    counts = [g.get('count', 1) for g in groups]
+    players = sum(counts)
+    if players * rounds > MAX_LATENCY_EVENTS:
+        raise ValueError(f"players x rounds is limited to {MAX_LATENCY_EVENTS}")
+
+    member = np.repeat(np.arange(len(groups)), counts)
+    target = np.repeat([float(g.get('cashout') or FIXED_CASHOUTS.get(g['strategy'], 2.0))
+                        for g in groups], counts)
+    base_bet = np.repeat([float(g.get('bet', 1.0)) for g in groups], counts)
+    progression = np.repeat([g['strategy'] for g in groups], counts)
+    ranges = [_latency_range(g) for g in groups]
+    latency_low = np.repeat([low for low, _ in ranges], counts)
+    latency_high = np.repeat([high for _, high in ranges], counts)
+    fire_offset = np.log(target) / growth_rate
+
+    stats = {key: np.zeros(players) for key in ('staked', 'pnl', 'ideal_pnl', 'settle_sum')}
+    for key in ('wins', 'crash_losses', 'late_losses', 'ideal_wins'):
+        stats[key] = np.zeros(players, dtype=np.int64)
+
+    crashes = generate_crash_batch(rng, rounds)
+    duration = np.log(crashes) / growth_rate
+    requests = 0
+
+    def settle(subset, stake, block):
+        return _settle(stats, subset, stake, crashes[block], duration[block], target[subset],
+                       fire_offset[subset], latency_low[subset], latency_high[subset],
+                       growth_rate, rng)
+
+    fixed = np.flatnonzero(~np.isin(progression, PROGRESSION_STRATEGIES))
+    if fixed.size:
+        stake = np.clip(base_bet[fixed], min_bet, max_bet)
+        block_rounds = max(1, LATENCY_BLOCK_ELEMENTS // fixed.size)
+        for first in range(0, rounds, block_rounds):
+            requests += settle(fixed, stake, slice(first, first + block_rounds))[1]
+
+    stepped = np.flatnonzero(np.isin(progression, PROGRESSION_STRATEGIES))
+    if stepped.size:
+        base = base_bet[stepped]
+        paroli = progression[stepped] == 'paroli'
+        bet = base.copy()
+        win_streak = np.zeros(stepped.size, dtype=np.int64)
+        for r in range(rounds):
+            won, fired = settle(stepped, np.clip(bet, min_bet, max_bet), slice(r, r + 1))
+            requests += fired
+            won = won[:, 0]
+            # Progressions settle at the crash, before the next betting phase
+            win_streak = np.where(won, win_streak + 1, 0)
+            bet = np.where(paroli, base * 2.0 ** np.minimum(win_streak, 3),
+                           np.where(won, base, bet * 2))
+
+    clock = float(duration.sum()) + rounds * pause
+    elapsed = time.perf_counter() - started
+    summaries = []
+    for n, group in enumerate(groups):
+        mask = member == n
+        wins = int(stats['wins'][mask].sum())
+        staked = float(stats['staked'][mask].sum())
+        pnl = float(stats['pnl'][mask].sum())
+        ideal = float(stats['ideal_pnl'][mask].sum())
+        settle_mean = float(stats['settle_sum'][mask].sum()) / wins if wins else None
+        target_mean = float(target[mask].mean())
+        summaries.append({
+            "strategy": group['strategy'],
+            "players": int(mask.sum()),
+            "cashout_target": round(target_mean, 4),
+            "bets": int(mask.sum()) * rounds,
+            "wins": wins,
+            "ideal_wins": int(stats['ideal_wins'][mask].sum()),
+            "late_losses": int(stats['late_losses'][mask].sum()),
+            "crash_losses": int(stats['crash_losses'][mask].sum()),
+            "mean_settle_multiplier": None if settle_mean is None else round(settle_mean, 4),
+            "mean_slippage": None if settle_mean is None else round(settle_mean / target_mean - 1, 6),
+            "total_staked": round(staked, 2),
+            "pnl": round(pnl, 2),
+            "ideal_pnl": round(ideal, 2),
+            "latency_cost": round(ideal - pnl, 2),
+            "return_per_stake": round(pnl / staked, 6) if staked else None,
+            "ideal_return_per_stake": round(ideal / staked, 6) if staked else None,
+        })
+
+    logger.info("Latency simulation: %d bets and %d cashout requests for %d players in %.2fs",
+                players * rounds, requests, players, elapsed)
+
+    return {
+        "players": players,
+        "rounds": rounds,
+        "growth_rate": growth_rate,
+        "cashout_requests": requests,
+        "bets_per_second": round(players * rounds / elapsed) if elapsed > 0 else None,
+        "simulated_seconds": round(clock, 2),
+        "groups": summaries,
+        "elapsed_seconds": round(elapsed, 3),
+    }
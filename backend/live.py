@@ -0,0 +1,248 @@
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+from batch import (
+    NETWORK_ERROR_RATE, MIN_NETWORK_DELAY, MAX_NETWORK_DELAY, init_batch_state, advance_batch,
+    generate_crash_batch
+)
+from table import parse_player_groups, group_params
+
+logger = logging.getLogger(__name__)
+
+MAX_LIVE_ROOMS = 16
+MAX_LIVE_PLAYERS = 10000
+MAX_LIVE_SUBSCRIBERS = 1000
+
+# Rounds a subscriber may fall behind before it is dropped
+SUBSCRIBER_BUFFER = 64
+
+# Recent rounds kept so reconnecting clients (Last-Event-ID) catch up
+ROUND_BACKLOG = 256
+
+# A room with no subscribers for this long shuts down
+ROOM_IDLE_SECONDS = 300
+
+_rooms = {}
+_rooms_lock = threading.Lock()
+
+
+def _close(subscriber):
+    """End a subscriber's stream, dropping its oldest update only if its queue is full"""
+    try:
+        subscriber.put_nowait(None)
+    except queue.Full:
+        try:
+            subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        subscriber.put_nowait(None)
+
+
+def sse_event(event, data, event_id=None):
+    """Encode one server-sent event"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class LiveRoom:
+    """
+    Strategies playing one shared crash stream live, one round per pace seconds
+
+    A background thread draws each round's crash, advances every player
+    group's batch state by that round and encodes the update as a single
+    server-sent event, which is then handed as is to every subscriber's
+    queue. The simulation work per round depends on the players only;
+    each extra viewer costs one queue put. Each viewer's stream does hold
+    a server thread for as long as it is open, so hundreds of viewers need
+    a threaded or async server sized for them.
+    """
+
+    def __init__(self, groups, pace=1.0, rounds=10000, seed=None, realistic_conditions=True,
+                 network_delay=True, error_simulation=True, min_bet=0.10, max_bet=1000.0):
+        self.id = uuid.uuid4().hex[:12]
+        self.pace = pace
+        self.rounds = rounds
+        self.seed = seed
+        self.round = 0
+        self.simulate_network = realistic_conditions and network_delay
+        self.error_simulation = error_simulation
+        self._rng = np.random.default_rng(seed)
+        self._members = []
+        for group in groups:
+            params = group_params(group, self._rng, min_bet, max_bet)
+            self._members.append((group, params, init_batch_state(params, group.get('count', 1))))
+
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._backlog = deque(maxlen=ROUND_BACKLOG)
+        self._last = self._update(None)
+        self._idle_since = time.monotonic()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'live-{self.id}', daemon=True)
+
+    def _update(self, crash):
+        """Compact per-group state after the current round"""
+        groups = []
+        for group, params, state in self._members:
+            groups.append({
+                "strategy": group['strategy'],
+                "balance": round(float(state["balance"].mean()), 2),
+                "active": int(state["active"].sum()),
+                "ruined": int(state["ruin"].sum()),
+            })
+        return {"round": self.round, "crash": crash, "groups": groups}
+
+    def _advance(self):
+        """Play one round for every group and return its update"""
+        crash = generate_crash_batch(self._rng, (1, 1))
+        for _, params, state in self._members:
+            size = state["balance"].size
+            net_ok = delay = None
+            if self.simulate_network:
+                if self.error_simulation:
+                    net_ok = self._rng.random((size, 1)) >= NETWORK_ERROR_RATE
+                else:
+                    net_ok = np.ones((size, 1), dtype=bool)
+                delay = self._rng.uniform(MIN_NETWORK_DELAY, MAX_NETWORK_DELAY, (size, 1))
+            advance_batch(params, state, {"crash": crash, "net_ok": net_ok, "delay": delay})
+        self.round += 1
+        return self._update(round(float(crash[0, 0]), 2))
+
+    def _publish(self, update):
+        """Encode an update once and queue it for every subscriber"""
+        message = sse_event('round', update, update["round"])
+        with self._lock:
+            self._last = update
+            self._backlog.append((update["round"], message))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Too slow to keep up: drop it rather than hold up the room
+                self.unsubscribe(subscriber)
+                _close(subscriber)
+
+    def _run(self):
+        """Room thread: one round every pace seconds until stopped, idle or done"""
+        logger.info("Live room %s started with %s groups", self.id, len(self._members))
+        next_round = time.monotonic()
+        try:
+            while self.round < self.rounds:
+                next_round += self.pace
+                if self._stopped.wait(max(0.0, next_round - time.monotonic())):
+                    break
+                with self._lock:
+                    idle = not self._subscribers and time.monotonic() - self._idle_since > ROOM_IDLE_SECONDS
+                if idle:
+                    logger.info("Live room %s idle, shutting down", self.id)
+                    break
+                self._publish(self._advance())
+        except Exception as e:
+            logger.error("Live room %s failed: %s", self.id, e)
+        finally:
+            self._stopped.set()
+            with _rooms_lock:
+                _rooms.pop(self.id, None)
+            with self._lock:
+                subscribers = list(self._subscribers)
+                self._subscribers.clear()
+            for subscriber in subscribers:
+                _close(subscriber)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Register a viewer
+
+        Args:
+            last_event_id: Last round the viewer received; the rounds after
+                it that are still in the backlog are queued first
+
+        Returns:
+            Queue of encoded events, ending with None when the room closes
+
+        Raises:
+            ValueError: If the room is full or closed
+        """
+        subscriber = queue.Queue(SUBSCRIBER_BUFFER)
+        with self._lock:
+            if self._stopped.is_set():
+                raise ValueError("Live room has closed")
+            if len(self._subscribers) >= MAX_LIVE_SUBSCRIBERS:
+                raise ValueError(f"Live room is limited to {MAX_LIVE_SUBSCRIBERS} viewers")
+            if last_event_id is not None:
+                missed = [m for r, m in self._backlog if r > last_event_id]
+                # Leave headroom so catching up does not overflow the queue
+                for message in missed[-(SUBSCRIBER_BUFFER // 2):]:
+                    subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Remove a viewer"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers:
+                self._idle_since = time.monotonic()
+
+    def snapshot(self):
+        """Room settings, viewers and the latest update"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "pace": self.pace,
+                "rounds": self.rounds,
+                "subscribers": len(self._subscribers),
+                "running": not self._stopped.is_set(),
+                **self._last,
+            }
+
+    def start(self):
+        """Start playing rounds"""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the room; viewers' streams end"""
+        self._stopped.set()
+
+
+def create_room(groups, **options):
+    """
+    Start a live room for a player mix (see table.parse_player_groups)
+
+    Args:
+        options: LiveRoom settings (pace, rounds, seed, network and bet limits)
+
+    Raises:
+        ValueError: If the mix is malformed, too large or MAX_LIVE_ROOMS are open
+    """
+    groups = parse_player_groups(groups)
+    if sum(group.get('count', 1) for group in groups) > MAX_LIVE_PLAYERS:
+        raise ValueError(f"Live rooms are limited to {MAX_LIVE_PLAYERS} players")
+    room = LiveRoom(groups, **options)
+    with _rooms_lock:
+        if len(_rooms) >= MAX_LIVE_ROOMS:
+            raise ValueError(f"At most {MAX_LIVE_ROOMS} live rooms can be open")
+        _rooms[room.id] = room
+    room.start()
+    return room
+
+
+def get_room(room_id):
+    """Open live room by id, or None"""
+    with _rooms_lock:
+        return _rooms.get(room_id)
+
+
+def list_rooms():
+    """Snapshots of the open live rooms"""
+    with _rooms_lock:
+        rooms = list(_rooms.values())
+    return [room.snapshot() for room in rooms]
@@ -0,0 +1,390 @@
+import os
+import sys
+import json
+import bisect
+import time
+import random
+import argparse
+import logging
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'http://localhost:8000'
+REQUEST_TIMEOUT = 300
+
+# Latency percentiles reported, overall, per request kind and per interval
+LATENCY_PERCENTILES = (50, 95, 99)
+
+# Seconds between server CPU/RSS samples and time series points
+SAMPLE_INTERVAL = 1.0
+
+# Traffic resembling the frontend: mostly small runs, some long runs and
+# bursts of one run per strategy from the comparison view
+DEFAULT_PROFILE = {
+    "duration": 30,
+    "rate": 10,
+    "requests": [
+        {"name": "small", "weight": 85, "path": "/simulate",
+         "params": {"strategy": "early", "rounds": 1000}},
+        {"name": "small_stateful", "weight": 10, "path": "/simulate",
+         "params": {"strategy": "martingale", "rounds": 1000}},
+        {"name": "large", "weight": 3, "path": "/simulate",
+         "params": {"strategy": "martingale", "rounds": 100000, "bankroll": 100000}},
+        {"name": "compare", "weight": 2, "path": "/simulate", "params": {"rounds": 1000},
+         "burst": [{"strategy": s} for s in ('early', 'mid', 'high', 'dual', 'martingale',
+                                             'paroli', 'fixed_percent', 'target_profit')]},
+    ],
+}
+
+
+def load_profile(path=None):
+    """
+    Read and check a traffic profile (DEFAULT_PROFILE when path is None)
+
+    A profile has a "duration" in seconds, either a "rate" of request
+    arrivals per second (open loop: arrivals do not wait for responses) or
+    a "concurrency" of clients each sending its next request once the last
+    completes (closed loop), and weighted "requests". A request kind has a
+    "name", "weight", "path", query "params" and optionally a "burst" of
+    param overrides sent together as one arrival. A param set to "random"
+    gets a fresh random integer per request (e.g. seeds).
+
+    Raises:
+        ValueError: If the profile is malformed
+    """
+    if path is None:
+        return DEFAULT_PROFILE
+    with open(path) as f:
+        try:
+            profile = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid profile {path}: {e}")
+
+    if not isinstance(profile, dict) or not profile.get('requests'):
+        raise ValueError("A profile must be an object with a non-empty requests list")
+    if (profile.get('rate') is None) == (profile.get('concurrency') is None):
+        raise ValueError("A profile sets exactly one of rate and concurrency")
+    for n, kind in enumerate(profile['requests']):
+        if not isinstance(kind, dict) or not kind.get('name') or not kind.get('path'):
+            raise ValueError(f"requests[{n}] must be an object with a name and a path")
+        if not isinstance(kind.get('weight', 1), (int, float)) or kind.get('weight', 1) <= 0:
+            raise ValueError(f"requests[{n}]: weight must be positive")
+    return profile
+
+
+def _urls(base_url, kind, rng):
+    """URLs of one arrival of a request kind, with random params drawn from rng"""
+    urls = []
+    for override in kind.get('burst') or [{}]:
+        params = {**kind.get('params', {}), **override}
+        params = {k: rng.randrange(2 ** 31) if v == 'random' else v for k, v in params.items()}
+        urls.append(f"{base_url}{kind['path']}?{urllib.parse.urlencode(params)}")
+    return urls
+
+
+def _send(url, timeout):
+    """One request: (HTTP status or None on a connection error, seconds taken)"""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return status, time.perf_counter() - started
+
+
+def _proc_stats():
+    """Fields of /proc/<pid>/stat after the command name, by pid"""
+    stats = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                stats[int(name)] = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            # Exited while listing
+            continue
+    return stats
+
+
+class ServerSampler:
+    """Samples a process's CPU and RSS every SAMPLE_INTERVAL seconds in a thread"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.samples = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='server-sampler', daemon=True)
+
+    def _cpu_rss(self):
+        """Total CPU seconds and resident bytes of the process and its children"""
+        if psutil is not None:
+            processes = [psutil.Process(self.pid)]
+            processes += processes[0].children(recursive=True)
+            cpu = sum(sum(p.cpu_times()[:2]) for p in processes)
+            return cpu, sum(p.memory_info().rss for p in processes)
+        # Linux without psutil: read /proc for the process and its descendants
+        stats = _proc_stats()
+        if self.pid not in stats:
+            raise OSError(f"No process {self.pid}")
+        children = {}
+        for pid, fields in stats.items():
+            children.setdefault(int(fields[1]), []).append(pid)
+        tree, cpu, rss = [self.pid], 0, 0
+        while tree:
+            pid = tree.pop()
+            fields = stats[pid]
+            cpu += int(fields[11]) + int(fields[12])
+            rss += int(fields[21])
+            tree.extend(children.get(pid, ()))
+        return cpu / os.sysconf('SC_CLK_TCK'), rss * os.sysconf('SC_PAGE_SIZE')
+
+    def _run(self):
+        started = time.perf_counter()
+        last_time, (last_cpu, _) = started, self._cpu_rss()
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            try:
+                cpu, rss = self._cpu_rss()
+            except (OSError, IndexError) as e:
+                logger.warning("Server sampling stopped: %s", e)
+                return
+            now = time.perf_counter()
+            self.samples.append({
+                "time": round(now - started, 3),
+                "cpu_percent": round(100 * (cpu - last_cpu) / (now - last_time), 1),
+                "rss_mb": round(rss / 2 ** 20, 1),
+            })
+            last_time, last_cpu = now, cpu
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+def _latency_summary(records):
+    """Count, error rate and latency percentiles in milliseconds of request records"""
+    if not records:
+        return {"requests": 0}
+    latencies = np.array([r[3] for r in records]) * 1000
+    statuses = [r[2] for r in records]
+    # Admission control turning requests away (429) is reported apart from failures
+    rejected = sum(1 for s in statuses if s == 429)
+    errors = sum(1 for s in statuses if s is None or s >= 400) - rejected
+    summary = {
+        "requests": len(records),
+        "errors": errors,
+        "rejected": rejected,
+        "error_rate": round(errors / len(records), 6),
+        "mean_ms": round(float(latencies.mean()), 2),
+        "max_ms": round(float(latencies.max()), 2),
+    }
+    for p, value in zip(LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES)):
+        summary[f"p{p}_ms"] = round(float(value), 2)
+    return summary
+
+
+def run_load(profile, base_url=DEFAULT_BASE_URL, server_pid=None, seed=None,
+             timeout=REQUEST_TIMEOUT, max_in_flight=256):
+    """
+    Replay a traffic profile against a running backend
+
+    Open-loop profiles draw arrivals as a Poisson process at the profile's
+    rate, so a slow server faces a growing backlog as real clients would
+    create one, up to max_in_flight outstanding requests. Closed-loop
+    profiles keep concurrency clients busy. Either way the run stops
+    issuing requests after the profile's duration and waits for the ones
+    in flight.
+
+    Args:
+        profile: Profile from load_profile
+        base_url: Backend to load
+        server_pid: Backend process whose CPU and RSS are sampled
+        seed: Seed of the request mix and arrival times
+
+    Returns:
+        Dictionary with overall and per-kind latency summaries, throughput,
+        a per-interval time series and the server samples
+    """
+    rng = random.Random(seed)
+    kinds = profile['requests']
+    weights = [kind.get('weight', 1) for kind in kinds]
+    duration = profile.get('duration', 30)
+    records = []
+    lock = threading.Lock()
+
+    def arrival(name, urls, issued):
+        if len(urls) == 1:
+            outcomes = [_send(urls[0], timeout)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(urls)) as burst:
+                outcomes = list(burst.map(lambda url: _send(url, timeout), urls))
+        with lock:
+            records.extend((name, issued, status, seconds) for status, seconds in outcomes)
+
+    sampler = ServerSampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+    started = time.perf_counter()
+    dropped = 0
+
+    if profile.get('rate') is not None:
+        pending = threading.Semaphore(max_in_flight)
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            next_arrival = started
+            while True:
+                next_arrival += rng.expovariate(profile['rate'])
+                if next_arrival - started >= duration:
+                    break
+                time.sleep(max(0.0, next_arrival - time.perf_counter()))
+                if not pending.acquire(blocking=False):
+                    dropped += 1
+                    continue
+                kind = rng.choices(kinds, weights)[0]
+                future = pool.submit(arrival, kind['name'], _urls(base_url, kind, rng),
+                                     next_arrival - started)
+                future.add_done_callback(lambda _: pending.release())
+    else:
+        def client(n):
+            client_rng = random.Random(None if seed is None else seed + n)
+            while time.perf_counter() - started < duration:
+                kind = client_rng.choices(kinds, weights)[0]
+                arrival(kind['name'], _urls(base_url, kind, client_rng), time.perf_counter() - started)
+
+        with ThreadPoolExecutor(max_workers=profile['concurrency']) as pool:
+            list(pool.map(client, range(profile['concurrency'])))
+
+    elapsed = time.perf_counter() - started
+    if sampler:
+        sampler.stop()
+
+    # Time series by completion time
+    records.sort(key=lambda r: r[1] + r[3])
+    finished = [r[1] + r[3] for r in records]
+    series = []
+    for start in np.arange(0, elapsed, SAMPLE_INTERVAL):
+        window = records[bisect.bisect_left(finished, start):
+                         bisect.bisect_left(finished, start + SAMPLE_INTERVAL)]
+        summary = _latency_summary(window)
+        series.append({"time": round(float(start), 3), "throughput": len(window) / SAMPLE_INTERVAL,
+                       **{k: v for k, v in summary.items() if k != 'requests'}})
+
+    completed = sum(1 for r in records if r[2] is not None and r[2] < 400)
+    logger.info("Load run: %d requests in %.1fs against %s", len(records), elapsed, base_url)
+    return {
+        "base_url": base_url,
+        "duration": duration,
+        "mode": "open" if profile.get('rate') is not None else "closed",
+        "rate": profile.get('rate'),
+        "concurrency": profile.get('concurrency'),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput": round(completed / elapsed, 3),
+        "dropped_arrivals": dropped,
+        "overall": _latency_summary(records),
+        "kinds": {kind['name']: _latency_summary([r for r in records if r[0] == kind['name']])
+                  for kind in kinds},
+        "series": series,
+        "server": sampler.samples if sampler else None,
+    }
+
+
+def compare_results(paths):
+    """
+    Side-by-side table of saved load results
+
+    Returns:
+        The table as text, one column per result labelled by its "label"
+    """
+    results = []
+    for path in paths:
+        with open(path) as f:
+            results.append(json.load(f))
+    rows = [("label", lambda r: r.get('label') or '-'),
+            ("mode", lambda r: r['mode']),
+            ("throughput/s", lambda r: r['throughput']),
+            ("requests", lambda r: r['overall']['requests']),
+            ("error rate", lambda r: r['overall'].get('error_rate')),
+            ("rejected", lambda r: r['overall'].get('rejected'))]
+    rows += [(f"p{p} ms", lambda r, p=p: r['overall'].get(f"p{p}_ms")) for p in LATENCY_PERCENTILES]
+    rows += [("max cpu %", lambda r: max((s['cpu_percent'] for s in r['server'] or []), default=None)),
+             ("max rss MB", lambda r: max((s['rss_mb'] for s in r['server'] or []), default=None))]
+
+    table = [[name] + [str(value(r)) for r in results] for name, value in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(table[0]))]
+    return '\n'.join('  '.join(cell.ljust(w) for cell, w in zip(line, widths)) for line in table)
+
+
+def main(argv=None):
+    """
+    Command line entry point
+
+        flask --app app run --port 8000 &
+        python loadtest.py --pid $! --label dev-server --output dev.json
+        python loadtest.py --compare dev.json gunicorn.json
+
+    --pid samples the process and all its descendants (worker processes,
+    or the server child of a reloader), but serve without the reloader
+    (python app.py runs with debug=True, which has one) so the process
+    under test is not restarted by file changes during the run.
+    """
+    parser = argparse.ArgumentParser(description="Load-test a running backend")
+    parser.add_argument('--url', default=DEFAULT_BASE_URL, help="Backend base URL")
+    parser.add_argument('--profile', help="Traffic profile JSON (default: built-in mixed profile)")
+    parser.add_argument('--duration', type=float, help="Override the profile's duration in seconds")
+    parser.add_argument('--rate', type=float, help="Override with an open-loop arrival rate")
+    parser.add_argument('--concurrency', type=int, help="Override with closed-loop clients")
+    parser.add_argument('--pid', type=int, help="Server process id to sample CPU and RSS from")
+    parser.add_argument('--seed', type=int, help="Seed of the request mix and arrivals")
+    parser.add_argument('--label', help="Name of the serving mode under test, kept in the results")
+    parser.add_argument('--output', '-o', help="Save the results as JSON")
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                        help="Print saved results side by side instead of running")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.compare:
+            print(compare_results(args.compare))
+            return 0
+        profile = dict(load_profile(args.profile))
+        if args.duration is not None:
+            profile['duration'] = args.duration
+        if args.rate is not None:
+            profile.update(rate=args.rate, concurrency=None)
+        elif args.concurrency is not None:
+            profile.update(concurrency=args.concurrency, rate=None)
+        result = run_load(profile, args.url.rstrip('/'), args.pid, args.seed)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    result = {"label": args.label, "started_at": datetime.now(timezone.utc).isoformat(),
+              "profile": profile, **result}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps({"label": args.label, "throughput": result["throughput"], **result["overall"]}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
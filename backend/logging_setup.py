@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import contextvars
+import logging.handlers
+
+# Logging configuration: LOG_LEVEL names the root level and LOG_FORMAT is
+# "json" (one object per line) or "text"
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'
+
+# Id of the request being handled, attached to every record logged for it
+request_id = contextvars.ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed as extra fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id', 'taskName'
+}
+
+_listener = None
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request id while still on the logging thread"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request id and extras"""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+                    + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.request_id is not None:
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves all formatting to the listener thread
+
+    The stock handler formats each record before queueing it; here the
+    record is queued as is, so the logging call only pays for creating it.
+    Processes forked after configuration (worker pools) have no listener
+    and write through the fallback handler directly.
+    """
+
+    def __init__(self, log_queue, fallback):
+        super().__init__(log_queue)
+        self.fallback = fallback
+        self.pid = os.getpid()
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        if os.getpid() != self.pid:
+            self.fallback.handle(record)
+        else:
+            super().emit(record)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None):
+    """
+    Route all logging through a queue to a background writer thread
+
+    Replaces the root logger's handlers with a DeferredQueueHandler whose
+    QueueListener formats (as JSON or text) and writes records to stream
+    (default stderr). Calling it again has no effect.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue, handler)
+    queue_handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
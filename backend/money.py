@@ -0,0 +1,62 @@
+import numpy as np
+
+# Integer-cents arithmetic for the simulation kernels
+#
+# Balances and stakes are whole cents. Inputs are rounded to the nearest
+# cent once, percent stakes are rounded half up to the cent and winning
+# payouts are truncated to the cent (the fraction stays with the house), so
+# runs are exact and identical on every platform.
+
+CENTS = 100
+
+
+def to_cents(amount):
+    """Nearest whole number of cents for an amount"""
+    return int(round(amount * CENTS))
+
+
+def array_to_cents(amounts):
+    """Vectorized to_cents returning an int64 array"""
+    return np.rint(np.asarray(amounts, dtype=float) * CENTS).astype(np.int64)
+
+
+def hundredths_of_percent(balance, hundredths):
+    """Share of a balance in cents given in hundredths of a percent, rounded half up"""
+    return (balance * hundredths + 50 * CENTS) // (100 * CENTS)
+
+
+def percent_stake_cents(balance, percent):
+    """Percent of a balance in cents, rounded half up to the cent"""
+    return hundredths_of_percent(balance, to_cents(percent))
+
+
+def win_cents(stake, cashout):
+    """Profit of winning stakes in cents at cashout, truncated to the cent"""
+    return stake * (array_to_cents(cashout) - CENTS) // CENTS
+
+
+def payout(cashout, cents=False):
+    """Profit of a winning stake at cashout, as a function of the stake"""
+    if cents:
+        gain = to_cents(cashout) - CENTS
+        return lambda stake: stake * gain // CENTS
+    return lambda stake: (cashout - 1) * stake
+
+
+def percent_stake(percent, cents=False):
+    """Stake of percent of the balance, as a function of the balance"""
+    if cents:
+        return lambda balance: percent_stake_cents(balance, percent)
+    return lambda balance: round((percent / 100.0) * balance, 2)
+
+
+def amount(value, cents=False):
+    """Reported amount: cents converted back, floats rounded to the cent"""
+    return value / CENTS if cents else round(value, 2)
+
+
+def amounts(values, cents=False):
+    """amount() over a balance history"""
+    if cents:
+        return [v / CENTS for v in values]
+    return [round(v, 2) for v in values]
@@ -0,0 +1,232 @@
+import math
+import time
+import logging
+from statistics import NormalDist
+
+import numpy as np
+
+from batch import simulate_batch, money_scale, DEFAULT_CHUNK_ELEMENTS
+
+logger = logging.getLogger(__name__)
+
+# Ruined trials needed before the normal interval of a variance-reduced
+# estimate is trusted; with fewer, the Wilson interval of the ruin count
+# bounds it as well (a run with no ruins has no variance to go on)
+MIN_RUIN_EVENTS = 10
+
+
+def z_score(confidence):
+    """Two-sided normal critical value for a confidence level"""
+    return NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+
+def wilson_interval(successes, trials, z):
+    """Wilson score interval for a binomial proportion"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denom = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denom
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def merge_moments(count, mean, m2, values):
+    """
+    Merge a batch of observations into running count/mean/co-moments (Chan et al.)
+
+    Args:
+        count: Observations merged so far
+        mean: Running mean vector
+        m2: Running co-moment matrix (sum of outer products of deviations)
+        values: Array shaped (observations, columns)
+
+    Returns:
+        Tuple of updated (count, mean, m2)
+    """
+    n = values.shape[0]
+    if n == 0:
+        return count, mean, m2
+    batch_mean = values.mean(axis=0)
+    centred = values - batch_mean
+    batch_m2 = centred.T @ centred
+    total = count + n
+    delta = batch_mean - mean
+    mean = mean + delta * n / total
+    m2 = m2 + batch_m2 + np.outer(delta, delta) * count * n / total
+    return total, mean, m2
+
+
+def controlled_estimate(count, mean, m2, column, control):
+    """
+    Mean of a column and the variance of that mean, adjusted by a control variate
+
+    The control column has known expectation zero. Without a control the
+    plain sample mean and its variance are returned.
+    """
+    variance = m2[column, column] / (count - 1) if count > 1 else 0.0
+    estimate = mean[column]
+    if control is not None and m2[control, control] > 0:
+        beta = m2[column, control] / m2[control, control]
+        estimate -= beta * mean[control]
+        residual = m2[column, column] - m2[column, control] * beta
+        variance = max(residual, 0.0) / (count - 1) if count > 1 else 0.0
+    return float(estimate), float(variance) / count
+
+
+def _batch_observations(state, importance_sampling, antithetic, scale=1):
+    """
+    Independent observations of (ruin, final balance, control) from a batch
+
+    Importance-sampled trials are reweighted by their likelihood ratio and
+    antithetic pairs are averaged into one observation. Balances and the
+    control are divided by scale (see batch.money_scale).
+    """
+    values = np.column_stack([state["ruin"].astype(float), state["balance"] / scale,
+                              state["control"] / scale])
+    if importance_sampling:
+        values *= np.exp(state["log_weight"])[:, None]
+    if antithetic:
+        half = values.shape[0] // 2
+        values = (values[:half] + values[half:2 * half]) / 2.0
+    return values
+
+
+def run_monte_carlo(params, rounds, precision=0.005, balance_precision=None,
+                    confidence=0.95, initial_trials=256, max_trials=100000,
+                    growth=2.0, max_seconds=None, seed=None,
+                    realistic_conditions=True, network_delay=True, error_simulation=True,
+                    antithetic=False, control_variate=False, loss_tilt=None,
+                    tilt_after_losses=0, chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Run batches of trials until the requested precision or budget is reached
+
+    Batches grow geometrically. After each batch the interval on ruin
+    probability and the normal interval on mean final balance are updated
+    from running statistics, so no per-trial results are kept. Plain runs
+    use a Wilson interval for ruin; with variance reduction the normal
+    interval of the (weighted, controlled) estimator is used instead,
+    widened to the Wilson interval of the ruin count until MIN_RUIN_EVENTS
+    ruined trials have been seen.
+
+    Args:
+        params: Parameters from batch.build_batch_params
+        rounds: Rounds per trial
+        precision: Target half-width of the ruin probability interval, or
+            None to run exactly max_trials trials
+        balance_precision: Optional target half-width of the mean final
+            balance interval
+        confidence: Confidence level of both intervals
+        initial_trials: Size of the first batch
+        max_trials: Trial budget
+        growth: Factor by which successive batches grow
+        max_seconds: Optional wall-clock budget
+        seed: Optional seed for reproducible runs
+        antithetic: Run trials in pairs with mirrored crash draws
+        control_variate: Adjust estimates with the realized minus analytic
+            expected P&L, which has known mean zero
+        loss_tilt: Per-round loss probability for importance sampling of
+            the crash distribution, or None to sample it unchanged
+        tilt_after_losses: Only tilt rounds played at this loss streak or
+            deeper, which keeps likelihood ratios stable over long runs
+        chunk_elements: Trial-rounds per block of streams (see simulate_batch)
+
+    Returns:
+        Dictionary with the estimates, achieved intervals and trials used
+    """
+    z = z_score(confidence)
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    importance_sampling = loss_tilt is not None
+    plain = not (antithetic or control_variate or importance_sampling)
+    control = 2 if control_variate else None
+    trials_per_observation = 2 if antithetic else 1
+
+    trials = 0
+    ruins = 0
+    observations = 0
+    mean = np.zeros(3)
+    m2 = np.zeros((3, 3))
+    batches = 0
+    batch_size = max(1, min(initial_trials, max_trials))
+    stop_reason = "max_trials"
+
+    while trials < max_trials:
+        if antithetic:
+            batch_size = max(2, batch_size + batch_size % 2)
+        state = simulate_batch(params, batch_size, rounds, rng, realistic_conditions,
+                               network_delay, error_simulation, chunk_elements,
+                               antithetic=antithetic, tilt_loss_probability=loss_tilt,
+                               tilt_after_losses=tilt_after_losses)
+        batches += 1
+        trials += batch_size
+        ruins += int(state["ruin"].sum())
+        values = _batch_observations(state, importance_sampling, antithetic, money_scale(params))
+        observations, mean, m2 = merge_moments(observations, mean, m2, values)
+
+        ruin, ruin_variance = controlled_estimate(observations, mean, m2, 0, control)
+        balance, balance_variance = controlled_estimate(observations, mean, m2, 1, control)
+        if plain:
+            low, high = wilson_interval(round(mean[0] * observations), observations, z)
+        else:
+            low = max(0.0, ruin - z * math.sqrt(ruin_variance))
+            high = min(1.0, ruin + z * math.sqrt(ruin_variance))
+            if ruins < MIN_RUIN_EVENTS:
+                wilson_low, wilson_high = wilson_interval(ruins, trials, z)
+                low, high = min(low, wilson_low), max(high, wilson_high)
+        ruin_half_width = (high - low) / 2
+        balance_half_width = z * math.sqrt(balance_variance)
+
+        ruin_done = precision is not None and ruin_half_width <= precision
+        balance_done = balance_precision is None or balance_half_width <= balance_precision
+        if ruin_done and balance_done:
+            stop_reason = "precision"
+            break
+        if max_seconds is not None and time.perf_counter() - started >= max_seconds:
+            stop_reason = "time_budget"
+            break
+
+        # Grow the next batch, but not far past the trials the current
+        # estimate says are still needed
+        next_size = int(math.ceil(batch_size * growth))
+        if precision is not None:
+            per_observation = max(ruin_variance * observations, 1.0 / observations)
+            needed = z * z * per_observation / (precision * precision) * trials_per_observation
+            next_size = min(next_size, max(initial_trials, int(needed) - trials))
+        batch_size = max(1, min(next_size, max_trials - trials))
+
+    # Variance of a plain Monte Carlo trial relative to what was achieved per trial
+    plain_variance = ruin * (1 - ruin)
+    achieved_variance = ruin_variance * observations * trials_per_observation
+    efficiency_gain = None
+    if ruins and achieved_variance > 0:
+        efficiency_gain = plain_variance / achieved_variance
+
+    logger.info("Monte Carlo finished after %s trials in %s batches (%s)",
+                trials, batches, stop_reason)
+
+    return {
+        "trials_used": trials,
+        "ruined_trials": ruins,
+        "batches": batches,
+        "converged": stop_reason == "precision",
+        "stop_reason": stop_reason,
+        "confidence": confidence,
+        "ruin_probability": round(ruin, 6),
+        "ruin_interval": [round(low, 6), round(high, 6)],
+        "ruin_half_width": round(ruin_half_width, 6),
+        "mean_final_balance": round(balance, 2),
+        "std_final_balance": round(math.sqrt(m2[1, 1] / (observations - 1)) if observations > 1 else 0.0, 2),
+        "final_balance_interval": [round(balance - balance_half_width, 2),
+                                   round(balance + balance_half_width, 2)],
+        "final_balance_half_width": round(balance_half_width, 4),
+        "variance_reduction": {
+            "antithetic": antithetic,
+            "control_variate": control_variate,
+            "importance_sampling": importance_sampling,
+            "loss_tilt": loss_tilt,
+            "tilt_after_losses": tilt_after_losses if importance_sampling else None,
+            "ruin_efficiency_gain": round(efficiency_gain, 2) if efficiency_gain else None,
+        },
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
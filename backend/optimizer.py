@@ -0,0 +1,285 @@
+import math
+import os
+import time
+import logging
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from batch import build_batch_params
+from montecarlo import z_score, wilson_interval
+from solver import common_random_numbers, run_on_streams, MAX_CACHED_ELEMENTS
+from shared_streams import SharedStreams, attach_streams
+from worker_pool import shared_pool
+
+logger = logging.getLogger(__name__)
+
+OPTIMIZER_OBJECTIVES = ('median_final_balance', 'mean_final_balance', 'target_probability')
+
+# Dimensions of the normalized search vector for custom_strategy_realistic
+SEARCH_DIMENSIONS = ('cashout_target', 'first_bet', 'multiplier', 'length',
+                     'stop_loss', 'take_profit', 'progression_type')
+MAX_SEQUENCE_LENGTH = 8
+
+# Crash batch of the rung a worker process evaluated last
+_worker_streams = {}
+
+
+def decode_candidate(x, bankroll, min_bet=0.10):
+    """
+    Map a point of the unit hypercube to custom strategy parameters
+
+    Cashout target and first bet are searched on a log scale; the bet
+    sequence is geometric (first_bet * multiplier ** i) so its length and
+    steepness are searched independently.
+    """
+    cashout_target = round(math.exp(math.log(1.1) + x[0] * (math.log(10.0) - math.log(1.1))), 2)
+    low_bet, high_bet = max(min_bet, 0.01), max(min_bet, bankroll / 10.0)
+    first_bet = math.exp(math.log(low_bet) + x[1] * (math.log(high_bet) - math.log(low_bet)))
+    multiplier = 1.0 + 2.0 * x[2]
+    length = 1 + min(MAX_SEQUENCE_LENGTH - 1, int(x[3] * MAX_SEQUENCE_LENGTH))
+    bets = [round(first_bet * multiplier ** i, 2) for i in range(length)]
+
+    return {
+        'cashout_target': cashout_target,
+        'bet_sequence': ','.join(str(max(0.01, b)) for b in bets),
+        'max_bet': max(bets),
+        'stop_loss': round(0.9 * bankroll * x[4], 2),
+        'take_profit': round(bankroll * (1.1 + 1.9 * x[5]), 2),
+        'progression_type': 'loss' if x[6] < 0.5 else 'win',
+    }
+
+
+def _rung_streams(seed, trials, rounds, conditions):
+    """Crash batch for a rung, generated once per worker process"""
+    key = (seed, trials, rounds, conditions)
+    if key not in _worker_streams:
+        _worker_streams.clear()
+        _worker_streams[key] = common_random_numbers(seed, trials, rounds, *conditions)
+    return _worker_streams[key]
+
+
+def evaluate_candidates(task):
+    """
+    Evaluate a list of candidates on one rung's shared crash batch
+
+    Runs in worker processes. The crash batch is attached from shared
+    memory when the task carries a SharedStreams descriptor, and otherwise
+    rebuilt from its seed in the worker; it is never shipped with the task.
+
+    Args:
+        task: Tuple of (candidates, bankroll, min_bet, max_bet, rounds,
+            trials, seed, conditions, shared) where candidates are
+            (id, custom_params) pairs and shared is a descriptor or None
+
+    Returns:
+        List of (id, stats) pairs
+    """
+    candidates, bankroll, min_bet, max_bet, rounds, trials, seed, conditions, shared = task
+    if shared is not None:
+        streams = attach_streams(shared)
+    else:
+        streams = _rung_streams(seed, trials, rounds, conditions)
+    results = []
+    for candidate_id, custom_params in candidates:
+        params = build_batch_params('custom', bankroll=bankroll, min_bet=min_bet,
+                                    max_bet=max_bet, custom_params=custom_params)
+        state = run_on_streams(params, trials, streams)
+        results.append((candidate_id, {
+            "trials": trials,
+            "ruins": int(state["ruin"].sum()),
+            "targets": int(state["target_reached"].sum()),
+            "median_final_balance": float(np.median(state["balance"])),
+            "mean_final_balance": float(state["balance"].mean()),
+        }))
+    return results
+
+
+def _evaluate_rung(tasks, pool, deadline):
+    """
+    Stats of the candidates evaluated before the deadline
+
+    Tasks hold one candidate each, so the wall-clock budget is checked
+    between evaluations; tasks not yet started at the deadline are
+    cancelled.
+
+    Returns:
+        Dictionary of stats by candidate id
+    """
+    stats = {}
+    if pool is None:
+        for task in tasks:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            stats.update(evaluate_candidates(task))
+        return stats
+
+    futures = [pool.submit(evaluate_candidates, task) for task in tasks]
+    try:
+        for future in as_completed(futures):
+            stats.update(future.result())
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+    return stats
+
+
+def _score(stats, objective, max_ruin):
+    """Sort key: feasible candidates by objective, then infeasible by ruin rate"""
+    ruin = stats["ruins"] / stats["trials"]
+    if ruin > max_ruin:
+        return (0, -ruin)
+    if objective == 'target_probability':
+        return (1, stats["targets"] / stats["trials"])
+    return (1, stats[objective])
+
+
+def optimize_custom_strategy(rounds, bankroll=100, objective='median_final_balance',
+                             max_ruin=0.05, candidates=64, generations=3, eta=3,
+                             min_trials=100, max_trials=3000, workers=None, max_seconds=30,
+                             seed=None, confidence=0.95, min_bet=0.10, max_bet=1000.0,
+                             realistic_conditions=True, network_delay=True,
+                             error_simulation=True):
+    """
+    Search custom strategy parameters with successive halving
+
+    Each generation samples candidates (uniformly at first, then around the
+    previous survivors with a shrinking radius) and runs successive halving:
+    every rung evaluates the remaining candidates in parallel on one shared
+    crash batch, keeps the best 1/eta and multiplies the trial count by eta.
+    Candidates whose Wilson lower bound on ruin already exceeds max_ruin are
+    pruned as hopeless at every rung. The search stops early when the
+    wall-clock budget runs out, checked after every candidate evaluation;
+    the last rung then ranks only the candidates it evaluated. In the
+    shared worker pool, each rung's crash batch is generated once and
+    published to the workers in shared memory.
+
+    Args:
+        rounds: Rounds per trial
+        bankroll: Starting bankroll
+        objective: "median_final_balance", "mean_final_balance" or
+            "target_probability" (reaching take_profit)
+        max_ruin: Ceiling on ruin probability (including stop-loss exits)
+        candidates: Candidates sampled per generation
+        generations: Number of sampling generations
+        eta: Halving rate and trial growth factor between rungs
+        min_trials, max_trials: Trials in the first and at most the last rung
+        workers: 1 evaluates inline, otherwise candidates are evaluated in
+            the shared worker pool (see worker_pool.py)
+        max_seconds: Wall-clock budget
+        seed: Optional seed for reproducible searches
+
+    Returns:
+        Dictionary with the best parameters, their statistics, a leaderboard
+        and a per-rung log
+    """
+    if objective not in OPTIMIZER_OBJECTIVES:
+        raise ValueError(f"Invalid objective: {objective}")
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    z = z_score(confidence)
+    workers = workers or os.cpu_count() or 1
+    conditions = (realistic_conditions, network_delay, error_simulation)
+    batch_seed = int(rng.integers(2 ** 63))
+
+    best = []  # (score, stats, params, x) of final-rung survivors
+    rungs = []
+    evaluated = 0
+    centres = None
+    radius = 0.25
+    out_of_time = False
+    deadline = None if max_seconds is None else started + max_seconds
+
+    pool = shared_pool() if workers > 1 else None
+    shared = {}  # (rung, trials) -> SharedStreams, reused by later generations
+    try:
+        for generation in range(generations):
+            if centres is None:
+                points = rng.random((candidates, len(SEARCH_DIMENSIONS)))
+            else:
+                picks = centres[rng.integers(len(centres), size=candidates)]
+                points = np.clip(picks + rng.normal(0, radius, picks.shape), 0.0, 1.0)
+                radius /= 2
+
+            pool_ids = list(range(candidates))
+            decoded = {i: decode_candidate(points[i], bankroll, min_bet) for i in pool_ids}
+            trials = min_trials
+            rung = 0
+            survivors = []
+
+            while pool_ids:
+                key = (rung, trials)
+                if pool and key not in shared and trials * rounds <= MAX_CACHED_ELEMENTS:
+                    shared[key] = SharedStreams(
+                        common_random_numbers(batch_seed + rung, trials, rounds, *conditions))
+                descriptor = shared[key].descriptor if key in shared else None
+                tasks = [([(i, decoded[i])], bankroll, min_bet, max_bet, rounds, trials,
+                          batch_seed + rung, conditions, descriptor) for i in pool_ids]
+                stats = _evaluate_rung(tasks, pool, deadline)
+                evaluated += len(stats)
+                out_of_time = deadline is not None and time.perf_counter() >= deadline
+                pool_ids = [i for i in pool_ids if i in stats]
+
+                # Hopeless: even the optimistic ruin bound is over the ceiling
+                hopeless = [i for i in pool_ids
+                            if wilson_interval(stats[i]["ruins"], trials, z)[0] > max_ruin]
+                ranked = sorted((i for i in pool_ids if i not in hopeless),
+                                key=lambda i: _score(stats[i], objective, max_ruin), reverse=True)
+                last_rung = trials >= max_trials or not ranked
+                keep = ranked if last_rung else ranked[:max(1, len(ranked) // eta)]
+
+                rungs.append({"generation": generation, "rung": rung, "trials": trials,
+                              "evaluated": len(pool_ids), "pruned_hopeless": len(hopeless),
+                              "kept": len(keep)})
+                survivors = [(_score(stats[i], objective, max_ruin), stats[i], decoded[i], points[i])
+                             for i in keep]
+
+                if out_of_time or last_rung:
+                    break
+                pool_ids = keep
+                # A lone survivor goes straight to a full-size confirmation rung
+                trials = max_trials if len(keep) == 1 else min(max_trials, trials * eta)
+                rung += 1
+
+            best.extend(survivors)
+            if survivors:
+                centres = np.array([s[3] for s in survivors])
+            if out_of_time:
+                break
+    finally:
+        for streams in shared.values():
+            streams.close()
+
+    # Prefer candidates confirmed on the most trials, then by score
+    best.sort(key=lambda s: (s[1]["trials"], s[0]), reverse=True)
+    leaderboard = []
+    for score, stats, params, _ in best[:5]:
+        n = stats["trials"]
+        low, high = wilson_interval(stats["ruins"], n, z)
+        leaderboard.append({
+            "params": params,
+            "feasible": score[0] == 1,
+            "trials": n,
+            "ruin_probability": round(stats["ruins"] / n, 6),
+            "ruin_interval": [round(low, 6), round(high, 6)],
+            "target_probability": round(stats["targets"] / n, 6),
+            "median_final_balance": round(stats["median_final_balance"], 2),
+            "mean_final_balance": round(stats["mean_final_balance"], 2),
+        })
+
+    elapsed = time.perf_counter() - started
+    logger.info("Optimizer evaluated %s candidate-rungs in %.2fs", evaluated, elapsed)
+
+    return {
+        "objective": objective,
+        "max_ruin": max_ruin,
+        "best": leaderboard[0] if leaderboard else None,
+        "leaderboard": leaderboard,
+        "rungs": rungs,
+        "evaluations": evaluated,
+        "stopped_on_time_budget": out_of_time,
+        "elapsed_seconds": round(elapsed, 3),
+    }
@@ -0,0 +1,157 @@
+import os
+import math
+import logging
+
+from batch import STATELESS_STRATEGIES, DEFAULT_CHUNK_ELEMENTS
+from latency import PROGRESSION_STRATEGIES
+from worker_pool import WORKER_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+# Execution paths, from cheapest to most expensive requests
+EXECUTION_PATHS = ('inline', 'vectorized', 'pool', 'background')
+
+# Measured costs in seconds: one round of the scalar simulator, one round of
+# the vectorized engine regardless of trials, and one trial-round on top
+SCALAR_ROUND_SECONDS = {'stateless': 2e-6, 'stateful': 4e-6, 'rules': 5e-6}
+BATCH_ROUND_SECONDS = {'stateless': 2e-6, 'stateful': 4e-5, 'rules': 6e-5}
+BATCH_ELEMENT_SECONDS = {'stateless': 7e-8, 'stateful': 1.6e-7, 'rules': 2e-7}
+
+# Measured costs in seconds of a latency simulation (see
+# latency.simulate_latency): one round stepped for martingale and paroli
+# players, and one bet of a stepped player or of one settled in blocks
+LATENCY_ROUND_SECONDS = 8e-5
+LATENCY_BET_SECONDS = {'stepped': 1.7e-7, 'block': 6e-8}
+
+# Measured cost of generating one hash-chain game (see fair.build_chain)
+CHAIN_GAME_SECONDS = 1e-6
+
+# Bytes held per trial-round of a stream block (uniforms, crashes, network
+# outcomes and delays), plus a balance per trial-round when paths are recorded
+STREAM_BYTES_PER_ELEMENT = 40
+PATH_BYTES_PER_ELEMENT = 8
+
+# Memory one request's stream blocks may use, shared by its workers
+REQUEST_MEMORY_BUDGET = int(os.environ.get('REQUEST_MEMORY_BUDGET', 128 * 1024 * 1024))
+MIN_CHUNK_ELEMENTS = 1 << 14
+
+# Bisection steps a solver request typically takes
+SOLVER_EVALUATIONS = 16
+
+# Requests estimated above MAX_INLINE_SECONDS run as background jobs;
+# parallel-capable ones above POOL_MIN_SECONDS use a process pool
+MAX_INLINE_SECONDS = float(os.environ.get('MAX_INLINE_SECONDS', 20.0))
+POOL_MIN_SECONDS = 2.0
+
+
+def strategy_kind(strategy):
+    """Cost class of a strategy: "stateless", "stateful" or "rules" """
+    if strategy == 'rules':
+        return 'rules'
+    return 'stateless' if strategy in STATELESS_STRATEGIES else 'stateful'
+
+
+def estimate_cost(strategy, rounds, trials=1, vectorized=True):
+    """
+    Estimated CPU seconds of simulating trials x rounds of a strategy
+
+    Args:
+        vectorized: Cost on the batch engine rather than the scalar
+            simulator
+    """
+    kind = strategy_kind(strategy)
+    if not vectorized:
+        return trials * rounds * SCALAR_ROUND_SECONDS[kind]
+    return rounds * (BATCH_ROUND_SECONDS[kind] + trials * BATCH_ELEMENT_SECONDS[kind])
+
+
+def estimate_group_cost(groups, rounds):
+    """Estimated CPU seconds of a table of player groups (see table.parse_player_groups)"""
+    return sum(estimate_cost(group['strategy'], rounds, group.get('count', 1)) for group in groups)
+
+
+def estimate_latency_cost(groups, rounds):
+    """Estimated CPU seconds of a latency simulation (see latency.parse_latency_groups)"""
+    stepped = sum(group.get('count', 1) for group in groups
+                  if group['strategy'] in PROGRESSION_STRATEGIES)
+    block = sum(group.get('count', 1) for group in groups) - stepped
+    cost = rounds * (stepped * LATENCY_BET_SECONDS['stepped'] + block * LATENCY_BET_SECONDS['block'])
+    return cost + (rounds * LATENCY_ROUND_SECONDS if stepped else 0.0)
+
+
+def estimate_chain_cost(length, cached=False):
+    """Estimated CPU seconds of loading a hash chain, building it unless cached"""
+    return 0.0 if cached else length * CHAIN_GAME_SECONDS
+
+
+def estimate_portfolio_cost(components, rounds, trials):
+    """
+    Estimated CPU seconds of a portfolio (see portfolio.simulate_portfolio)
+
+    Every component is stepped round by round, stateless ones included.
+    """
+    return len(components) * estimate_cost('portfolio', rounds, trials)
+
+
+def chunk_elements_for(workers=1, record=False, budget=None):
+    """Stream block size (trial-rounds) that keeps every worker within the memory budget"""
+    budget = REQUEST_MEMORY_BUDGET if budget is None else budget
+    per_element = STREAM_BYTES_PER_ELEMENT + (PATH_BYTES_PER_ELEMENT if record else 0)
+    chunk = budget // (max(1, workers) * per_element)
+    return int(min(DEFAULT_CHUNK_ELEMENTS, max(MIN_CHUNK_ELEMENTS, chunk)))
+
+
+def plan_request(strategy, rounds, trials=1, vectorized=True, parallel=False, record=False,
+                 repeats=1, max_seconds=None, cost=None, cpus=None):
+    """
+    Choose how to execute a simulation request
+
+    The scalar simulator runs single paths inline and the batch engine
+    runs many trials vectorized. Requests that can fan out across
+    processes do so once they are expensive enough to amortize the pool,
+    and requests estimated above MAX_INLINE_SECONDS become background jobs
+    instead of holding a connection open.
+
+    Args:
+        strategy: Strategy simulated
+        rounds: Rounds per trial
+        trials: Trials (or players, candidates x trials) simulated
+        vectorized: Whether the request runs on the batch engine
+        parallel: Whether the request can use a process pool
+        record: Whether per-round balances are kept for every trial
+        repeats: Times the trials are simulated (solver evaluations,
+            optimizer generations)
+        max_seconds: Time limit the request enforces itself, capping the cost
+        cost: Cost estimate to use instead of estimate_cost
+        cpus: Available CPUs (default the shared pool's WORKER_PROCESSES)
+
+    Returns:
+        Dictionary with "path" (one of EXECUTION_PATHS), the estimated
+        "cost" in CPU seconds, "workers" and "chunk_elements"
+    """
+    if cost is None:
+        cost = repeats * estimate_cost(strategy, rounds, trials, vectorized)
+    if max_seconds is not None:
+        cost = min(cost, max_seconds)
+    cpus = cpus or WORKER_PROCESSES
+
+    workers = 1
+    if cost > MAX_INLINE_SECONDS:
+        path = 'background'
+    elif not vectorized:
+        path = 'inline'
+    elif parallel and cpus > 1 and cost > POOL_MIN_SECONDS:
+        path = 'pool'
+    else:
+        path = 'vectorized'
+    if parallel and path in ('pool', 'background'):
+        workers = max(1, min(cpus, trials, math.ceil(cost / POOL_MIN_SECONDS)))
+
+    plan = {
+        "path": path,
+        "cost": round(cost, 4),
+        "workers": workers,
+        "chunk_elements": chunk_elements_for(workers, record),
+    }
+    logger.debug("Planned %s x %s trials x %s rounds: %s", strategy, trials, rounds, plan)
+    return plan
@@ -0,0 +1,286 @@
+import json
+import math
+import time
+import logging
+
+import numpy as np
+
+from batch import (
+    BATCH_STRATEGIES, DEFAULT_CHUNK_ELEMENTS, NETWORK_ERROR_RATE, MIN_NETWORK_DELAY,
+    MAX_NETWORK_DELAY, init_batch_state, generate_crash_batch, step_round
+)
+from table import group_params, check_group_amounts
+
+logger = logging.getLogger(__name__)
+
+MAX_PORTFOLIO_COMPONENTS = 8
+
+# How components draw on the shared bankroll
+ALLOCATIONS = ('priority', 'split')
+
+# Why a portfolio stopped playing
+END_REASONS = ('completed', 'ruin', 'stopped', 'stop_loss', 'take_profit')
+COMPLETED, RUIN, STOPPED, STOP_LOSS, TAKE_PROFIT = range(len(END_REASONS))
+
+# Percentiles of the final shared bankroll that are reported
+PORTFOLIO_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Strategies with their own stop_loss and take_profit
+LIMITED_STRATEGIES = ('custom', 'rules')
+
+
+def _component_limits(component):
+    """stop_loss and take_profit a custom or rules component set, by name"""
+    if component['strategy'] == 'custom':
+        spec = component
+    elif component['strategy'] == 'rules' and isinstance(component.get('rules'), dict):
+        spec = component['rules']
+    else:
+        return {}
+    return {key: spec[key] for key in ('stop_loss', 'take_profit') if spec.get(key) is not None}
+
+
+def parse_components(components, allocation='priority', bankroll=None):
+    """
+    Validate a portfolio's strategy components
+
+    Each component is an object with "strategy" and the strategy's
+    parameters as for a table player group (see table.parse_player_groups),
+    without "count" or "bankroll". Under split allocation it may set
+    "weight", its share of the bankroll; components without one share what
+    the others leave equally.
+
+    The stop_loss and take_profit of a custom or rules component are levels
+    of its own balance, which starts at its allocation (the whole bankroll
+    under priority, its weight's share under split) and moves with its
+    contribution. A custom component has no such limits unless it sets them.
+
+    Args:
+        bankroll: Starting shared bankroll; when given, component limits
+            that would stop a component before its first round are rejected
+
+    Returns:
+        The components, each with its "weight" filled in under split allocation
+
+    Raises:
+        ValueError: If the components, weights or limits are malformed
+    """
+    if allocation not in ALLOCATIONS:
+        raise ValueError(f"Invalid allocation: {allocation}")
+    if isinstance(components, str):
+        try:
+            components = json.loads(components)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid components JSON: {e}")
+    if not isinstance(components, list) or not components:
+        raise ValueError("components must be a non-empty list of strategies")
+    if len(components) > MAX_PORTFOLIO_COMPONENTS:
+        raise ValueError(f"A portfolio is limited to {MAX_PORTFOLIO_COMPONENTS} components")
+
+    for n, component in enumerate(components):
+        if not isinstance(component, dict):
+            raise ValueError(f"components[{n}] must be an object")
+        if component.get('strategy') not in BATCH_STRATEGIES:
+            raise ValueError(f"components[{n}]: invalid strategy {component.get('strategy')}")
+        weight = component.get('weight')
+        if weight is not None and (not isinstance(weight, (int, float)) or isinstance(weight, bool)
+                                   or not 0 < weight <= 1):
+            raise ValueError(f"components[{n}]: weight must be in (0, 1]")
+        check_group_amounts(component, f"components[{n}]")
+        for key, limit in _component_limits(component).items():
+            if not isinstance(limit, (int, float)) or isinstance(limit, bool) or math.isnan(limit):
+                raise ValueError(f"components[{n}]: {key} must be a number")
+
+    if allocation == 'split':
+        given = sum(c['weight'] for c in components if c.get('weight') is not None)
+        if given > 1 + 1e-9:
+            raise ValueError("Component weights must sum to at most 1")
+        unweighted = sum(1 for c in components if c.get('weight') is None)
+        rest = (1 - given) / unweighted if unweighted else 0.0
+        if unweighted and rest <= 0:
+            raise ValueError("Weighted components leave no bankroll for the others")
+        components = [dict(c, weight=c['weight'] if c.get('weight') is not None else rest)
+                      for c in components]
+
+    if bankroll is not None:
+        for n, component in enumerate(components):
+            share = bankroll * component['weight'] if allocation == 'split' else bankroll
+            limits = _component_limits(component)
+            if limits.get('stop_loss', -math.inf) >= share:
+                raise ValueError(f"components[{n}]: stop_loss must be below the component's "
+                                 f"allocation of {share:.2f}")
+            if limits.get('take_profit', math.inf) <= share:
+                raise ValueError(f"components[{n}]: take_profit must be above the component's "
+                                 f"allocation of {share:.2f}")
+    return components
+
+
+def simulate_portfolio(components, trials, rounds, bankroll, allocation='priority',
+                       stop_loss=None, take_profit=None, seed=None, realistic_conditions=True,
+                       network_delay=True, error_simulation=True, min_bet=0.10, max_bet=1000.0,
+                       chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Several strategies played together from one bankroll
+
+    Every component keeps its own batch state (bets, streaks, progression)
+    and all of them advance in lockstep over one crash stream per trial,
+    vectorized across trials. Their bets are placed from a single shared
+    balance per trial:
+
+    - priority: components settle in the order given, each betting from the
+      balance left after the ones before it
+    - split: each component bets from its weight's share of the balance at
+      the start of the round, so the round's stakes never exceed it
+
+    A component that cannot cover its bet is ruined and plays no further
+    rounds, as in the single-strategy simulators; stateless strategies
+    (early, dual, ladder...) bet from the shared balance here too. The
+    portfolio is ruined once all its components are. stop_loss and
+    take_profit stop every component once the shared balance reaches them;
+    a component's own limits apply to its own balance (see
+    parse_components).
+
+    Args:
+        components: Strategy components, see parse_components
+        trials: Number of independent portfolios
+        rounds: Rounds per portfolio
+        bankroll: Starting shared bankroll
+        allocation: One of ALLOCATIONS
+        stop_loss: Shared balance at or below which the portfolio stops
+        take_profit: Shared balance at or above which the portfolio stops
+        seed: Optional seed for reproducible runs
+
+    Returns:
+        Dictionary with joint outcomes (ruin, end reasons, final bankroll)
+        and per-component contributions to the shared P&L
+    """
+    components = parse_components(components, allocation, bankroll)
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    simulate_network = realistic_conditions and network_delay
+
+    members = []
+    shares = []
+    limits = []
+    for component in components:
+        if component['strategy'] == 'custom':
+            # No limits of its own unless it sets them
+            component = dict(component, stop_loss=component.get('stop_loss', -math.inf),
+                             take_profit=component.get('take_profit', math.inf))
+        params = group_params(dict(component, count=trials), rng, min_bet, max_bet)
+        if params["strategy"] == 'rules':
+            # Its limits are moved every round below, so take a copy
+            params["table"] = dict(params["table"])
+        members.append((component, params, init_batch_state(params, trials)))
+        shares.append(bankroll * component['weight'] if allocation == 'split' else float(bankroll))
+        limits.append(_component_limits(component))
+    contribution = np.zeros((len(members), trials))
+
+    balance = np.full(trials, float(bankroll))
+    reason = np.full(trials, COMPLETED)
+    end_round = np.full(trials, rounds)
+    running = np.ones(trials, dtype=bool)
+    chunk_rounds = max(1, min(rounds, chunk_elements // max(1, trials * len(members))))
+
+    done = 0
+    while done < rounds and running.any():
+        n = min(chunk_rounds, rounds - done)
+        crash = generate_crash_batch(rng, (trials, n))
+        blocks = []
+        for _ in members:
+            if not simulate_network:
+                blocks.append((None, None))
+                continue
+            if error_simulation:
+                net_ok = rng.random((trials, n)) >= NETWORK_ERROR_RATE
+            else:
+                net_ok = np.ones((trials, n), dtype=bool)
+            blocks.append((net_ok, rng.uniform(MIN_NETWORK_DELAY, MAX_NETWORK_DELAY, (trials, n))))
+
+        for j in range(n):
+            # Shared stop conditions, checked before the round's bets
+            for limit, sign, flag in ((stop_loss, -1, STOP_LOSS), (take_profit, 1, TAKE_PROFIT)):
+                if limit is None:
+                    continue
+                stopped = running & (sign * (balance - limit) >= 0)
+                reason[stopped] = flag
+                end_round[stopped] = done + j
+                running &= ~stopped
+
+            start = balance.copy()
+            for k, ((component, params, state), (net_ok, delay)) in enumerate(zip(members, blocks)):
+                state["active"] &= running
+                if allocation == 'split':
+                    view = np.floor(start * component['weight'] * 100) / 100
+                else:
+                    view = balance.copy()
+                state["balance"][:] = view
+                if params["strategy"] in LIMITED_STRATEGIES:
+                    # The batch step compares its limits with the balance it
+                    # bets from; shift them so they apply to the component's
+                    # own balance instead
+                    holder = params if params["strategy"] == 'custom' else params["table"]
+                    offset = view - (shares[k] + contribution[k])
+                    for key, limit in limits[k].items():
+                        holder[key] = limit + offset
+                step_round(params, state, crash[:, j],
+                           None if net_ok is None else net_ok[:, j],
+                           None if delay is None else delay[:, j])
+                pnl = state["balance"] - view
+                balance += pnl
+                contribution[k] += pnl
+
+            # Portfolios whose components have all stopped
+            alive = np.zeros(trials, dtype=bool)
+            all_ruined = np.ones(trials, dtype=bool)
+            for _, _, state in members:
+                alive |= state["active"]
+                all_ruined &= state["ruin"]
+            ended = running & ~alive
+            reason[ended] = np.where(all_ruined[ended], RUIN, STOPPED)
+            end_round[ended] = done + j + 1
+            running &= alive
+            if not running.any():
+                break
+        done += n
+
+    ruined = reason == RUIN
+    summaries = []
+    for k, (component, params, state) in enumerate(members):
+        summary = {
+            "strategy": component['strategy'],
+            "contribution_mean": round(float(contribution[k].mean()), 4),
+            "contribution_std": round(float(contribution[k].std()), 4),
+            "wagered_mean": round(float(state["wagered"].mean()), 4),
+            "rounds_played_mean": round(float(state["rounds_played"].mean()), 2),
+            "ruin_rate": round(float(state["ruin"].mean()), 6),
+            # Ruined while the portfolio as a whole was not
+            "starved_rate": round(float((state["ruin"] & ~ruined).mean()), 6),
+            "target_rate": round(float(state["target_reached"].mean()), 6),
+        }
+        if allocation == 'split':
+            summary["weight"] = round(component['weight'], 6)
+        summaries.append(summary)
+
+    elapsed = time.perf_counter() - started
+    logger.info("Portfolio simulation: %d components x %d trials x %d rounds in %.2fs",
+                len(members), trials, rounds, elapsed)
+
+    percentiles = np.percentile(balance, PORTFOLIO_PERCENTILES)
+    return {
+        "trials": trials,
+        "rounds": rounds,
+        "bankroll": bankroll,
+        "allocation": allocation,
+        "stop_loss": stop_loss,
+        "take_profit": take_profit,
+        "ruin_probability": round(float(ruined.mean()), 6),
+        "end_reasons": {name: int((reason == i).sum()) for i, name in enumerate(END_REASONS)},
+        "rounds_mean": round(float(end_round.mean()), 2),
+        "mean_final_balance": round(float(balance.mean()), 4),
+        "median_final_balance": round(float(np.median(balance)), 4),
+        "final_balance_percentiles": {f"p{p}": round(float(v), 4)
+                                      for p, v in zip(PORTFOLIO_PERCENTILES, percentiles)},
+        "components": summaries,
+        "elapsed_seconds": round(elapsed, 3),
+    }
@@ -0,0 +1,197 @@
+import os
+import json
+import zlib
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+
+import numpy as np
+
+from money import CENTS, array_to_cents
+
+logger = logging.getLogger(__name__)
+
+RUN_STORE_PATH = os.environ.get('RUN_STORE_PATH',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runs.db'))
+
+RUN_ORDERS = {
+    'newest': 'created_at DESC, id DESC',
+    'oldest': 'created_at ASC, id ASC',
+    'final_balance_desc': 'final_balance DESC, id DESC',
+    'final_balance_asc': 'final_balance ASC, id ASC',
+}
+MAX_RUNS_PAGE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    rounds INTEGER NOT NULL,
+    bankroll REAL NOT NULL,
+    final_balance REAL NOT NULL,
+    ruin_occurred INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    history_format TEXT NOT NULL,
+    history_length INTEGER NOT NULL,
+    history BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created_at, id);
+CREATE INDEX IF NOT EXISTS runs_strategy_created ON runs (strategy, created_at, id);
+CREATE INDEX IF NOT EXISTS runs_final_balance ON runs (final_balance, id);
+"""
+
+# Summary columns returned by list queries; histories are only read on demand
+SUMMARY_COLUMNS = 'id, created_at, strategy, rounds, bankroll, final_balance, ruin_occurred, params, summary'
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def _connect(path=None):
+    """Connection to the run store, creating the schema on first use"""
+    path = path or RUN_STORE_PATH
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _initialized:
+        with _init_lock:
+            if path not in _initialized:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(SCHEMA)
+                _initialized.add(path)
+    return conn
+
+
+def encode_history(history):
+    """
+    Compress a balance history into a blob
+
+    Histories rounded to the cent are stored as zlib-compressed int64 cent
+    deltas, which are mostly small and repetitive; anything else falls back
+    to raw float64 values.
+
+    Returns:
+        Tuple of (format, blob)
+    """
+    values = np.asarray(history, dtype=float)
+    cents = array_to_cents(values)
+    if np.array_equal(cents / CENTS, values):
+        deltas = np.diff(cents, prepend=0).astype('<i8')
+        return 'cents_delta', zlib.compress(deltas.tobytes(), 6)
+    return 'f8', zlib.compress(values.astype('<f8').tobytes(), 6)
+
+
+def decode_history(history_format, blob):
+    """Inverse of encode_history, as a list of floats"""
+    data = zlib.decompress(blob)
+    if history_format == 'cents_delta':
+        return (np.cumsum(np.frombuffer(data, dtype='<i8')) / CENTS).tolist()
+    return np.frombuffer(data, dtype='<f8').tolist()
+
+
+def save_run(params, result, path=None):
+    """
+    Persist a finished simulation
+
+    Args:
+        params: Simulation arguments the run was made with
+        result: simulate_strategy result including its history
+
+    Returns:
+        Id of the stored run
+    """
+    summary = {k: v for k, v in result.items() if k != 'history'}
+    history_format, blob = encode_history(result['history'])
+    created_at = datetime.now(timezone.utc).isoformat(timespec='microseconds')
+    with closing(_connect(path)) as conn, conn:
+        cursor = conn.execute(
+            'INSERT INTO runs (created_at, strategy, rounds, bankroll, final_balance, ruin_occurred,'
+            ' params, summary, history_format, history_length, history)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (created_at, params['strategy'], params['rounds'], params['bankroll'],
+             result['final_balance'], int(bool(result['ruin_occurred'])),
+             json.dumps(params), json.dumps(summary), history_format,
+             len(result['history']), blob))
+        run_id = cursor.lastrowid
+    logger.info("Stored run %s: %s with %s rounds in %s bytes",
+                run_id, params['strategy'], len(result['history']), len(blob))
+    return run_id
+
+
+def _run_row(row):
+    """Summary dictionary of a runs row"""
+    run_id, created_at, strategy, rounds, bankroll, final_balance, ruin, params, summary = row
+    return {
+        "id": run_id,
+        "created_at": created_at,
+        "strategy": strategy,
+        "rounds": rounds,
+        "bankroll": bankroll,
+        "final_balance": final_balance,
+        "ruin_occurred": bool(ruin),
+        "params": json.loads(params),
+        "summary": json.loads(summary),
+    }
+
+
+def list_runs(strategy=None, since=None, until=None, min_final_balance=None,
+              max_final_balance=None, order='newest', limit=50, offset=0, path=None):
+    """
+    Page of stored run summaries, without histories
+
+    Args:
+        strategy: Only runs of this strategy
+        since, until: ISO timestamps bounding created_at (inclusive, exclusive)
+        min_final_balance, max_final_balance: Inclusive final balance bounds
+        order: One of RUN_ORDERS
+        limit, offset: Page size and position
+
+    Returns:
+        Dictionary with the page of runs and the total number of matches
+    """
+    if order not in RUN_ORDERS:
+        raise ValueError(f"order must be one of {', '.join(RUN_ORDERS)}")
+
+    clauses, args = [], []
+    for clause, value in (('strategy = ?', strategy), ('created_at >= ?', since),
+                          ('created_at < ?', until), ('final_balance >= ?', min_final_balance),
+                          ('final_balance <= ?', max_final_balance)):
+        if value is not None:
+            clauses.append(clause)
+            args.append(value)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    with closing(_connect(path)) as conn:
+        total = conn.execute(f'SELECT COUNT(*) FROM runs{where}', args).fetchone()[0]
+        rows = conn.execute(f'SELECT {SUMMARY_COLUMNS} FROM runs{where} ORDER BY {RUN_ORDERS[order]}'
+                            ' LIMIT ? OFFSET ?', args + [limit, offset]).fetchall()
+
+    return {
+        "runs": [_run_row(row) for row in rows],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
+
+
+def get_run_history(run_id, path=None):
+    """
+    Balance history of a stored run
+
+    Returns:
+        List of balances, or None if there is no such run
+    """
+    with closing(_connect(path)) as conn:
+        row = conn.execute('SELECT history_format, history FROM runs WHERE id = ?',
+                           (run_id,)).fetchone()
+    if row is None:
+        return None
+    return decode_history(*row)
+
+
+def delete_run(run_id, path=None):
+    """Remove a stored run; returns whether it existed"""
+    with closing(_connect(path)) as conn, conn:
+        return conn.execute('DELETE FROM runs WHERE id = ?', (run_id,)).rowcount > 0
@@ -0,0 +1,286 @@
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from simulator import simulate_strategy
+from batch import STATELESS_STRATEGIES
+from validation import parse_simulation_args, validate_int
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ('parquet', 'arrow', 'csv')
+PART_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+# Rows per part file
+DEFAULT_PART_ROWS = 1000
+
+# Summary columns written for every scenario and their Arrow types
+RESULT_COLUMNS = (
+    ('id', 'string'), ('status', 'string'), ('error', 'string'), ('strategy', 'string'),
+    ('rounds', 'int64'), ('bet', 'float64'), ('bankroll', 'float64'), ('seed', 'int64'),
+    ('final_balance', 'float64'), ('min_balance', 'float64'), ('max_drawdown', 'float64'),
+    ('ruin_occurred', 'bool'), ('target_reached', 'bool'), ('rounds_played', 'int64'),
+    ('end_round', 'int64'), ('max_loss_streak', 'int64'), ('network_errors', 'int64'),
+    ('bet_limit_hits', 'int64'), ('total_delay', 'float64'), ('elapsed_ms', 'float64'),
+    ('config', 'string'),
+)
+
+
+def load_scenarios(path):
+    """
+    Read and check a scenario file
+
+    Returns:
+        List of scenario dictionaries, ids as strings
+
+    Raises:
+        ValueError: If the file is malformed or ids are missing or repeated
+    """
+    with open(path) as f:
+        text = f.read()
+    try:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ValueError("YAML scenario files require PyYAML")
+            scenarios = yaml.safe_load(text)
+        elif path.endswith('.jsonl'):
+            scenarios = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            scenarios = json.loads(text)
+    except (json.JSONDecodeError, getattr(yaml, 'YAMLError', json.JSONDecodeError)) as e:
+        raise ValueError(f"Invalid scenario file {path}: {e}")
+
+    if not isinstance(scenarios, list):
+        raise ValueError("A scenario file must hold a list of scenarios")
+    seen = set()
+    for n, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict) or scenario.get('id') is None:
+            raise ValueError(f"Scenario {n} must be an object with an id")
+        scenario['id'] = str(scenario['id'])
+        if scenario['id'] in seen:
+            raise ValueError(f"Duplicate scenario id: {scenario['id']}")
+        seen.add(scenario['id'])
+    return scenarios
+
+
+def run_scenario(scenario):
+    """
+    Simulate one scenario and summarize it as a result row
+
+    Invalid scenarios and failed simulations give a row with status
+    "error" instead of raising, so one bad entry does not stop a batch.
+    """
+    row = dict.fromkeys(name for name, _ in RESULT_COLUMNS)
+    row.update(id=scenario['id'], config=json.dumps(scenario, sort_keys=True, default=str))
+    started = time.perf_counter()
+    try:
+        params, error = parse_simulation_args(scenario)
+        if not error:
+            seed = scenario.get('seed')
+            if seed is not None:
+                seed = validate_int(seed, None, 0, 2 ** 63 - 1, "seed")
+            row.update(strategy=params['strategy'], rounds=params['rounds'], bet=params['bet'],
+                       bankroll=params['bankroll'], seed=seed)
+            result = simulate_strategy(**params, seed=seed)
+            error = result.get('error')
+    except ValueError as e:
+        error = str(e)
+    except Exception as e:
+        logger.error("Scenario %s failed: %s", scenario['id'], e)
+        error = f"Internal error: {e}"
+    row['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    if error:
+        row.update(status='error', error=error)
+        return row
+
+    # The starting balance is the first peak, so a run that only loses has
+    # its full loss as drawdown; stateless strategies track P&L from zero
+    start = 0.0 if params['strategy'] in STATELESS_STRATEGIES else params['bankroll']
+    history = np.concatenate(([start], np.asarray(result['history'], dtype=float)))
+    row['min_balance'] = float(history.min())
+    row['max_drawdown'] = float((np.maximum.accumulate(history) - history).max())
+    row.update({name: result.get(name) for name in (
+        'final_balance', 'ruin_occurred', 'target_reached', 'rounds_played', 'end_round',
+        'max_loss_streak', 'network_errors', 'bet_limit_hits', 'total_delay')})
+    row['status'] = 'ok'
+    return row
+
+
+def _parts(output):
+    """Complete part files in an output directory"""
+    return sorted(path for path in glob.glob(os.path.join(output, 'part-*'))
+                  if path.endswith(tuple(PART_EXTENSIONS.values())))
+
+
+def completed_ids(output):
+    """
+    Ids of the scenarios already run successfully in an output directory
+
+    Scenarios that failed are not included, so a rerun retries them.
+
+    Raises:
+        ValueError: If there are Parquet or Arrow parts and no pyarrow
+    """
+    done = set()
+    for path in _parts(output):
+        if path.endswith('.csv'):
+            with open(path, newline='') as f:
+                done.update(row['id'] for row in csv.DictReader(f) if row['status'] == 'ok')
+            continue
+        if pa is None:
+            raise ValueError(f"Reading {path} requires pyarrow")
+        if path.endswith('.parquet'):
+            table = pa.parquet.read_table(path, columns=['id', 'status'])
+        else:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+        done.update(id_ for id_, status in zip(table.column('id').to_pylist(),
+                                               table.column('status').to_pylist())
+                    if status == 'ok')
+    return done
+
+
+def write_part(output, number, rows, fmt):
+    """Write rows to the next part file, which only appears once complete"""
+    path = os.path.join(output, f'part-{number:05d}{PART_EXTENSIONS[fmt]}')
+    partial = path + '.tmp'
+    if fmt == 'csv':
+        with open(partial, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=[name for name, _ in RESULT_COLUMNS])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        schema = pa.schema([(name, pa.type_for_alias(kind)) for name, kind in RESULT_COLUMNS])
+        table = pa.Table.from_pylist(rows, schema=schema)
+        if fmt == 'parquet':
+            pa.parquet.write_table(table, partial)
+        else:
+            with pa.OSFile(partial, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+                writer.write_table(table)
+    os.replace(partial, path)
+    return path
+
+
+def run_scenarios(scenarios, output, fmt=None, workers=None, part_rows=DEFAULT_PART_ROWS):
+    """
+    Run scenarios in a process pool and stream their rows to part files
+
+    Scenarios that already ran successfully in output are skipped, so
+    rerunning an interrupted batch picks up where it stopped and retries
+    the ones that failed. A retried scenario's new row goes to a later part
+    file than its failed one; the row in the latest part is current.
+
+    Args:
+        scenarios: Scenarios from load_scenarios
+        output: Output directory, created if missing
+        fmt: One of OUTPUT_FORMATS; parquet with pyarrow installed, else csv
+        workers: Worker processes (default os.cpu_count())
+        part_rows: Rows per part file
+
+    Returns:
+        Dictionary with counts of scenarios run, skipped and failed
+
+    Raises:
+        ValueError: If the format needs pyarrow and it is not installed
+    """
+    fmt = fmt or ('parquet' if pa is not None else 'csv')
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Invalid output format: {fmt}")
+    if fmt != 'csv' and pa is None:
+        raise ValueError(f"The {fmt} format requires pyarrow; use csv")
+    os.makedirs(output, exist_ok=True)
+
+    done = completed_ids(output)
+    pending = [s for s in scenarios if s['id'] not in done]
+    number = len(_parts(output))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending) or 1))
+    started = time.perf_counter()
+    logger.info("Running %d scenarios (%d already done) on %d workers",
+                len(pending), len(scenarios) - len(pending), workers)
+
+    failed = written = 0
+    rows = []
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if pool:
+            chunksize = max(1, min(64, len(pending) // (8 * workers)))
+            results = pool.map(run_scenario, pending, chunksize=chunksize)
+        else:
+            results = map(run_scenario, pending)
+        for row in results:
+            failed += row['status'] == 'error'
+            rows.append(row)
+            if len(rows) >= part_rows:
+                write_part(output, number, rows, fmt)
+                number += 1
+                written += len(rows)
+                rows = []
+                logger.info("%d/%d scenarios written", written, len(pending))
+    finally:
+        # Keep what finished, also when interrupted
+        if rows:
+            write_part(output, number, rows, fmt)
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    logger.info("Ran %d scenarios in %.2fs", len(pending), elapsed)
+    return {"run": len(pending), "skipped": len(scenarios) - len(pending), "failed": failed,
+            "format": fmt, "elapsed_seconds": round(elapsed, 3)}
+
+
+def main(argv=None):
+    """
+    Command line entry point
+
+        python scenarios.py nightly.json --output results/ --workers 8
+
+    A scenario is an object with a unique "id" and the /simulate query
+    arguments ("strategy", "rounds", "bet", "seed"...), validated the same
+    way. Scenario files are a JSON list, JSON lines (.jsonl) or YAML (with
+    PyYAML installed).
+    """
+    parser = argparse.ArgumentParser(description="Run simulation scenarios offline, one result "
+                                                 "row per scenario")
+    parser.add_argument('scenarios', help="Scenario file (.json, .jsonl, .yaml)")
+    parser.add_argument('--output', '-o', required=True, help="Output directory for part files")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help="Output format (default parquet, or csv without pyarrow)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--part-rows', type=int, default=DEFAULT_PART_ROWS, help="Rows per part file")
+    args = parser.parse_args(argv)
+
+    # One log line per scenario is noise at this scale
+    logging.getLogger('simulator').setLevel(logging.WARNING)
+    try:
+        summary = run_scenarios(load_scenarios(args.scenarios), args.output, args.format,
+                                args.workers, max(1, args.part_rows))
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
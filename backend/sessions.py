@@ -0,0 +1,268 @@
+import time
+import logging
+
+import numpy as np
+
+from batch import (
+    DEFAULT_CHUNK_ELEMENTS, STATELESS_STRATEGIES, init_batch_state, advance_batch,
+    generate_streams, stateless_stake, money_scale
+)
+
+logger = logging.getLogger(__name__)
+
+# Why a session ended
+STOP_REASONS = ('completed', 'loss_limit', 'win_goal', 'ruin', 'target')
+COMPLETED, LOSS_LIMIT, WIN_GOAL, RUIN, TARGET = range(len(STOP_REASONS))
+
+# Percentiles of the bankroll reported after every session
+SESSION_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Largest players x sessions x rounds a request may simulate
+MAX_SESSION_ELEMENTS = 500_000_000
+
+
+def _first(mask):
+    """Index of the first True in each row of mask, or -1 for rows without one"""
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), -1)
+
+
+def _settle(outcome, open_, path, before, start, done, limits, stake):
+    """
+    Close the sessions that end within a block of recorded rounds
+
+    A session ends after the first round whose session P&L reaches the
+    loss limit or the win goal. With stake set (strategies without
+    bankroll state, which never stop on their own) it also ends before the
+    first round the balance cannot cover the stake.
+
+    Args:
+        outcome: Tuple of (end, length, reason) arrays, updated in place
+        open_: Players whose session is still running, updated in place
+        path: Balance of every player after each round of the block
+        before: Balances before the block
+        start: Balances at the start of the session
+        done: Session rounds played before the block
+        limits: (loss_limit, win_goal) in balance units
+        stake: Stake per round of a stateless strategy, else None
+    """
+    end, length, reason = outcome
+    loss_limit, win_goal = limits
+    pnl = path - start[:, None]
+    lost = pnl <= -loss_limit
+    crossed = _first(open_[:, None] & (lost | (pnl >= win_goal)))
+
+    ruined = np.zeros(path.shape[0], dtype=bool)
+    if stake is not None:
+        balance_before = np.concatenate([before[:, None], path[:, :-1]], axis=1)
+        broke = _first(open_[:, None] & (balance_before < stake))
+        ruined = (broke >= 0) & ((crossed < 0) | (broke <= crossed))
+        lanes = np.flatnonzero(ruined)
+        end[lanes] = balance_before[lanes, broke[lanes]]
+        length[lanes] = done + broke[lanes]
+        reason[lanes] = RUIN
+
+    limited = (crossed >= 0) & ~ruined
+    lanes = np.flatnonzero(limited)
+    end[lanes] = path[lanes, crossed[lanes]]
+    length[lanes] = done + crossed[lanes] + 1
+    reason[lanes] = np.where(lost[lanes, crossed[lanes]], LOSS_LIMIT, WIN_GOAL)
+
+    open_ &= ~(ruined | limited)
+
+
+def _play_session(params, start, playing, rounds, rng, limits, stream_args, chunk_elements):
+    """
+    One session of every player, vectorized across players
+
+    The strategy starts afresh (base bet, streaks, profit target) from each
+    player's carried balance. Rounds run in blocks of chunk_elements with
+    their balances recorded, so session stops are found per block.
+
+    Returns:
+        Tuple of (end balance, rounds played, stop reason) arrays
+    """
+    trials = start.shape[0]
+    stake = stateless_stake(params) if params["strategy"] in STATELESS_STRATEGIES else None
+    state = init_batch_state(params, trials)
+    state["balance"][:] = start
+    state["active"] &= playing
+    outcome = (start.copy(), np.zeros(trials, dtype=np.int64), np.full(trials, COMPLETED))
+    open_ = playing.copy()
+    chunk_rounds = max(1, chunk_elements // max(1, trials))
+
+    done = 0
+    while done < rounds and open_.any():
+        n = min(chunk_rounds, rounds - done)
+        streams = generate_streams(rng, trials, n, distribution=params.get("distribution"),
+                                   **stream_args)
+        before = state["balance"].copy()
+        was_active = state["active"].copy()
+        path = advance_batch(params, state, streams, record=True)
+        _settle(outcome, open_, path, before, start, done, limits, stake)
+
+        # Sessions the strategy itself ended (ruin, its own target)
+        stopped = open_ & was_active & ~state["active"]
+        lanes = np.flatnonzero(stopped)
+        outcome[0][lanes] = state["balance"][lanes]
+        outcome[1][lanes] = state["stop_round"][lanes]
+        outcome[2][lanes] = np.where(state["ruin"][lanes], RUIN, TARGET)
+        open_ &= ~stopped
+        state["active"] &= open_
+        done += n
+
+    lanes = np.flatnonzero(open_)
+    outcome[0][lanes] = state["balance"][lanes]
+    outcome[1][lanes] = rounds
+    return outcome
+
+
+def _play_stateless_sessions(params, start, playing, sessions, rounds, rng, limits, stream_args):
+    """
+    Several sessions of a strategy without bankroll state at once
+
+    Such a strategy's P&L does not depend on the balance, so the P&L paths
+    of all the sessions are simulated together as sessions x players
+    lanes; only the carried balance, which decides ruin, is then applied
+    session by session.
+
+    Returns:
+        List of (end balance, rounds played, stop reason) per session
+    """
+    trials = start.shape[0]
+    stake = stateless_stake(params)
+    state = init_batch_state(params, sessions * trials)
+    state["balance"][:] = 0
+    streams = generate_streams(rng, sessions * trials, rounds,
+                               distribution=params.get("distribution"), **stream_args)
+    pnl = advance_batch(params, state, streams, record=True).reshape(sessions, trials, rounds)
+
+    outcomes = []
+    for s in range(sessions):
+        path = start[:, None] + pnl[s]
+        outcome = (start.copy(), np.zeros(trials, dtype=np.int64), np.full(trials, COMPLETED))
+        open_ = playing.copy()
+        _settle(outcome, open_, path, start, start, 0, limits, stake)
+        lanes = np.flatnonzero(open_)
+        outcome[0][lanes] = path[lanes, -1]
+        outcome[1][lanes] = rounds
+        outcomes.append(outcome)
+        start = outcome[0]
+        playing = playing & (outcome[2] != RUIN)
+    return outcomes
+
+
+def simulate_sessions(params, trials, sessions, session_rounds, bankroll, session_loss_limit=None,
+                      session_win_goal=None, paths=10, seed=None, realistic_conditions=True,
+                      network_delay=True, error_simulation=True,
+                      chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Players who play many sessions over one bankroll
+
+    Each of trials players plays up to sessions sessions of up to
+    session_rounds rounds. A session ends early once its P&L reaches
+    -session_loss_limit or +session_win_goal, or when the strategy stops
+    on its own (a target_profit or custom take-profit target ends the
+    session too); the next session starts the strategy afresh with the
+    bankroll left. Ruined players play no further sessions.
+
+    Sessions run one after another, each vectorized across players. For
+    strategies without bankroll state, blocks of sessions that fit in
+    chunk_elements are simulated together as well.
+
+    Args:
+        params: Parameters from batch.build_batch_params
+        trials: Number of players
+        sessions: Sessions per player
+        session_rounds: Rounds per session
+        bankroll: Starting bankroll of every player
+        session_loss_limit: Session loss at which a player stops for the day
+        session_win_goal: Session win at which a player stops for the day
+        paths: Players whose bankroll after every session is returned
+        seed: Optional seed for reproducible runs
+
+    Returns:
+        Dictionary with per-session summaries across players, bankroll
+        percentiles after every session, sample bankroll paths and totals
+
+    Raises:
+        ValueError: If the run is larger than MAX_SESSION_ELEMENTS
+    """
+    if trials * sessions * session_rounds > MAX_SESSION_ELEMENTS:
+        raise ValueError(f"players x sessions x session_rounds must be at most {MAX_SESSION_ELEMENTS}")
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    scale = money_scale(params)
+    dtype = np.int64 if params.get("cents") else float
+    limits = (np.inf if session_loss_limit is None else session_loss_limit * scale,
+              np.inf if session_win_goal is None else session_win_goal * scale)
+    stream_args = dict(realistic_conditions=realistic_conditions, network_delay=network_delay,
+                       error_simulation=error_simulation)
+
+    balance = np.full(trials, round(bankroll * scale) if params.get("cents") else bankroll, dtype=dtype)
+    playing = np.ones(trials, dtype=bool)
+    bankrolls = np.empty((sessions + 1, trials))
+    bankrolls[0] = balance / scale
+    active = np.zeros(sessions, dtype=np.int64)
+    pnl_mean = np.zeros(sessions)
+    rounds_mean = np.zeros(sessions)
+    reasons = np.zeros((sessions, len(STOP_REASONS)), dtype=np.int64)
+    sessions_played = np.zeros(trials, dtype=np.int64)
+
+    stateless = params["strategy"] in STATELESS_STRATEGIES
+    block = max(1, chunk_elements // max(1, trials * session_rounds)) if stateless else 1
+
+    s = 0
+    while s < sessions and playing.any():
+        k = min(block, sessions - s)
+        if k > 1:
+            outcomes = _play_stateless_sessions(params, balance, playing, k, session_rounds, rng,
+                                                limits, stream_args)
+        else:
+            outcomes = [_play_session(params, balance, playing, session_rounds, rng, limits,
+                                      stream_args, chunk_elements)]
+        for end, length, reason in outcomes:
+            played = playing.copy()
+            count = int(played.sum())
+            active[s] = count
+            if count:
+                pnl_mean[s] = float((end - balance)[played].mean()) / scale
+                rounds_mean[s] = float(length[played].mean())
+                reasons[s] = np.bincount(reason[played], minlength=len(STOP_REASONS))
+            sessions_played += played
+            balance = end
+            playing = played & (reason != RUIN)
+            bankrolls[s + 1] = balance / scale
+            s += 1
+
+    # Players out of the game keep their last bankroll
+    bankrolls[s + 1:] = bankrolls[s]
+    percentiles = np.percentile(bankrolls[1:], SESSION_PERCENTILES, axis=1)
+    ruined = reasons[:, RUIN].sum()
+
+    elapsed = time.perf_counter() - started
+    logger.info("Session simulation: %s players x %s sessions x %s rounds in %.2fs",
+                trials, sessions, session_rounds, elapsed)
+
+    return {
+        "players": trials,
+        "sessions": sessions,
+        "session_rounds": session_rounds,
+        "bankroll": bankroll,
+        "session_loss_limit": session_loss_limit,
+        "session_win_goal": session_win_goal,
+        "session": list(range(1, sessions + 1)),
+        "players_active": active.tolist(),
+        "session_pnl_mean": np.round(pnl_mean, 4).tolist(),
+        "session_rounds_mean": np.round(rounds_mean, 2).tolist(),
+        "stop_reasons": {name: reasons[:, i].tolist() for i, name in enumerate(STOP_REASONS)},
+        "bankroll_mean": np.round(bankrolls[1:].mean(axis=1), 4).tolist(),
+        "bankroll_percentiles": {f"p{p}": np.round(row, 4).tolist()
+                                 for p, row in zip(SESSION_PERCENTILES, percentiles)},
+        "sample_paths": np.round(bankrolls[:, :paths].T, 4).tolist(),
+        "ruin_probability": round(float(ruined) / trials, 6),
+        "final_bankroll_mean": round(float(bankrolls[-1].mean()), 4),
+        "final_bankroll_median": round(float(np.median(bankrolls[-1])), 4),
+        "sessions_played_mean": round(float(sessions_played.mean()), 4),
+        "elapsed_seconds": round(elapsed, 3),
+    }
@@ -0,0 +1,119 @@
+import weakref
+import logging
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Arrays start on cache-line boundaries inside a segment
+ALIGNMENT = 64
+
+# Segments this process has attached to, by name: (segment, blocks)
+_attached = {}
+
+
+def _release(segment):
+    """Close and unlink a segment created by this process"""
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedStreams:
+    """
+    Stream blocks published once in shared memory for worker processes
+
+    The blocks (see batch.generate_streams) are copied into a single
+    segment; workers receive the small picklable descriptor and map NumPy
+    views onto the segment with attach_streams instead of unpickling or
+    regenerating the arrays. The creating process owns the segment: it is
+    unlinked by close(), on leaving a with block, when the object is
+    garbage collected or at interpreter exit, and by the multiprocessing
+    resource tracker if the process dies without cleaning up.
+    """
+
+    def __init__(self, blocks):
+        layout = []
+        size = 0
+        for block in blocks:
+            entry = {}
+            for key, value in block.items():
+                if isinstance(value, np.ndarray):
+                    size = -(-size // ALIGNMENT) * ALIGNMENT
+                    entry[key] = ("array", size, value.shape, value.dtype.str)
+                    size += value.nbytes
+                else:
+                    entry[key] = ("value", value)
+            layout.append(entry)
+
+        self._segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self._finalizer = weakref.finalize(self, _release, self._segment)
+        for block, entry in zip(blocks, layout):
+            for key, spec in entry.items():
+                if spec[0] == "array":
+                    _, offset, shape, dtype = spec
+                    view = np.ndarray(shape, dtype=dtype, buffer=self._segment.buf, offset=offset)
+                    view[...] = block[key]
+                    del view
+
+        self.nbytes = size
+        self.descriptor = (self._segment.name, layout)
+        logger.debug("Published %s stream blocks (%s bytes) in %s",
+                     len(layout), size, self._segment.name)
+
+    def close(self):
+        """Unlink the segment; workers that still map it keep their views"""
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_streams(descriptor):
+    """
+    Map the stream blocks of a SharedStreams descriptor without copying
+
+    Attachments are cached per process, so the tasks of one batch attach
+    once; attaching a different segment detaches the previous one.
+
+    Returns:
+        List of stream blocks whose arrays are read-only views of the segment
+    """
+    name, layout = descriptor
+    if name in _attached:
+        return _attached[name][1]
+    detach_streams()
+
+    segment = shared_memory.SharedMemory(name=name)
+    blocks = []
+    for entry in layout:
+        block = {}
+        for key, spec in entry.items():
+            if spec[0] == "array":
+                _, offset, shape, dtype = spec
+                view = np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=offset)
+                view.flags.writeable = False
+                block[key] = view
+            else:
+                block[key] = spec[1]
+        blocks.append(block)
+    _attached[name] = (segment, blocks)
+    return blocks
+
+
+def detach_streams():
+    """Drop this process's attachments (the owner still unlinks the segments)"""
+    while _attached:
+        _, (segment, blocks) = _attached.popitem()
+        blocks.clear()
+        try:
+            segment.close()
+        except BufferError:
+            # A caller still holds a view; the mapping is released with it
+            pass
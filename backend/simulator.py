@@ -1,5 +1,18 @@
+import math
+import bisect
 import random
 import logging
+import numpy as np
+from batch import (
+    init_batch_state, generate_streams, build_batch_params, money_scale, min_stake,
+    expected_return, parse_ladder, ladder_table, rungs_paid
+)
+from money import CENTS, to_cents, array_to_cents, payout, percent_stake, amount, amounts
+from fair import HashChainRandom, load_chain, DEFAULT_HOUSE_EDGE
+from distributions import DEFAULT_DISTRIBUTION, DistributionRandom, load_distribution
+from checkpoint import (
+    CHECKPOINT_VERSION, encode_checkpoint, decode_checkpoint, random_state, restore_random
+)
 from strategies import (
     early_cashout, mid_risk, high_risk, dual_bet, martingale_strategy,
     paroli_strategy, fixed_percent_strategy, target_profit_strategy,
@@ -7,22 +20,31 @@ from strategies import (
 )
 
 logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger(__name__ + '.trace')
+
+# Version of the simulation engine's output for given parameters and seed;
+# bump it whenever a change alters seeded results, so cached results expire
+ENGINE_VERSION = 1
 
+# Rounds per independently seeded stream block of the rules strategy
+RULES_BLOCK_ROUNDS = 1024
 
-def generate_crash_multiplier():
+# Rounds leading up to ruin logged by a ruin trace
+TRACE_RUIN_ROUNDS = 20
+
+
+def generate_crash_multiplier(rng=random):
     """Generate a crash multiplier using exponential distribution"""
+    if isinstance(rng, (HashChainRandom, DistributionRandom)):
+        return rng.next_crash()
     try:
-        r = random.random()
-        # Prevent division by zero and ensure minimum multiplier
-        if r >= 0.99:
-            return 1.0
-        return max(1.01, 1 / (1 - r))
+        return DEFAULT_DISTRIBUTION.crash(rng.random())
     except Exception as e:
-        logger.error(f"Error generating crash multiplier: {e}")
+        logger.error("Error generating crash multiplier: %s", e)
         return 1.01
 
 
-def simulate_network_conditions(enable_realistic=True, enable_errors=True):
+def simulate_network_conditions(enable_realistic=True, enable_errors=True, rng=random):
     """
     Simulate network delays and potential errors without blocking
     Returns: (success: bool, delay: float)
@@ -31,12 +53,15 @@ def simulate_network_conditions(enable_realistic=True, enable_errors=True):
         return True, 0
 
     # 5% chance of network error when errors are enabled
-    if enable_errors and random.random() < 0.05:
+    if enable_errors and rng.random() < 0.05:
+        # The missed round is still played: a hash chain moves past its game
+        if isinstance(rng, HashChainRandom):
+            rng.next_crash()
         return False, 0  # Network error
 
     # Simulate delay time (but don't actually sleep)
     # In a real implementation, this would be handled by async/await
-    delay = random.uniform(0.05, 0.5)
+    delay = rng.uniform(0.05, 0.5)
     return True, delay
 
 
@@ -51,91 +76,203 @@ def apply_betting_limits(bet_amount, min_bet=0.10, max_bet=1000.0):
 
 def simulate_strategy(strategy, rounds, bet, bankroll=100, target_profit=50, percent_bet=5,
                       realistic_conditions=True, min_bet=0.10, max_bet=1000.0,
-                      network_delay=True, error_simulation=True, custom_params=None):
+                      network_delay=True, error_simulation=True, custom_params=None, cents=False,
+                      seed=None, checkpoint=None, crash_chain=None, crash_distribution=None,
+                      trace_every=None, trace_ruin=False):
     """
     Main simulation function that routes to appropriate strategy
+
+    With cents set, every strategy tracks balances and bets as integer
+    cents instead of floats (see money.py).
+
+    Every result carries a "checkpoint" token with the strategy state and
+    random generator position after its last round. Passing the token back
+    as checkpoint continues that run for another `rounds` rounds exactly as
+    if it had never stopped; history then covers the new rounds only. The
+    strategy and cents mode must match the checkpoint, while the other
+    parameters may differ to branch what-if runs from a shared prefix.
+
+    crash_chain plays the games of a provably-fair hash chain (see fair.py)
+    instead of random crashes: a dictionary with "server_seed", "length",
+    optional "house_edge" and "offset", the first game to play. Each round
+    consumes one game, including rounds missed to network errors; seed
+    still drives network conditions. Checkpoints remember the position.
+
+    crash_distribution draws crashes from another law than the default
+    formula: a spec as taken by distributions.normalize_distribution.
+    Checkpoints keep it as a run parameter.
+
+    trace_every and trace_ruin log a sampled per-round trace (see
+    trace_rounds) of each round's crash, bet, cashout and balance for
+    debugging strategies.
     """
     try:
-        logger.info(f"Starting simulation: {strategy} strategy, {rounds} rounds")
+        logger.info("Starting simulation: %s strategy, %d rounds", strategy, rounds)
+
+        state = None
+        start_round = 0
+        if checkpoint is not None:
+            saved = decode_checkpoint(checkpoint)
+            if saved["params"]["strategy"] != strategy:
+                return {"error": f"Checkpoint is for the {saved['params']['strategy']} strategy"}
+            if saved["params"]["cents"] != cents:
+                return {"error": "Checkpoint was taken with a different cents setting"}
+            rng = restore_random(saved["rng"])
+            state = saved["state"]
+            start_round = saved["round"]
+        elif crash_chain is not None:
+            if strategy == "rules":
+                return {"error": "The rules strategy does not support hash-chain crashes"}
+            chain = load_chain(crash_chain["server_seed"], crash_chain["length"],
+                               crash_chain.get("house_edge", DEFAULT_HOUSE_EDGE))
+            rng = HashChainRandom(chain, crash_chain.get("offset", 0), seed)
+        elif strategy == "rules":
+            rng = seed if seed is not None else np.random.SeedSequence().entropy
+        else:
+            rng = random.Random(seed)
+
+        # Rounds are only recorded when a trace will be logged
+        trace = None
+        if (trace_every or trace_ruin) and trace_logger.isEnabledFor(logging.INFO):
+            trace = []
+
+        if isinstance(rng, HashChainRandom) and rng.remaining() < rounds:
+            return {"error": f"Only {rng.remaining()} games left in the hash chain"}
+
+        distribution = None
+        if crash_distribution is not None:
+            if isinstance(rng, HashChainRandom):
+                return {"error": "Hash-chain crashes cannot follow a crash distribution"}
+            distribution = load_distribution(crash_distribution)
+            if strategy != "rules":
+                rng = DistributionRandom(distribution, rng)
 
         if strategy == "early":
-            return early_cashout_realistic(
+            result = early_cashout_realistic(
                 rounds, bet, cashout=1.5,
                 realistic_conditions=realistic_conditions,
                 min_bet=min_bet, max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
             )
 
         elif strategy == "mid":
-            return mid_risk_realistic(
+            result = mid_risk_realistic(
                 rounds, bet, cashout=2.5,
                 realistic_conditions=realistic_conditions,
                 min_bet=min_bet, max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
             )
 
         elif strategy == "high":
-            return high_risk_realistic(
+            result = high_risk_realistic(
                 rounds, bet, cashout=10.0,
                 realistic_conditions=realistic_conditions,
                 min_bet=min_bet, max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
             )
 
         elif strategy == "dual":
-            return dual_bet_realistic(
+            result = dual_bet_realistic(
                 rounds, bet1=bet, bet2=bet, cashout1=1.5, cashout2=5.0,
                 realistic_conditions=realistic_conditions,
                 min_bet=min_bet, max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
+            )
+
+        elif strategy == "ladder":
+            if not custom_params or 'rungs' not in custom_params:
+                return {"error": "Ladder strategy requires rungs"}
+
+            result = ladder_strategy_realistic(
+                rounds, custom_params['rungs'],
+                realistic_conditions=realistic_conditions,
+                min_bet=min_bet, max_bet=max_bet,
+                network_delay=network_delay,
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
             )
 
         elif strategy == "martingale":
-            return martingale_strategy_realistic(
+            result = martingale_strategy_realistic(
                 rounds, base_bet=bet, bankroll=bankroll,
                 realistic_conditions=realistic_conditions,
                 min_bet=min_bet, max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
             )
 
         elif strategy == "paroli":
-            return paroli_strategy_realistic(
+            result = paroli_strategy_realistic(
                 rounds, base_bet=bet, bankroll=bankroll,
                 realistic_conditions=realistic_conditions,
                 min_bet=min_bet, max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
             )
 
         elif strategy == "fixed_percent":
-            return fixed_percent_strategy_realistic(
+            result = fixed_percent_strategy_realistic(
                 rounds, percent=percent_bet, bankroll=bankroll,
                 realistic_conditions=realistic_conditions,
                 min_bet=min_bet, max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
             )
 
         elif strategy == "target_profit":
-            return target_profit_strategy_realistic(
+            result = target_profit_strategy_realistic(
                 rounds, base_bet=bet, bankroll=bankroll,
                 target_profit=target_profit,
                 realistic_conditions=realistic_conditions,
                 min_bet=min_bet, max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
             )
 
         elif strategy == "custom":
             if not custom_params:
                 return {"error": "Custom strategy requires additional parameters"}
 
-            return custom_strategy_realistic(
+            result = custom_strategy_realistic(
                 rounds=rounds,
                 bankroll=bankroll,
                 cashout_target=custom_params['cashout_target'],
@@ -148,17 +285,111 @@ def simulate_strategy(strategy, rounds, bet, bankroll=100, target_profit=50, per
                 min_bet=min_bet,
                 max_bet=max_bet,
                 network_delay=network_delay,
-                error_simulation=error_simulation
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                trace=trace
+            )
+
+        elif strategy == "rules":
+            if not custom_params or 'rules' not in custom_params:
+                return {"error": "Rules strategy requires a rules specification"}
+
+            result = rules_strategy_realistic(
+                rounds=rounds,
+                bankroll=bankroll,
+                rules=custom_params['rules'],
+                realistic_conditions=realistic_conditions,
+                min_bet=min_bet,
+                max_bet=max_bet,
+                network_delay=network_delay,
+                error_simulation=error_simulation,
+                cents=cents,
+                rng=rng,
+                state=state,
+                distribution=distribution,
+                trace=trace
             )
 
         else:
             return {"error": f"Invalid strategy: {strategy}"}
 
+        if "error" in result:
+            return result
+
+        if trace is not None:
+            trace_rounds(strategy, trace, result["history"], start_round, trace_every,
+                         trace_ruin and result["ruin_occurred"])
+
+        end_round = start_round + len(result["history"])
+        result["start_round"] = start_round
+        result["end_round"] = end_round
+        if isinstance(rng, HashChainRandom):
+            result["chain_commitment"] = rng.chain["commitment"]
+            result["chain_position"] = rng.position
+        result["checkpoint"] = encode_checkpoint({
+            "version": CHECKPOINT_VERSION,
+            "params": {
+                "strategy": strategy, "bet": bet, "bankroll": bankroll,
+                "target_profit": target_profit, "percent_bet": percent_bet,
+                "realistic_conditions": realistic_conditions, "min_bet": min_bet,
+                "max_bet": max_bet, "network_delay": network_delay,
+                "error_simulation": error_simulation, "custom_params": custom_params,
+                "cents": cents, "crash_distribution": crash_distribution,
+            },
+            "state": result.pop("state"),
+            "rng": random_state(rng),
+            "round": end_round,
+        })
+        return result
+
+    except ValueError as e:
+        return {"error": str(e)}
     except Exception as e:
-        logger.error(f"Error in simulate_strategy: {e}")
+        logger.error("Error in simulate_strategy: %s", e)
         return {"error": f"Simulation failed: {str(e)}"}
 
 
+def trace_rounds(strategy, rounds, history, start_round=0, every=None, ruin=False):
+    """
+    Log sampled rounds of a finished run to the simulator.trace logger
+
+    The strategies record each round (see _traced) only when a trace is
+    kept, so the round loops do no extra work when tracing is off.
+
+    Args:
+        strategy: Strategy of the run
+        rounds: Recorded rounds, one per history entry
+        history: Balance after each round
+        start_round: Rounds played before history starts (resumed runs)
+        every: Log every Nth round
+        ruin: Log the TRACE_RUIN_ROUNDS rounds that ended in ruin
+    """
+    sampled = set(range(every - 1, len(history), every)) if every else set()
+    if ruin:
+        sampled.update(range(max(0, len(history) - TRACE_RUIN_ROUNDS), len(history)))
+    for i in sorted(sampled):
+        played = rounds[i]
+        change = round(history[i] - played["balance_before"], 2)
+        trace_logger.info("%s round %d: crash %s, bet %s at %s, balance %s", strategy,
+                          start_round + i + 1, played["crash"], played["bet"], played["cashout"],
+                          history[i],
+                          extra={"strategy": strategy, "round": start_round + i + 1,
+                                 "balance": history[i], "change": change, **played,
+                                 "ruin": ruin and i == len(history) - 1})
+
+
+def _traced(balance, crash, bet, cashout, cents):
+    """
+    One round of a trace: the balance before it, its crash (None when the
+    bet did not go through), the bet and the cashout target
+    """
+    return {"balance_before": amount(balance, cents),
+            "crash": None if crash is None else round(crash, 2),
+            "bet": amount(bet, cents), "cashout": cashout}
+
+
 def create_base_result_dict():
     """Create base result dictionary with default values"""
     return {
@@ -175,14 +406,25 @@ def create_base_result_dict():
 
 # Realistic versions of the basic strategies
 def early_cashout_realistic(rounds, bet, cashout=1.5, realistic_conditions=True,
-                            min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True):
-    """Early cashout strategy with realistic conditions"""
-    balance = 0
+                            min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True,
+                            cents=False, rng=random, state=None, trace=None):
+    """
+    Early cashout strategy with realistic conditions
+
+    With cents set, balances and bets are tracked as integer cents (see money.py).
+    All strategies draw from rng and resume from state, the "state" entry of
+    an earlier result (see simulate_strategy).
+    """
+    if cents:
+        bet, min_bet, max_bet = to_cents(bet), to_cents(min_bet), to_cents(max_bet)
+    win = payout(cashout, cents)
+    state = state or {}
+    balance = state.get('balance', 0)
     history = []
-    network_errors = 0
-    total_delay = 0
-    bet_limit_hits = 0
-    rounds_played = 0
+    network_errors = state.get('network_errors', 0)
+    total_delay = state.get('total_delay', 0)
+    bet_limit_hits = state.get('bet_limit_hits', 0)
+    rounds_played = state.get('rounds_played', 0)
 
     try:
         for round_num in range(rounds):
@@ -193,66 +435,83 @@ def early_cashout_realistic(rounds, bet, cashout=1.5, realistic_conditions=True,
 
             # Simulate network conditions
             if realistic_conditions and network_delay:
-                success, delay = simulate_network_conditions(True, error_simulation)
+                success, delay = simulate_network_conditions(True, error_simulation, rng)
                 total_delay += delay
 
                 if not success:
                     network_errors += 1
                     # Skip this round due to network error
-                    history.append(round(balance, 2))
+                    if trace is not None:
+                        trace.append(_traced(balance, None, actual_bet, cashout, cents))
+                    history.append(balance)
                     continue
 
-            crash = generate_crash_multiplier()
+            crash = generate_crash_multiplier(rng)
             rounds_played += 1
+            if trace is not None:
+                trace.append(_traced(balance, crash, actual_bet, cashout, cents))
 
             if crash >= cashout:
-                profit = (cashout - 1) * actual_bet
+                profit = win(actual_bet)
                 balance += profit
             else:
                 balance -= actual_bet
 
-            history.append(round(balance, 2))
+            history.append(balance)
 
     except Exception as e:
-        logger.error(f"Error in early_cashout_realistic: {e}")
+        logger.error("Error in early_cashout_realistic: %s", e)
         return {"error": f"Early cashout simulation failed: {str(e)}"}
 
     return {
-        "history": history,
-        "final_balance": round(balance, 2),
+        "history": amounts(history, cents),
+        "final_balance": amount(balance, cents),
         "ruin_occurred": False,
         "max_loss_streak": None,
         "network_errors": network_errors,
         "total_delay": round(total_delay, 2),
         "bet_limit_hits": bet_limit_hits,
-        "rounds_played": rounds_played
+        "rounds_played": rounds_played,
+        "state": {"balance": balance, "network_errors": network_errors, "total_delay": total_delay,
+                  "bet_limit_hits": bet_limit_hits, "rounds_played": rounds_played}
     }
 
 
 def mid_risk_realistic(rounds, bet, cashout=2.5, realistic_conditions=True,
-                       min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True):
+                       min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True,
+                       cents=False, rng=random, state=None, trace=None):
     """Mid risk strategy - just calls early_cashout_realistic with different cashout"""
     return early_cashout_realistic(rounds, bet, cashout, realistic_conditions,
-                                   min_bet, max_bet, network_delay, error_simulation)
+                                   min_bet, max_bet, network_delay, error_simulation, cents,
+                                   rng, state, trace)
 
 
 def high_risk_realistic(rounds, bet, cashout=10.0, realistic_conditions=True,
-                        min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True):
+                        min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True,
+                        cents=False, rng=random, state=None, trace=None):
     """High risk strategy - just calls early_cashout_realistic with different cashout"""
     return early_cashout_realistic(rounds, bet, cashout, realistic_conditions,
-                                   min_bet, max_bet, network_delay, error_simulation)
+                                   min_bet, max_bet, network_delay, error_simulation, cents,
+                                   rng, state, trace)
 
 
 def dual_bet_realistic(rounds, bet1=1.0, cashout1=1.5, bet2=1.0, cashout2=5.0,
                        realistic_conditions=True, min_bet=0.10, max_bet=1000.0,
-                       network_delay=True, error_simulation=True):
+                       network_delay=True, error_simulation=True, cents=False,
+                       rng=random, state=None, trace=None):
     """Dual bet strategy with realistic conditions"""
-    balance = 0
+    if cents:
+        bet1, bet2 = to_cents(bet1), to_cents(bet2)
+        min_bet, max_bet = to_cents(min_bet), to_cents(max_bet)
+    win1 = payout(cashout1, cents)
+    win2 = payout(cashout2, cents)
+    state = state or {}
+    balance = state.get('balance', 0)
     history = []
-    network_errors = 0
-    total_delay = 0
-    bet_limit_hits = 0
-    rounds_played = 0
+    network_errors = state.get('network_errors', 0)
+    total_delay = state.get('total_delay', 0)
+    bet_limit_hits = state.get('bet_limit_hits', 0)
+    rounds_played = state.get('rounds_played', 0)
 
     try:
         for round_num in range(rounds):
@@ -265,62 +524,148 @@ def dual_bet_realistic(rounds, bet1=1.0, cashout1=1.5, bet2=1.0, cashout2=5.0,
 
             # Simulate network conditions
             if realistic_conditions and network_delay:
-                success, delay = simulate_network_conditions(True, error_simulation)
+                success, delay = simulate_network_conditions(True, error_simulation, rng)
                 total_delay += delay
 
                 if not success:
                     network_errors += 1
                     # Skip this round due to network error
-                    history.append(round(balance, 2))
+                    if trace is not None:
+                        trace.append(_traced(balance, None, actual_bet1 + actual_bet2, [cashout1, cashout2], cents))
+                    history.append(balance)
                     continue
 
-            crash = generate_crash_multiplier()
+            crash = generate_crash_multiplier(rng)
             rounds_played += 1
+            if trace is not None:
+                trace.append(_traced(balance, crash, actual_bet1 + actual_bet2, [cashout1, cashout2], cents))
 
             # First bet: cash out early
             if crash >= cashout1:
-                balance += (cashout1 - 1) * actual_bet1
+                balance += win1(actual_bet1)
             else:
                 balance -= actual_bet1
 
             # Second bet: let it ride
             if crash >= cashout2:
-                balance += (cashout2 - 1) * actual_bet2
+                balance += win2(actual_bet2)
             else:
                 balance -= actual_bet2
 
-            history.append(round(balance, 2))
+            history.append(balance)
 
     except Exception as e:
-        logger.error(f"Error in dual_bet_realistic: {e}")
+        logger.error("Error in dual_bet_realistic: %s", e)
         return {"error": f"Dual bet simulation failed: {str(e)}"}
 
     return {
-        "history": history,
-        "final_balance": round(balance, 2),
+        "history": amounts(history, cents),
+        "final_balance": amount(balance, cents),
         "ruin_occurred": False,
         "max_loss_streak": None,
         "network_errors": network_errors,
         "total_delay": round(total_delay, 2),
         "bet_limit_hits": bet_limit_hits,
-        "rounds_played": rounds_played
+        "rounds_played": rounds_played,
+        "state": {"balance": balance, "network_errors": network_errors, "total_delay": total_delay,
+                  "bet_limit_hits": bet_limit_hits, "rounds_played": rounds_played}
+    }
+
+
+def ladder_strategy_realistic(rounds, rungs, realistic_conditions=True, min_bet=0.10,
+                              max_bet=1000.0, network_delay=True, error_simulation=True,
+                              cents=False, rng=random, state=None, trace=None):
+    """
+    Ladder of simultaneous bets at different cashouts with realistic conditions
+
+    rungs are [stake, cashout] pairs (see batch.parse_ladder). Crashes and
+    network outcomes are drawn round by round as in the other strategies;
+    the rounds are then settled all at once by looking up each crash's
+    count of cashouts reached in a P&L table (see batch.ladder_table).
+    """
+    rungs = parse_ladder(rungs)
+    stakes = [stake for stake, _ in rungs]
+    if cents:
+        stakes = [to_cents(stake) for stake in stakes]
+        min_bet, max_bet = to_cents(min_bet), to_cents(max_bet)
+    actual = [apply_betting_limits(stake, min_bet, max_bet) for stake in stakes]
+    limited = any(a != stake for a, stake in zip(actual, stakes))
+    cashouts, table = ladder_table([(a, cashout) for a, (_, cashout) in zip(actual, rungs)], cents)
+
+    state = state or {}
+    balance = state.get('balance', 0)
+    network_errors = state.get('network_errors', 0)
+    total_delay = state.get('total_delay', 0)
+    bet_limit_hits = state.get('bet_limit_hits', 0) + (rounds if limited else 0)
+    rounds_played = state.get('rounds_played', 0)
+    crashes = np.zeros(rounds)
+    played = np.zeros(rounds, dtype=bool)
+
+    try:
+        for round_num in range(rounds):
+            # Simulate network conditions
+            if realistic_conditions and network_delay:
+                success, delay = simulate_network_conditions(True, error_simulation, rng)
+                total_delay += delay
+
+                if not success:
+                    network_errors += 1
+                    continue
+
+            crashes[round_num] = generate_crash_multiplier(rng)
+            played[round_num] = True
+        rounds_played += int(played.sum())
+
+        # Settle every round at once; the running sum starts from the
+        # balance so it adds up exactly as round-by-round settling would
+        pnl = np.where(played, table.take(rungs_paid(cashouts, crashes)), 0)
+        history = np.cumsum(np.concatenate([[balance], pnl]))[1:].tolist()
+        if trace is not None:
+            rung_cashouts = [cashout for _, cashout in rungs]
+            for round_num, before in enumerate([balance] + history[:-1]):
+                crash = float(crashes[round_num]) if played[round_num] else None
+                trace.append(_traced(before, crash, sum(actual), rung_cashouts, cents))
+        if history:
+            balance = history[-1]
+
+    except Exception as e:
+        logger.error("Error in ladder_strategy_realistic: %s", e)
+        return {"error": f"Ladder simulation failed: {str(e)}"}
+
+    return {
+        "history": amounts(history, cents),
+        "final_balance": amount(balance, cents),
+        "ruin_occurred": False,
+        "max_loss_streak": None,
+        "network_errors": network_errors,
+        "total_delay": round(total_delay, 2),
+        "bet_limit_hits": bet_limit_hits,
+        "rounds_played": rounds_played,
+        "state": {"balance": balance, "network_errors": network_errors, "total_delay": total_delay,
+                  "bet_limit_hits": bet_limit_hits, "rounds_played": rounds_played}
     }
 
 
 def martingale_strategy_realistic(rounds, base_bet=1.0, cashout=2.0, bankroll=100,
                                   realistic_conditions=True, min_bet=0.10, max_bet=1000.0,
-                                  network_delay=True, error_simulation=True):
+                                  network_delay=True, error_simulation=True, cents=False,
+                                  rng=random, state=None, trace=None):
     """Martingale strategy with realistic conditions"""
-    balance = bankroll
-    bet = base_bet
+    if cents:
+        base_bet, bankroll = to_cents(base_bet), to_cents(bankroll)
+        min_bet, max_bet = to_cents(min_bet), to_cents(max_bet)
+    win = payout(cashout, cents)
+    state = state or {}
+    balance = state.get('balance', bankroll)
+    bet = state.get('bet', base_bet)
     history = []
-    current_loss_streak = 0
-    max_loss_streak = 0
-    ruin_occurred = False
-    network_errors = 0
-    total_delay = 0
-    bet_limit_hits = 0
-    rounds_played = 0
+    current_loss_streak = state.get('current_loss_streak', 0)
+    max_loss_streak = state.get('max_loss_streak', 0)
+    ruin_occurred = state.get('ruin_occurred', False)
+    network_errors = state.get('network_errors', 0)
+    total_delay = state.get('total_delay', 0)
+    bet_limit_hits = state.get('bet_limit_hits', 0)
+    rounds_played = state.get('rounds_played', 0)
 
     try:
         for round_num in range(rounds):
@@ -335,20 +680,24 @@ def martingale_strategy_realistic(rounds, base_bet=1.0, cashout=2.0, bankroll=10
 
             # Simulate network conditions
             if realistic_conditions and network_delay:
-                success, delay = simulate_network_conditions(True, error_simulation)
+                success, delay = simulate_network_conditions(True, error_simulation, rng)
                 total_delay += delay
 
                 if not success:
                     network_errors += 1
                     # Skip this round due to network error
-                    history.append(round(balance, 2))
+                    if trace is not None:
+                        trace.append(_traced(balance, None, actual_bet, cashout, cents))
+                    history.append(balance)
                     continue
 
-            crash = generate_crash_multiplier()
+            crash = generate_crash_multiplier(rng)
             rounds_played += 1
+            if trace is not None:
+                trace.append(_traced(balance, crash, actual_bet, cashout, cents))
 
             if crash >= cashout:
-                profit = (cashout - 1) * actual_bet
+                profit = win(actual_bet)
                 balance += profit
                 current_loss_streak = 0
                 bet = base_bet  # reset
@@ -358,39 +707,49 @@ def martingale_strategy_realistic(rounds, base_bet=1.0, cashout=2.0, bankroll=10
                 max_loss_streak = max(max_loss_streak, current_loss_streak)
                 bet *= 2  # double
 
-            history.append(round(balance, 2))
+            history.append(balance)
 
     except Exception as e:
-        logger.error(f"Error in martingale_strategy_realistic: {e}")
+        logger.error("Error in martingale_strategy_realistic: %s", e)
         return {"error": f"Martingale simulation failed: {str(e)}"}
 
     return {
-        "history": history,
-        "final_balance": round(balance, 2),
+        "history": amounts(history, cents),
+        "final_balance": amount(balance, cents),
         "ruin_occurred": ruin_occurred,
         "max_loss_streak": max_loss_streak,
         "network_errors": network_errors,
         "total_delay": round(total_delay, 2),
         "bet_limit_hits": bet_limit_hits,
-        "rounds_played": rounds_played
+        "rounds_played": rounds_played,
+        "state": {"balance": balance, "bet": bet, "current_loss_streak": current_loss_streak,
+                  "max_loss_streak": max_loss_streak, "ruin_occurred": ruin_occurred,
+                  "network_errors": network_errors, "total_delay": total_delay,
+                  "bet_limit_hits": bet_limit_hits, "rounds_played": rounds_played}
     }
 
 
 def paroli_strategy_realistic(rounds, base_bet=1.0, cashout=2.0, bankroll=100,
                               realistic_conditions=True, min_bet=0.10, max_bet=1000.0,
-                              network_delay=True, error_simulation=True):
+                              network_delay=True, error_simulation=True, cents=False,
+                              rng=random, state=None, trace=None):
     """Paroli strategy with realistic conditions"""
-    balance = bankroll
+    if cents:
+        base_bet, bankroll = to_cents(base_bet), to_cents(bankroll)
+        min_bet, max_bet = to_cents(min_bet), to_cents(max_bet)
+    win = payout(cashout, cents)
+    state = state or {}
+    balance = state.get('balance', bankroll)
     history = []
-    win_streak = 0
-    bet = base_bet
-    max_loss_streak = 0
-    loss_streak = 0
-    ruin = False
-    network_errors = 0
-    total_delay = 0
-    bet_limit_hits = 0
-    rounds_played = 0
+    win_streak = state.get('win_streak', 0)
+    bet = state.get('bet', base_bet)
+    max_loss_streak = state.get('max_loss_streak', 0)
+    loss_streak = state.get('loss_streak', 0)
+    ruin = state.get('ruin', False)
+    network_errors = state.get('network_errors', 0)
+    total_delay = state.get('total_delay', 0)
+    bet_limit_hits = state.get('bet_limit_hits', 0)
+    rounds_played = state.get('rounds_played', 0)
 
     try:
         for round_num in range(rounds):
@@ -405,22 +764,26 @@ def paroli_strategy_realistic(rounds, base_bet=1.0, cashout=2.0, bankroll=100,
 
             # Simulate network conditions
             if realistic_conditions and network_delay:
-                success, delay = simulate_network_conditions(True, error_simulation)
+                success, delay = simulate_network_conditions(True, error_simulation, rng)
                 total_delay += delay
 
                 if not success:
                     network_errors += 1
                     # Skip this round due to network error
-                    history.append(round(balance, 2))
+                    if trace is not None:
+                        trace.append(_traced(balance, None, actual_bet, cashout, cents))
+                    history.append(balance)
                     continue
 
-            crash = generate_crash_multiplier()
+            crash = generate_crash_multiplier(rng)
             rounds_played += 1
+            if trace is not None:
+                trace.append(_traced(balance, crash, actual_bet, cashout, cents))
 
             if crash >= cashout:
                 win_streak += 1
                 loss_streak = 0
-                profit = (cashout - 1) * actual_bet
+                profit = win(actual_bet)
                 balance += profit
                 bet = base_bet * (2 ** min(win_streak, 3))  # Cap win streak progression
             else:
@@ -430,67 +793,82 @@ def paroli_strategy_realistic(rounds, base_bet=1.0, cashout=2.0, bankroll=100,
                 max_loss_streak = max(max_loss_streak, loss_streak)
                 bet = base_bet
 
-            history.append(round(balance, 2))
+            history.append(balance)
 
     except Exception as e:
-        logger.error(f"Error in paroli_strategy_realistic: {e}")
+        logger.error("Error in paroli_strategy_realistic: %s", e)
         return {"error": f"Paroli simulation failed: {str(e)}"}
 
     return {
-        "history": history,
-        "final_balance": round(balance, 2),
+        "history": amounts(history, cents),
+        "final_balance": amount(balance, cents),
         "ruin_occurred": ruin,
         "max_loss_streak": max_loss_streak,
         "network_errors": network_errors,
         "total_delay": round(total_delay, 2),
         "bet_limit_hits": bet_limit_hits,
-        "rounds_played": rounds_played
+        "rounds_played": rounds_played,
+        "state": {"balance": balance, "win_streak": win_streak, "bet": bet,
+                  "max_loss_streak": max_loss_streak, "loss_streak": loss_streak, "ruin": ruin,
+                  "network_errors": network_errors, "total_delay": total_delay,
+                  "bet_limit_hits": bet_limit_hits, "rounds_played": rounds_played}
     }
 
 
 def fixed_percent_strategy_realistic(rounds, percent=5, cashout=2.0, bankroll=100,
                                      realistic_conditions=True, min_bet=0.10, max_bet=1000.0,
-                                     network_delay=True, error_simulation=True):
+                                     network_delay=True, error_simulation=True, cents=False,
+                                     rng=random, state=None, trace=None):
     """Fixed percent strategy with realistic conditions"""
-    balance = bankroll
+    if cents:
+        bankroll, min_bet, max_bet = to_cents(bankroll), to_cents(min_bet), to_cents(max_bet)
+    win = payout(cashout, cents)
+    stake_of = percent_stake(percent, cents)
+    min_stake = 1 if cents else 0.01
+    state = state or {}
+    balance = state.get('balance', bankroll)
     history = []
-    max_loss_streak = 0
-    loss_streak = 0
-    ruin = False
-    network_errors = 0
-    total_delay = 0
-    bet_limit_hits = 0
-    rounds_played = 0
+    max_loss_streak = state.get('max_loss_streak', 0)
+    loss_streak = state.get('loss_streak', 0)
+    ruin = state.get('ruin', False)
+    network_errors = state.get('network_errors', 0)
+    total_delay = state.get('total_delay', 0)
+    bet_limit_hits = state.get('bet_limit_hits', 0)
+    rounds_played = state.get('rounds_played', 0)
 
     try:
         for round_num in range(rounds):
-            bet = round((percent / 100.0) * balance, 2)
+            bet = stake_of(balance)
 
             # Apply betting limits
             actual_bet = apply_betting_limits(bet, min_bet, max_bet)
             if actual_bet != bet:
                 bet_limit_hits += 1
 
-            if actual_bet < 0.01 or balance < actual_bet:
+            if actual_bet < min_stake or balance < actual_bet:
                 ruin = True
                 break
 
             # Simulate network conditions
             if realistic_conditions and network_delay:
-                success, delay = simulate_network_conditions(True, error_simulation)
+                success, delay = simulate_network_conditions(True, error_simulation, rng)
                 total_delay += delay
 
                 if not success:
                     network_errors += 1
                     # Skip this round due to network error
-                    history.append(round(balance, 2))
+                    if trace is not None:
+                        trace.append(_traced(balance, None, actual_bet, cashout, cents))
+                    history.append(balance)
                     continue
 
-            crash = generate_crash_multiplier()
+            crash = generate_crash_multiplier(rng)
             rounds_played += 1
+            if trace is not None:
+                trace.append(_traced(balance, crash, actual_bet, cashout, cents))
 
             if crash >= cashout:
-                profit = (cashout - 1) * actual_bet
+                profit = win(actual_bet)
                 balance += profit
                 loss_streak = 0
             else:
@@ -498,39 +876,50 @@ def fixed_percent_strategy_realistic(rounds, percent=5, cashout=2.0, bankroll=10
                 loss_streak += 1
                 max_loss_streak = max(max_loss_streak, loss_streak)
 
-            history.append(round(balance, 2))
+            history.append(balance)
 
     except Exception as e:
-        logger.error(f"Error in fixed_percent_strategy_realistic: {e}")
+        logger.error("Error in fixed_percent_strategy_realistic: %s", e)
         return {"error": f"Fixed percent simulation failed: {str(e)}"}
 
     return {
-        "history": history,
-        "final_balance": round(balance, 2),
+        "history": amounts(history, cents),
+        "final_balance": amount(balance, cents),
         "ruin_occurred": ruin,
         "max_loss_streak": max_loss_streak,
         "network_errors": network_errors,
         "total_delay": round(total_delay, 2),
         "bet_limit_hits": bet_limit_hits,
-        "rounds_played": rounds_played
+        "rounds_played": rounds_played,
+        "state": {"balance": balance, "max_loss_streak": max_loss_streak,
+                  "loss_streak": loss_streak, "ruin": ruin, "network_errors": network_errors,
+                  "total_delay": total_delay, "bet_limit_hits": bet_limit_hits,
+                  "rounds_played": rounds_played}
     }
 
 
 def target_profit_strategy_realistic(rounds, base_bet=1.0, target_profit=50, cashout=2.0, bankroll=100,
                                      realistic_conditions=True, min_bet=0.10, max_bet=1000.0,
-                                     network_delay=True, error_simulation=True):
+                                     network_delay=True, error_simulation=True, cents=False,
+                                     rng=random, state=None, trace=None):
     """Target profit strategy with realistic conditions"""
-    balance = bankroll
+    if cents:
+        base_bet, bankroll = to_cents(base_bet), to_cents(bankroll)
+        target_profit = to_cents(target_profit)
+        min_bet, max_bet = to_cents(min_bet), to_cents(max_bet)
+    win = payout(cashout, cents)
+    state = state or {}
+    balance = state.get('balance', bankroll)
     history = []
-    current_profit = 0
-    ruin = False
-    max_loss_streak = 0
-    loss_streak = 0
-    network_errors = 0
-    total_delay = 0
-    bet_limit_hits = 0
-    rounds_played = 0
-    target_reached = False
+    current_profit = state.get('current_profit', 0)
+    ruin = state.get('ruin', False)
+    max_loss_streak = state.get('max_loss_streak', 0)
+    loss_streak = state.get('loss_streak', 0)
+    network_errors = state.get('network_errors', 0)
+    total_delay = state.get('total_delay', 0)
+    bet_limit_hits = state.get('bet_limit_hits', 0)
+    rounds_played = state.get('rounds_played', 0)
+    target_reached = state.get('target_reached', False)
 
     try:
         for round_num in range(rounds):
@@ -549,20 +938,24 @@ def target_profit_strategy_realistic(rounds, base_bet=1.0, target_profit=50, cas
 
             # Simulate network conditions
             if realistic_conditions and network_delay:
-                success, delay = simulate_network_conditions(True, error_simulation)
+                success, delay = simulate_network_conditions(True, error_simulation, rng)
                 total_delay += delay
 
                 if not success:
                     network_errors += 1
                     # Skip this round due to network error
-                    history.append(round(balance, 2))
+                    if trace is not None:
+                        trace.append(_traced(balance, None, actual_bet, cashout, cents))
+                    history.append(balance)
                     continue
 
-            crash = generate_crash_multiplier()
+            crash = generate_crash_multiplier(rng)
             rounds_played += 1
+            if trace is not None:
+                trace.append(_traced(balance, crash, actual_bet, cashout, cents))
 
             if crash >= cashout:
-                profit = (cashout - 1) * actual_bet
+                profit = win(actual_bet)
                 balance += profit
                 current_profit += profit
                 loss_streak = 0
@@ -572,50 +965,65 @@ def target_profit_strategy_realistic(rounds, base_bet=1.0, target_profit=50, cas
                 loss_streak += 1
                 max_loss_streak = max(max_loss_streak, loss_streak)
 
-            history.append(round(balance, 2))
+            history.append(balance)
 
     except Exception as e:
-        logger.error(f"Error in target_profit_strategy_realistic: {e}")
+        logger.error("Error in target_profit_strategy_realistic: %s", e)
         return {"error": f"Target profit simulation failed: {str(e)}"}
 
     return {
-        "history": history,
-        "final_balance": round(balance, 2),
+        "history": amounts(history, cents),
+        "final_balance": amount(balance, cents),
         "ruin_occurred": ruin,
         "max_loss_streak": max_loss_streak,
         "target_reached": target_reached,
         "network_errors": network_errors,
         "total_delay": round(total_delay, 2),
         "bet_limit_hits": bet_limit_hits,
-        "rounds_played": rounds_played
+        "rounds_played": rounds_played,
+        "state": {"balance": balance, "current_profit": current_profit, "ruin": ruin,
+                  "max_loss_streak": max_loss_streak, "loss_streak": loss_streak,
+                  "network_errors": network_errors, "total_delay": total_delay,
+                  "bet_limit_hits": bet_limit_hits, "rounds_played": rounds_played,
+                  "target_reached": target_reached}
     }
 
 
 def custom_strategy_realistic(rounds, bankroll=100, cashout_target=2.0, bet_sequence="1,2,4",
                               max_bet_custom=20, stop_loss=50, take_profit=200,
                               progression_type="loss", realistic_conditions=True,
-                              min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True):
+                              min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True,
+                              cents=False, rng=random, state=None, trace=None):
     """Custom strategy with realistic conditions"""
-    balance = bankroll
+    if cents:
+        bankroll, max_bet_custom = to_cents(bankroll), to_cents(max_bet_custom)
+        stop_loss, take_profit = to_cents(stop_loss), to_cents(take_profit)
+        min_bet, max_bet = to_cents(min_bet), to_cents(max_bet)
+    win = payout(cashout_target, cents)
+    min_stake = 1 if cents else 0.01
+    state = state or {}
+    balance = state.get('balance', bankroll)
     history = []
-    max_loss_streak = 0
-    loss_streak = 0
-    win_streak = 0
-    ruin = False
-    target_reached = False
-    network_errors = 0
-    total_delay = 0
-    bet_limit_hits = 0
-    rounds_played = 0
+    max_loss_streak = state.get('max_loss_streak', 0)
+    loss_streak = state.get('loss_streak', 0)
+    win_streak = state.get('win_streak', 0)
+    ruin = state.get('ruin', False)
+    target_reached = state.get('target_reached', False)
+    network_errors = state.get('network_errors', 0)
+    total_delay = state.get('total_delay', 0)
+    bet_limit_hits = state.get('bet_limit_hits', 0)
+    rounds_played = state.get('rounds_played', 0)
 
     try:
         # Parse bet sequence
         bet_amounts = [float(x.strip()) for x in bet_sequence.split(',') if x.strip()]
         if not bet_amounts:
             bet_amounts = [1.0]  # fallback
+        if cents:
+            bet_amounts = [to_cents(b) for b in bet_amounts]
 
-        sequence_index = 0
-        current_bet = bet_amounts[0]
+        sequence_index = min(state.get('sequence_index', 0), len(bet_amounts) - 1)
+        current_bet = bet_amounts[sequence_index]
 
         for round_num in range(rounds):
             # Check stop conditions
@@ -635,27 +1043,31 @@ def custom_strategy_realistic(rounds, bankroll=100, cashout_target=2.0, bet_sequ
             if actual_bet != current_bet:
                 bet_limit_hits += 1
 
-            if actual_bet < 0.01 or balance < actual_bet:
+            if actual_bet < min_stake or balance < actual_bet:
                 ruin = True
                 break
 
             # Simulate network conditions
             if realistic_conditions and network_delay:
-                success, delay = simulate_network_conditions(True, error_simulation)
+                success, delay = simulate_network_conditions(True, error_simulation, rng)
                 total_delay += delay
 
                 if not success:
                     network_errors += 1
                     # Skip this round due to network error
-                    history.append(round(balance, 2))
+                    if trace is not None:
+                        trace.append(_traced(balance, None, actual_bet, cashout_target, cents))
+                    history.append(balance)
                     continue
 
-            crash = generate_crash_multiplier()
+            crash = generate_crash_multiplier(rng)
             rounds_played += 1
+            if trace is not None:
+                trace.append(_traced(balance, crash, actual_bet, cashout_target, cents))
 
             if crash >= cashout_target:
                 # Win
-                profit = (cashout_target - 1) * actual_bet
+                profit = win(actual_bet)
                 balance += profit
                 loss_streak = 0
                 win_streak += 1
@@ -685,20 +1097,207 @@ def custom_strategy_realistic(rounds, bankroll=100, cashout_target=2.0, bet_sequ
 
             # Set next bet amount
             current_bet = bet_amounts[sequence_index]
-            history.append(round(balance, 2))
+            history.append(balance)
 
     except Exception as e:
-        logger.error(f"Error in custom_strategy_realistic: {e}")
+        logger.error("Error in custom_strategy_realistic: %s", e)
         return {"error": f"Custom strategy simulation failed: {str(e)}"}
 
     return {
-        "history": history,
-        "final_balance": round(balance, 2),
+        "history": amounts(history, cents),
+        "final_balance": amount(balance, cents),
         "ruin_occurred": ruin,
         "target_reached": target_reached,
         "max_loss_streak": max_loss_streak,
         "rounds_played": rounds_played,
         "network_errors": network_errors,
         "total_delay": round(total_delay, 2),
-        "bet_limit_hits": bet_limit_hits
-    }
\ No newline at end of file
+        "bet_limit_hits": bet_limit_hits,
+        "state": {"balance": balance, "max_loss_streak": max_loss_streak,
+                  "loss_streak": loss_streak, "win_streak": win_streak, "ruin": ruin,
+                  "target_reached": target_reached, "network_errors": network_errors,
+                  "total_delay": total_delay, "bet_limit_hits": bet_limit_hits,
+                  "rounds_played": rounds_played, "sequence_index": sequence_index}
+    }
+
+def rules_strategy_realistic(rounds, bankroll=100, rules=None, realistic_conditions=True,
+                             min_bet=0.10, max_bet=1000.0, network_delay=True, error_simulation=True,
+                             cents=False, rng=None, state=None, distribution=None,
+                             trace=None):
+    """
+    Rule-based strategy (see strategy_dsl.compile_rules) with realistic conditions
+
+    Steps the compiled transition table (see _advance_rules), so rules are
+    not interpreted per round, and keeps the batch engine's state so runs
+    and checkpoints match a single trial of it.
+
+    Streams are drawn in fixed blocks of rounds from generators keyed by
+    (rng, block), where rng is an integer seed, so a run resumed from state
+    (the batch state of an earlier result) sees the same rounds wherever
+    it was split. distribution is an optional crash distribution object.
+    """
+    try:
+        params = build_batch_params('rules', bankroll=bankroll, min_bet=min_bet,
+                                    max_bet=max_bet, custom_params={'rules': rules}, cents=cents)
+        if distribution is not None:
+            params["distribution"] = distribution
+        if rng is None:
+            rng = np.random.SeedSequence().entropy
+        if state is None:
+            state = init_batch_state(params, 1)
+        start = state["round"]
+
+        paths = []
+        done = start
+        while done < start + rounds and state["active"].any():
+            block, offset = divmod(done, RULES_BLOCK_ROUNDS)
+            n = min(RULES_BLOCK_ROUNDS - offset, start + rounds - done)
+            streams = generate_streams(np.random.default_rng([rng, block]), 1, RULES_BLOCK_ROUNDS,
+                                       realistic_conditions, network_delay, error_simulation,
+                                       distribution=distribution)
+            window = {key: value[:, offset:offset + n] if isinstance(value, np.ndarray) else value
+                      for key, value in streams.items()}
+            paths.append(_advance_rules(params, state, window, trace))
+            done += n
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error("Error in rules_strategy_realistic: %s", e)
+        return {"error": f"Rules strategy simulation failed: {str(e)}"}
+
+    path = np.concatenate(paths, axis=1) if paths else np.empty((1, 0))
+    stopped = int(state["stop_round"][0]) - start
+    history = path[0, :stopped if stopped >= 0 else rounds] / money_scale(params)
+    if trace is not None:
+        del trace[len(history):]
+
+    return {
+        "history": [round(float(b), 2) for b in history],
+        "final_balance": round(float(state["balance"][0] / money_scale(params)), 2),
+        "ruin_occurred": bool(state["ruin"][0]),
+        "target_reached": bool(state["target_reached"][0]),
+        "max_loss_streak": int(state["max_loss_streak"][0]),
+        "rounds_played": int(state["rounds_played"][0]),
+        "network_errors": int(state["network_errors"][0]),
+        "total_delay": round(float(state["total_delay"][0]), 2),
+        "bet_limit_hits": int(state["bet_limit_hits"][0]),
+        "state": state
+    }
+
+
+def _advance_rules(params, state, streams, trace=None):
+    """
+    advance_batch for a single trial of the rules strategy, in Python scalars
+
+    One trial leaves NumPy nothing to vectorize, so the compiled table is
+    stepped round by round as the other realistic loops do, with the same
+    arithmetic as batch._step and strategy_dsl.table_stakes. Rounds played
+    are recorded to trace when given (see _traced).
+
+    Returns:
+        Array of balances shaped (1, rounds), as advance_batch with record
+    """
+    table = params["table"]
+    cents = bool(params.get("cents"))
+    stakes = table["stake"].tolist()
+    cashouts = table["cashout"].tolist()
+    next_state = table["next"].tolist()
+    expected = expected_return(table["cashout"], params.get("distribution")).tolist()
+    gains = (array_to_cents(table["cashout"]) - CENTS).tolist() if cents else None
+    breaks = table["balance_breaks"].tolist()
+    scales = table["balance_scales"].tolist()
+    cap, stop_loss, take_profit = table["max_bet"], table["stop_loss"], table["take_profit"]
+    min_bet, max_bet, smallest = params["min_bet"], params["max_bet"], min_stake(params)
+    crashes = streams["crash"][0].tolist()
+    net_ok = None if streams["net_ok"] is None else streams["net_ok"][0].tolist()
+    delays = None if streams["delay"] is None else streams["delay"][0].tolist()
+
+    balance = state["balance"][0].item()
+    rule_state = int(state["rule_state"][0])
+    loss_streak, win_streak = int(state["loss_streak"][0]), int(state["win_streak"][0])
+    max_loss_streak = int(state["max_loss_streak"][0])
+    rounds_played, network_errors = int(state["rounds_played"][0]), int(state["network_errors"][0])
+    bet_limit_hits = int(state["bet_limit_hits"][0])
+    total_delay, headroom = float(state["total_delay"][0]), float(state["min_headroom"][0])
+    control, wagered = float(state["control"][0]), state["wagered"][0].item()
+
+    start = state["round"]
+    path = np.empty((1, len(crashes)), dtype=state["balance"].dtype)
+    for j, crash in enumerate(crashes):
+        if not state["active"][0]:
+            path[0, j:] = balance
+            break
+
+        # Stop conditions checked before the bet is placed
+        stopped = None
+        if stop_loss is not None and balance <= stop_loss:
+            stopped = "ruin"
+        elif take_profit is not None and balance >= take_profit:
+            stopped = "target_reached"
+        else:
+            stake = stakes[rule_state]
+            if table["percent"]:
+                if cents:
+                    stake = (balance * stake + 50 * CENTS) // (100 * CENTS)
+                else:
+                    stake = round(stake / 100.0 * balance * 100) / 100
+            if breaks:
+                stake = stake * scales[bisect.bisect_right(breaks, balance)]
+                if cents:
+                    stake = math.floor(stake + 0.5)
+            if cap is not None:
+                stake = min(stake, cap)
+            stake = min(stake, balance)
+            actual = min(max(stake, min_bet), max_bet)
+            bet_limit_hits += actual != stake
+            headroom = min(headroom, balance - actual)
+            if actual < smallest or balance < actual:
+                stopped = "ruin"
+        if stopped:
+            state[stopped][0] = True
+            state["active"][0] = False
+            state["stop_round"][0] = start + j
+            path[0, j:] = balance
+            break
+
+        play = True
+        if net_ok is not None:
+            play = net_ok[j]
+            if play:
+                total_delay += delays[j]
+            else:
+                network_errors += 1
+        cashout = cashouts[rule_state]
+        if trace is not None:
+            trace.append(_traced(balance, crash if play else None, actual if play else 0.0,
+                                 cashout, cents))
+        if play:
+            won = crash >= cashout
+            if not won:
+                pnl = -actual
+            elif cents:
+                pnl = actual * gains[rule_state] // CENTS
+            else:
+                pnl = (cashout - 1) * actual
+            balance += pnl
+            control += pnl - actual * expected[rule_state]
+            rounds_played += 1
+            wagered += actual
+            if won:
+                win_streak, loss_streak = win_streak + 1, 0
+            else:
+                loss_streak, win_streak = loss_streak + 1, 0
+                max_loss_streak = max(max_loss_streak, loss_streak)
+            rule_state = next_state[rule_state][won]
+        path[0, j] = balance
+
+    state["round"] = start + len(crashes)
+    state["balance"][0] = balance
+    state["rule_state"][0] = rule_state
+    state["loss_streak"][0], state["win_streak"][0] = loss_streak, win_streak
+    state["max_loss_streak"][0] = max_loss_streak
+    state["rounds_played"][0], state["network_errors"][0] = rounds_played, network_errors
+    state["bet_limit_hits"][0] = bet_limit_hits
+    state["total_delay"][0], state["min_headroom"][0] = total_delay, headroom
+    state["control"][0], state["wagered"][0] = control, wagered
+    return path
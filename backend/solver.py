@@ -0,0 +1,279 @@
+import math
+import time
+import logging
+import numpy as np
+
+from batch import (
+    BANKROLL_INVARIANT_STRATEGIES, DEFAULT_CHUNK_ELEMENTS, generate_streams,
+    init_batch_state, advance_batch
+)
+from montecarlo import z_score, wilson_interval
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ('ruin_probability', 'mean_profit', 'median_profit')
+
+# Solver parameter -> candidate batch parameter keys (first present is used)
+SOLVER_PARAMETERS = {
+    'bankroll': ('bankroll',),
+    'base_bet': ('base_bet', 'bet'),
+    'stop_loss': ('stop_loss',),
+    'take_profit': ('take_profit',),
+    'cashout_target': ('cashout',),
+}
+
+# Bankroll that stands in for an unlimited one when measuring how much a
+# path needs; small enough that float balances keep cent precision
+UNLIMITED_BANKROLL = 2.0 ** 30
+
+# Streams kept in memory between iterations up to this many trial-rounds
+MAX_CACHED_ELEMENTS = 8_000_000
+
+
+def common_random_numbers(seed, trials, rounds, realistic_conditions=True, network_delay=True,
+                          error_simulation=True, chunk_elements=DEFAULT_CHUNK_ELEMENTS,
+                          distribution=None):
+    """
+    Fixed batch of crash streams reused by every solver iteration
+
+    Small batches are generated once and cached; larger ones are replayed
+    block by block from the same seed, so every iteration sees exactly the
+    same crashes either way.
+
+    Returns:
+        Iterable of stream blocks (see batch.generate_streams)
+    """
+    replay = _ReplayStreams(seed, trials, rounds, realistic_conditions, network_delay,
+                            error_simulation, max(1, chunk_elements // max(1, trials)),
+                            distribution)
+    if trials * rounds <= MAX_CACHED_ELEMENTS:
+        return list(replay)
+    return replay
+
+
+class _ReplayStreams:
+    """Regenerates the same stream blocks from a seed on every iteration"""
+
+    def __init__(self, seed, trials, rounds, realistic_conditions, network_delay,
+                 error_simulation, chunk_rounds, distribution=None):
+        self.args = (realistic_conditions, network_delay, error_simulation)
+        self.distribution = distribution
+        self.seed = seed
+        self.trials = trials
+        self.rounds = rounds
+        self.chunk_rounds = chunk_rounds
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed)
+        for start in range(0, self.rounds, self.chunk_rounds):
+            yield generate_streams(rng, self.trials, min(self.chunk_rounds, self.rounds - start),
+                                   *self.args, distribution=self.distribution)
+
+
+def run_on_streams(params, trials, streams):
+    """Run a batch over fixed streams, stopping once every trial has stopped"""
+    state = init_batch_state(params, trials)
+    for block in streams:
+        advance_batch(params, state, block)
+        if not state["active"].any():
+            break
+    return state
+
+
+def _objective_value(objective, params, state, z):
+    """
+    Evaluate an objective on a finished batch
+
+    Returns:
+        Tuple of (value, (low, high)) with a confidence interval on the value:
+        Wilson for ruin, normal for the mean and order statistics for the median
+    """
+    trials = state["ruin"].size
+    if objective == 'ruin_probability':
+        return float(state["ruin"].mean()), wilson_interval(int(state["ruin"].sum()), trials, z)
+    profit = state["balance"] - np.asarray(params.get("bankroll", 0.0), dtype=float)
+    if objective == 'mean_profit':
+        mean = float(profit.mean())
+        half = z * float(profit.std(ddof=1)) / math.sqrt(trials) if trials > 1 else 0.0
+        return mean, (mean - half, mean + half)
+    ordered = np.sort(profit)
+    spread = z * math.sqrt(trials) / 2
+    low = ordered[max(0, int(math.floor(trials / 2 - spread)))]
+    high = ordered[min(trials - 1, int(math.ceil(trials / 2 + spread)))]
+    return float(np.median(profit)), (float(low), float(high))
+
+
+def _solve_bankroll_quantile(params, trials, streams, target, z):
+    """
+    Exact ruin-vs-bankroll curve from a single run
+
+    For bankroll-invariant strategies the path does not depend on the
+    bankroll until ruin, so one run with an effectively unlimited bankroll
+    gives every trial's required bankroll (the bankroll minus its closest
+    approach to ruin). Ruin at bankroll B is then the fraction of trials
+    requiring more than B, and thresholds are order statistics. The
+    threshold is confirmed with a direct run at that bankroll.
+    """
+    state = run_on_streams(dict(params, bankroll=UNLIMITED_BANKROLL), trials, streams)
+    headroom = np.where(np.isfinite(state["min_headroom"]), state["min_headroom"], UNLIMITED_BANKROLL)
+    required = np.sort(np.round(UNLIMITED_BANKROLL - headroom, 2))
+
+    def bankroll_for(allowed_ruins):
+        # Smallest bankroll with at most allowed_ruins trials requiring more:
+        # the (allowed_ruins + 1)-th largest requirement
+        allowed_ruins = max(0, min(allowed_ruins, trials))
+        return float(required[trials - allowed_ruins - 1]) if allowed_ruins < trials else 0.0
+
+    point = bankroll_for(int(math.floor(target * trials)))
+    # Largest ruin count whose Wilson upper/lower bound is still within target
+    upper_ok = [k for k in range(trials + 1) if wilson_interval(k, trials, z)[1] <= target]
+    lower_ok = [k for k in range(trials + 1) if wilson_interval(k, trials, z)[0] <= target]
+    conservative = bankroll_for(max(upper_ok)) if upper_ok else None
+    optimistic = bankroll_for(max(lower_ok)) if lower_ok else None
+    ruins = int((required > point).sum())
+    direct = int(run_on_streams(dict(params, bankroll=point), trials, streams)["ruin"].sum())
+    if direct != ruins:
+        logger.warning("Bankroll %.2f ruins %d trials when run, %d by order statistic",
+                       point, direct, ruins)
+        ruins = direct
+
+    return {
+        "threshold": round(point, 2),
+        # Bankrolls from "ruin may still be at target" to "ruin is within target"
+        "threshold_interval": [None if optimistic is None else round(optimistic, 2),
+                               None if conservative is None else round(conservative, 2)],
+        "objective_at_threshold": round(ruins / trials, 6),
+        "objective_interval": [round(v, 6) for v in wilson_interval(ruins, trials, z)],
+        "iterations": 1,
+        "evaluations": 2,
+        "method": "order_statistic",
+    }
+
+
+def solve_threshold(params, rounds, parameter='bankroll', objective='ruin_probability',
+                    target=0.05, lower=None, upper=None, trials=2000, seed=0,
+                    confidence=0.95, tolerance=None, max_iterations=40,
+                    realistic_conditions=True, network_delay=True, error_simulation=True,
+                    chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Find the parameter value at which an objective crosses a target
+
+    Every evaluation runs against the same fixed batch of crash streams
+    (common random numbers), so the estimated objective is a deterministic,
+    monotone step function of the parameter instead of a noisy one, and
+    bisection converges. Bankroll searches for bankroll-invariant
+    strategies are answered from a single run (see _solve_bankroll_quantile).
+
+    Args:
+        params: Parameters from batch.build_batch_params
+        rounds: Rounds per trial
+        parameter: One of SOLVER_PARAMETERS
+        objective: "ruin_probability", "mean_profit" or "median_profit"
+        target: Objective value to solve for (e.g. 0.05 ruin, 0 profit)
+        lower, upper: Search bracket; defaults depend on the parameter
+        trials: Size of the fixed crash batch
+        seed: Seed of the fixed crash batch
+        confidence: Confidence level of the reported bounds
+        tolerance: Bracket width at which bisection stops
+        chunk_elements: Trial-rounds per block of the crash streams
+
+    Returns:
+        Dictionary with the threshold, its confidence bracket and the
+        objective at the threshold
+
+    Raises:
+        ValueError: If the parameter does not apply to the strategy or the
+            bracket does not contain the target
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Invalid objective: {objective}")
+    if parameter not in SOLVER_PARAMETERS:
+        raise ValueError(f"Invalid parameter: {parameter}")
+    key = next((k for k in SOLVER_PARAMETERS[parameter] if k in params), None)
+    if key is None or params["strategy"] == 'rules':
+        raise ValueError(f"Parameter {parameter} does not apply to strategy {params['strategy']}")
+    if params.get("cents"):
+        raise ValueError("The threshold solver works on float amounts; cents mode is not supported")
+
+    started = time.perf_counter()
+    z = z_score(confidence)
+    streams = common_random_numbers(seed, trials, rounds, realistic_conditions,
+                                    network_delay, error_simulation, chunk_elements,
+                                    distribution=params.get("distribution"))
+
+    if (parameter == 'bankroll' and objective == 'ruin_probability'
+            and params["strategy"] in BANKROLL_INVARIANT_STRATEGIES):
+        result = _solve_bankroll_quantile(params, trials, streams, target, z)
+        result.update(parameter=parameter, objective=objective, target=target, trials=trials,
+                      elapsed_seconds=round(time.perf_counter() - started, 3))
+        return result
+
+    current = float(params[key])
+    if lower is None:
+        lower = 1.01 if key == 'cashout' else 0.01 if key in ('base_bet', 'bet') else 0.0
+    if upper is None:
+        upper = max(current * 100, lower + 1)
+    if tolerance is None:
+        tolerance = max((upper - lower) * 1e-4, 0.01)
+
+    cache = {}
+
+    def evaluate(x):
+        x = round(x, 6)
+        if x not in cache:
+            trial_params = dict(params, **{key: x})
+            state = run_on_streams(trial_params, trials, streams)
+            cache[x] = _objective_value(objective, trial_params, state, z)
+        return cache[x][0]
+
+    def meets(f):
+        # A value meets the target with ruin at or below it, profit at or above it
+        return f <= 0 if objective == 'ruin_probability' else f >= 0
+
+    f_low = evaluate(lower) - target
+    f_high = evaluate(upper) - target
+    if meets(f_low) == meets(f_high):
+        if f_low == 0:
+            upper, f_high = lower, f_low
+        elif f_high == 0:
+            lower, f_low = upper, f_high
+        else:
+            raise ValueError(f"Target {target} is not bracketed by {parameter} in [{lower}, {upper}]")
+
+    # The objective is a step function, so values exactly at the target
+    # count as meeting it; the bracket keeps one end that meets the target
+    # and one that does not, and closes on the value nearest the other end
+    iterations = 0
+    while upper - lower > tolerance and iterations < max_iterations:
+        middle = (lower + upper) / 2
+        f_middle = evaluate(middle) - target
+        iterations += 1
+        if meets(f_middle) == meets(f_low):
+            lower, f_low = middle, f_middle
+        else:
+            upper, f_high = middle, f_middle
+
+    threshold = lower if meets(f_low) else upper
+    value, interval = cache[round(threshold, 6)]
+    # Evaluated parameter values whose objective interval still contains the target
+    plausible = [x for x, (_, (low, high)) in cache.items() if low <= target <= high]
+
+    logger.info("Solved %s for %s=%s in %s iterations", parameter, objective, target, iterations)
+
+    return {
+        "threshold": round(threshold, 4),
+        # Final bracket: the threshold and, unless both ends meet the
+        # target, a value within tolerance of it that does not
+        "bracket": [round(lower, 4), round(upper, 4)],
+        "threshold_interval": [round(min(plausible), 4), round(max(plausible), 4)] if plausible else None,
+        "objective_at_threshold": round(value, 6),
+        "objective_interval": [round(interval[0], 6), round(interval[1], 6)],
+        "iterations": iterations,
+        "evaluations": len(cache),
+        "method": "bisection",
+        "parameter": parameter,
+        "objective": objective,
+        "target": target,
+        "trials": trials,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
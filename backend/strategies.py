@@ -1,8 +1,13 @@
 import random
 import logging
 
+from distributions import DefaultCrash
+
 logger = logging.getLogger(__name__)
 
+# The basic strategies play the default law capped at 1000x
+BASIC_CRASH_DISTRIBUTION = DefaultCrash({"type": "default", "max_crash": 1000.0})
+
 
 def generate_crash_multiplier():
     """
@@ -10,15 +15,9 @@ def generate_crash_multiplier():
     Ensures safe generation without division by zero
     """
     try:
-        r = random.random()
-        # Prevent extreme values and division by zero
-        if r >= 0.99:
-            return 1.0
-        # Use a more controlled exponential distribution
-        multiplier = 1 / (1 - r)
-        return max(1.01, min(multiplier, 1000.0))  # Cap at 1000x
+        return BASIC_CRASH_DISTRIBUTION.crash(random.random())
     except Exception as e:
-        logger.error(f"Error generating crash multiplier: {e}")
+        logger.error("Error generating crash multiplier: %s", e)
         return 1.01
 
 
@@ -38,7 +37,7 @@ def early_cashout(rounds, bet, cashout=1.5):
                 balance -= bet
             history.append(round(balance, 2))
     except Exception as e:
-        logger.error(f"Error in early_cashout: {e}")
+        logger.error("Error in early_cashout: %s", e)
         return []
 
     return history
@@ -77,7 +76,7 @@ def dual_bet(rounds, bet1=1.0, cashout1=1.5, bet2=1.0, cashout2=5.0):
 
             history.append(round(balance, 2))
     except Exception as e:
-        logger.error(f"Error in dual_bet: {e}")
+        logger.error("Error in dual_bet: %s", e)
         return []
 
     return history
@@ -114,7 +113,7 @@ def martingale_strategy(rounds, base_bet=1.0, cashout=2.0, bankroll=100):
             history.append(round(balance, 2))
 
     except Exception as e:
-        logger.error(f"Error in martingale_strategy: {e}")
+        logger.error("Error in martingale_strategy: %s", e)
         return {
             "history": [],
             "final_balance": 0.0,
@@ -165,7 +164,7 @@ def paroli_strategy(rounds, base_bet=1.0, cashout=2.0, bankroll=100):
             history.append(round(balance, 2))
 
     except Exception as e:
-        logger.error(f"Error in paroli_strategy: {e}")
+        logger.error("Error in paroli_strategy: %s", e)
         return {
             "history": [],
             "final_balance": 0.0,
@@ -210,7 +209,7 @@ def fixed_percent_strategy(rounds, percent=5, cashout=2.0, bankroll=100):
             history.append(round(balance, 2))
 
     except Exception as e:
-        logger.error(f"Error in fixed_percent_strategy: {e}")
+        logger.error("Error in fixed_percent_strategy: %s", e)
         return {
             "history": [],
             "final_balance": 0.0,
@@ -262,7 +261,7 @@ def target_profit_strategy(rounds, base_bet=1.0, target_profit=50, cashout=2.0,
             history.append(round(balance, 2))
 
     except Exception as e:
-        logger.error(f"Error in target_profit_strategy: {e}")
+        logger.error("Error in target_profit_strategy: %s", e)
         return {
             "history": [],
             "final_balance": 0.0,
@@ -383,7 +382,7 @@ def custom_strategy(rounds, bankroll=100, cashout_target=2.0, bet_sequence="1,2,
             history.append(round(balance, 2))
 
     except Exception as e:
-        logger.error(f"Error in custom_strategy: {e}")
+        logger.error("Error in custom_strategy: %s", e)
         return {
             "history": [],
             "final_balance": 0.0,
@@ -443,7 +442,7 @@ def validate_strategy_params(strategy, params):
                 validated['progression_type'] = 'loss'
 
     except Exception as e:
-        logger.error(f"Error validating strategy params: {e}")
+        logger.error("Error validating strategy params: %s", e)
         # Return safe defaults
         return {
             'rounds': 1000,
@@ -494,6 +493,13 @@ def get_strategy_info(strategy):
             'required_params': ['rounds', 'bet1', 'bet2'],
             'optional_params': ['cashout1', 'cashout2']
         },
+        'ladder': {
+            'name': 'Cashout Ladder',
+            'description': 'Place several bets each round, each cashing out at its own target',
+            'risk_level': 'Variable',
+            'required_params': ['rounds', 'rungs'],
+            'optional_params': []
+        },
         'martingale': {
             'name': 'Martingale',
             'description': 'Double bet after each loss to recover previous losses',
@@ -528,6 +534,13 @@ def get_strategy_info(strategy):
             'risk_level': 'Variable',
             'required_params': ['rounds', 'bankroll', 'cashout_target', 'bet_sequence'],
             'optional_params': ['max_bet', 'stop_loss', 'take_profit', 'progression_type']
+        },
+        'rules': {
+            'name': 'Rule-Based Strategy',
+            'description': 'Declarative JSON rules over streaks, balance and sequence index',
+            'risk_level': 'Variable',
+            'required_params': ['rounds', 'bankroll', 'rules'],
+            'optional_params': []
         }
     }
 
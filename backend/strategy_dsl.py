@@ -0,0 +1,279 @@
+import json
+import math
+import logging
+import numpy as np
+
+from money import hundredths_of_percent
+
+logger = logging.getLogger(__name__)
+
+INDEX_ACTIONS = ('advance', 'retreat', 'reset', 'hold')
+CONDITION_KEYS = ('outcome', 'loss_streak', 'win_streak', 'index')
+MAX_SEQUENCE_LENGTH = 64
+MAX_STREAK_THRESHOLD = 64
+
+
+def _require(condition, message):
+    """Raise ValueError with message unless condition holds"""
+    if not condition:
+        raise ValueError(message)
+
+
+def _number(value, field):
+    """A finite real number as float, or ValueError naming field"""
+    _require(isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value),
+             f"{field} must be a number")
+    return float(value)
+
+
+def _rule_list(spec, name):
+    """Optional list of rule objects from the spec"""
+    rules = spec.get(name, [])
+    _require(isinstance(rules, list), f"{name} must be a list")
+    return rules
+
+
+def _parse_action(action, field):
+    """Normalize an action into (index action or goto target, clear_streaks)"""
+    if isinstance(action, str):
+        _require(action in INDEX_ACTIONS, f"{field}: unknown action '{action}'")
+        return action, False
+    _require(isinstance(action, dict), f"{field}: action must be a string or object")
+    clear = bool(action.get('clear_streaks', False))
+    if 'goto' in action:
+        _require(isinstance(action['goto'], int) and action['goto'] >= 0,
+                 f"{field}: goto must be a non-negative integer")
+        return int(action['goto']), clear
+    do = action.get('do', 'hold')
+    _require(do in INDEX_ACTIONS, f"{field}: unknown action '{do}'")
+    return do, clear
+
+
+def _parse_condition(condition, field, allow_outcome):
+    """Validate a rule condition object"""
+    _require(isinstance(condition, dict), f"{field}: condition must be an object")
+    for key in condition:
+        _require(key in CONDITION_KEYS, f"{field}: unknown condition '{key}'")
+    if 'outcome' in condition:
+        _require(allow_outcome, f"{field}: outcome is only known after the round")
+        _require(condition['outcome'] in ('win', 'loss'), f"{field}: outcome must be 'win' or 'loss'")
+    for key in ('loss_streak', 'win_streak'):
+        if key in condition:
+            value = condition[key]
+            _require(isinstance(value, int) and 0 <= value <= MAX_STREAK_THRESHOLD,
+                     f"{field}: {key} must be an integer between 0 and {MAX_STREAK_THRESHOLD}")
+    if 'index' in condition:
+        index = condition['index']
+        condition = dict(condition, index=index if isinstance(index, list) else [index])
+    return condition
+
+
+def _matches(condition, index, loss_streak, win_streak, outcome=None):
+    """Evaluate a validated condition against one concrete state"""
+    if 'outcome' in condition and condition['outcome'] != outcome:
+        return False
+    if loss_streak < condition.get('loss_streak', 0):
+        return False
+    if win_streak < condition.get('win_streak', 0):
+        return False
+    if 'index' in condition and index not in condition['index']:
+        return False
+    return True
+
+
+def parse_rules(rules):
+    """Accept a rules spec as a JSON string or already-decoded object"""
+    if isinstance(rules, str):
+        try:
+            rules = json.loads(rules)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid rules JSON: {e}")
+    _require(isinstance(rules, dict), "Rules must be a JSON object")
+    return rules
+
+
+def compile_rules(rules):
+    """
+    Compile a declarative strategy into a finite-state transition table
+
+    A state is (sequence index, signed streak), where the streak counts
+    consecutive losses (positive) or wins (negative) and saturates at the
+    largest threshold any rule refers to. Rules are checked in order after
+    each round and the first match decides the next sequence index; when no
+    rule matches, on_win/on_loss apply.
+
+    Spec fields:
+        bets: Stake per sequence index (amounts, or percent of balance when
+            bet_mode is "percent")
+        bet_mode: "fixed" (default) or "percent"
+        cashout: Cashout target, either one number or one per sequence index
+        on_win / on_loss: Default action: advance, retreat, reset or hold
+        rules: List of {"if": condition, "then": action}. Conditions may test
+            outcome ("win"/"loss"), loss_streak and win_streak (at least) and
+            index (equal, or one of a list). Actions are an action name,
+            {"goto": n} or {"do": name}, optionally with "clear_streaks".
+        cashout_rules: List of {"if": condition, "cashout": x} evaluated on
+            the state entering a round; the first match overrides cashout
+        balance_rules: List of {"below": x, "scale": f} or {"above": x,
+            "scale": f} multiplying the stake while balance < x / >= x
+        max_bet, stop_loss, take_profit: Optional bet cap and balance
+            thresholds that stop the run
+
+    Args:
+        rules: Spec as a JSON string or dict
+
+    Returns:
+        Dictionary of NumPy arrays "stake", "cashout" and "next" (indexed
+        [state, won]) plus the scalar settings the kernel needs
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    spec = parse_rules(rules)
+
+    bets = spec.get('bets')
+    _require(isinstance(bets, list) and 0 < len(bets) <= MAX_SEQUENCE_LENGTH,
+             f"bets must be a list of 1 to {MAX_SEQUENCE_LENGTH} numbers")
+    bets = [_number(b, f"bets[{n}]") for n, b in enumerate(bets)]
+    _require(all(b > 0 for b in bets), "bets must be positive")
+    length = len(bets)
+
+    bet_mode = spec.get('bet_mode', 'fixed')
+    _require(bet_mode in ('fixed', 'percent'), "bet_mode must be 'fixed' or 'percent'")
+    if bet_mode == 'percent':
+        _require(all(b <= 100 for b in bets), "percent bets must be at most 100")
+
+    cashout = spec.get('cashout', 2.0)
+    cashouts = cashout if isinstance(cashout, list) else [cashout] * length
+    _require(len(cashouts) == length, "cashout list must match the length of bets")
+    cashouts = [max(1.01, min(_number(c, "cashout"), 1000.0)) for c in cashouts]
+
+    on_win = _parse_action(spec.get('on_win', 'reset'), 'on_win')
+    on_loss = _parse_action(spec.get('on_loss', 'advance'), 'on_loss')
+
+    transitions = []
+    for n, rule in enumerate(_rule_list(spec, 'rules')):
+        field = f"rules[{n}]"
+        _require(isinstance(rule, dict) and 'then' in rule, f"{field}: rule needs 'then'")
+        transitions.append((_parse_condition(rule.get('if', {}), field, True),
+                            _parse_action(rule['then'], field)))
+
+    cashout_rules = []
+    for n, rule in enumerate(_rule_list(spec, 'cashout_rules')):
+        field = f"cashout_rules[{n}]"
+        _require(isinstance(rule, dict) and 'cashout' in rule, f"{field}: rule needs 'cashout'")
+        cashout_rules.append((_parse_condition(rule.get('if', {}), field, False),
+                              max(1.01, min(_number(rule['cashout'], f"{field}: cashout"), 1000.0))))
+
+    for action in [on_win, on_loss] + [a for _, a in transitions]:
+        if isinstance(action[0], int):
+            _require(action[0] < length, "goto target is beyond the bet sequence")
+
+    # Streaks saturate at the largest threshold referenced by any rule
+    conditions = [c for c, _ in transitions] + [c for c, _ in cashout_rules]
+    loss_cap = max([c.get('loss_streak', 0) for c in conditions] + [1])
+    win_cap = max([c.get('win_streak', 0) for c in conditions] + [1])
+    width = loss_cap + win_cap + 1
+
+    def encode(index, streak):
+        return index * width + streak + win_cap
+
+    states = length * width
+    stake = np.empty(states)
+    state_cashout = np.empty(states)
+    next_state = np.empty((states, 2), dtype=np.int64)
+
+    for index in range(length):
+        for streak in range(-win_cap, loss_cap + 1):
+            s = encode(index, streak)
+            losses, wins = max(streak, 0), max(-streak, 0)
+            stake[s] = bets[index]
+            state_cashout[s] = cashouts[index]
+            for condition, target in cashout_rules:
+                if _matches(condition, index, losses, wins):
+                    state_cashout[s] = target
+                    break
+
+            for won in (0, 1):
+                outcome = 'win' if won else 'loss'
+                if won:
+                    new_streak = -min(wins + 1, win_cap)
+                else:
+                    new_streak = min(losses + 1, loss_cap)
+                action = on_win if won else on_loss
+                for condition, rule_action in transitions:
+                    if _matches(condition, index, max(new_streak, 0), max(-new_streak, 0), outcome):
+                        action = rule_action
+                        break
+
+                move, clear = action
+                if isinstance(move, int):
+                    new_index = move
+                elif move == 'advance':
+                    new_index = min(index + 1, length - 1)
+                elif move == 'retreat':
+                    new_index = max(index - 1, 0)
+                elif move == 'reset':
+                    new_index = 0
+                else:
+                    new_index = index
+                next_state[s, won] = encode(new_index, 0 if clear else new_streak)
+
+    # Piecewise-constant stake multiplier over balance, looked up by searchsorted
+    balance_rules = _rule_list(spec, 'balance_rules')
+    for n, rule in enumerate(balance_rules):
+        _require(isinstance(rule, dict) and ('below' in rule) != ('above' in rule),
+                 f"balance_rules[{n}]: rule needs exactly one of 'below' or 'above'")
+        _number(rule.get('below', rule.get('above')), f"balance_rules[{n}]: threshold")
+    breaks = sorted({float(r.get('below', r.get('above'))) for r in balance_rules})
+    scales = np.ones(len(breaks) + 1)
+    for n, rule in enumerate(balance_rules):
+        factor = _number(rule.get('scale', 1.0), f"balance_rules[{n}]: scale")
+        _require(factor >= 0, f"balance_rules[{n}]: scale must be non-negative")
+        if 'below' in rule:
+            scales[:breaks.index(float(rule['below'])) + 1] *= factor
+        else:
+            scales[breaks.index(float(rule['above'])) + 1:] *= factor
+
+    def optional(name):
+        value = spec.get(name)
+        return None if value is None else _number(value, name)
+
+    return {
+        "stake": stake,
+        "cashout": state_cashout,
+        "next": next_state,
+        "initial": encode(0, 0),
+        "percent": bet_mode == 'percent',
+        "balance_breaks": np.asarray(breaks),
+        "balance_scales": scales,
+        "max_bet": optional('max_bet'),
+        "stop_loss": optional('stop_loss'),
+        "take_profit": optional('take_profit'),
+        "states": states,
+    }
+
+
+def table_stakes(table, state, balance):
+    """
+    Vectorized stake lookup for compiled rule states
+
+    Tables converted to cents (batch.build_batch_params with cents set)
+    hold percent stakes in hundredths of a percent; percent and scaled
+    stakes are then rounded half up to the cent.
+    """
+    stake = table["stake"][state]
+    cents = table.get("cents", False)
+    if table["percent"]:
+        if cents:
+            stake = hundredths_of_percent(balance, stake)
+        else:
+            stake = np.round(stake / 100.0 * balance, 2)
+    if table["balance_breaks"].size:
+        stake = stake * table["balance_scales"][
+            np.searchsorted(table["balance_breaks"], balance, side='right')]
+        if cents:
+            stake = np.floor(stake + 0.5).astype(np.int64)
+    if table["max_bet"] is not None:
+        stake = np.minimum(stake, table["max_bet"])
+    return np.minimum(stake, balance)
@@ -0,0 +1,139 @@
+import time
+import logging
+
+import numpy as np
+
+from batch import DEFAULT_CHUNK_ELEMENTS, init_batch_state, advance_batch, generate_streams
+from montecarlo import z_score
+
+logger = logging.getLogger(__name__)
+
+# Strategies with a bankroll that can run out (or a target that ends the run)
+SURVIVAL_STRATEGIES = ('martingale', 'paroli', 'fixed_percent', 'target_profit', 'custom', 'rules')
+
+DEFAULT_SURVIVAL_POINTS = 500
+DEFAULT_HISTOGRAM_BINS = 50
+
+
+def kaplan_meier(events, censored, trials, z):
+    """
+    Kaplan-Meier survival estimate with a Greenwood confidence band
+
+    Args:
+        events: Ruins at each round index
+        censored: Trials leaving without ruin (target reached) at each
+            round index; trials still playing at the end need not be listed
+        trials: Trials at risk at round 0
+        z: Normal critical value of the band
+
+    Returns:
+        Tuple of (survival, lower, upper) arrays aligned with events. An
+        event at round k means the trial was ruined after k rounds, before
+        betting on round k + 1; censoring at k counts after that round's
+        events.
+    """
+    events = np.asarray(events, dtype=float)
+    leaving = events + np.asarray(censored, dtype=float)
+    at_risk = trials - np.concatenate([[0.0], np.cumsum(leaving)[:-1]])
+    safe = np.maximum(at_risk, 1.0)
+
+    survival = np.cumprod(np.where(at_risk > 0, 1.0 - events / safe, 1.0))
+    remaining = np.maximum(at_risk - events, 1.0)
+    terms = np.where((at_risk > events) & (at_risk > 0), events / (safe * remaining), 0.0)
+    margin = z * survival * np.sqrt(np.cumsum(terms))
+    return survival, np.clip(survival - margin, 0.0, 1.0), np.clip(survival + margin, 0.0, 1.0)
+
+
+def stop_histogram(counts, bins):
+    """Counts per stop round folded into at most bins equal-width round ranges"""
+    rounds = len(counts) - 1
+    edges = np.unique(np.linspace(0, rounds + 1, min(bins, rounds + 1) + 1).round().astype(np.int64))
+    folded = np.add.reduceat(counts, edges[:-1]) if edges.size > 1 else np.zeros(0, dtype=np.int64)
+    return {"edges": edges.tolist(), "counts": folded.tolist()}
+
+
+def survival_analysis(params, rounds, trials=10000, points=DEFAULT_SURVIVAL_POINTS,
+                      bins=DEFAULT_HISTOGRAM_BINS, confidence=0.95, seed=None,
+                      realistic_conditions=True, network_delay=True, error_simulation=True,
+                      chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Survival curve and time-to-ruin / time-to-target distributions of a strategy
+
+    Trials run in blocks of rounds; after each block the trials that stopped
+    in it are added to per-round counts of ruins and targets reached, so
+    only one counter per round is kept. Ruin is the event; trials that reach
+    their target leave the risk set as censored, so the Kaplan-Meier curve
+    is the probability of staying solvent through round k had the player
+    kept going. The cumulative fractions ruined and at target are reported
+    alongside as they happened.
+
+    Args:
+        params: Parameters from batch.build_batch_params
+        rounds: Rounds per trial
+        trials: Number of trials
+        points: At most this many rounds of the curves are returned
+        bins: Histogram bins of the stop rounds
+        confidence: Confidence level of the survival band
+        seed: Optional seed for reproducible runs
+
+    Returns:
+        Dictionary with the sampled curves, stop-round histograms and
+        median times
+
+    Raises:
+        ValueError: If the strategy has no bankroll to run out
+    """
+    if params["strategy"] not in SURVIVAL_STRATEGIES:
+        raise ValueError(f"Survival analysis supports {', '.join(SURVIVAL_STRATEGIES)}")
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    state = init_batch_state(params, trials)
+    chunk_rounds = max(1, chunk_elements // max(1, trials))
+    ruins = np.zeros(rounds + 1, dtype=np.int64)
+    targets = np.zeros(rounds + 1, dtype=np.int64)
+
+    done = 0
+    while done < rounds and state["active"].any():
+        n = min(chunk_rounds, rounds - done)
+        was_active = state["active"].copy()
+        streams = generate_streams(rng, trials, n, realistic_conditions, network_delay,
+                                   error_simulation, distribution=params.get("distribution"))
+        advance_batch(params, state, streams)
+        finished = was_active & ~state["active"]
+        stop_round = state["stop_round"]
+        ruins += np.bincount(stop_round[finished & state["ruin"]], minlength=rounds + 1)
+        targets += np.bincount(stop_round[finished & state["target_reached"]], minlength=rounds + 1)
+        done += n
+
+    survival, lower, upper = kaplan_meier(ruins, targets, trials, z_score(confidence))
+    ruined = np.cumsum(ruins) / trials
+    at_target = np.cumsum(targets) / trials
+
+    below_half = np.flatnonzero(survival <= 0.5)
+    ruin_rounds = np.repeat(np.arange(rounds + 1), ruins)
+    target_rounds = np.repeat(np.arange(rounds + 1), targets)
+    sampled = np.unique(np.linspace(0, rounds, min(points, rounds + 1)).round().astype(np.int64))
+
+    elapsed = time.perf_counter() - started
+    logger.info("Survival analysis: %s trials x %s rounds in %.2fs", trials, rounds, elapsed)
+
+    return {
+        "trials": trials,
+        "rounds": rounds,
+        "confidence": confidence,
+        "round": sampled.tolist(),
+        "survival": np.round(survival[sampled], 6).tolist(),
+        "survival_lower": np.round(lower[sampled], 6).tolist(),
+        "survival_upper": np.round(upper[sampled], 6).tolist(),
+        "ruined": np.round(ruined[sampled], 6).tolist(),
+        "target_reached": np.round(at_target[sampled], 6).tolist(),
+        "ruin_probability": round(float(ruined[-1]), 6),
+        "target_probability": round(float(at_target[-1]), 6),
+        "median_survival_round": int(below_half[0]) if below_half.size else None,
+        "median_time_to_ruin": float(np.median(ruin_rounds)) if ruin_rounds.size else None,
+        "median_time_to_target": float(np.median(target_rounds)) if target_rounds.size else None,
+        "time_to_ruin": stop_histogram(ruins, bins),
+        "time_to_target": stop_histogram(targets, bins),
+        "elapsed_seconds": round(elapsed, 3),
+    }
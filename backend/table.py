@@ -0,0 +1,273 @@
+import json
+import math
+import time
+import logging
+import numpy as np
+
+from batch import (
+    BATCH_STRATEGIES, STATELESS_STRATEGIES, DEFAULT_CHUNK_ELEMENTS, NETWORK_ERROR_RATE,
+    MIN_NETWORK_DELAY, MAX_NETWORK_DELAY, build_batch_params, init_batch_state,
+    advance_batch, generate_crash_batch, stateless_stake
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_TABLE_PLAYERS = 100000
+
+# Group amounts that must be positive numbers when given
+POSITIVE_GROUP_FIELDS = ('bet', 'target_profit', 'percent_bet')
+
+
+def _is_number(value):
+    """Whether value is a finite real number (bools are not)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def check_group_amounts(group, label):
+    """
+    Check a group's bet, target_profit and percent_bet, when given
+
+    Raises:
+        ValueError: Naming label if one is not a positive number
+    """
+    for field in POSITIVE_GROUP_FIELDS:
+        value = group.get(field, 1)
+        if not _is_number(value) or value <= 0:
+            raise ValueError(f"{label}: {field} must be a positive number")
+    if group.get('percent_bet', 5) > 100:
+        raise ValueError(f"{label}: percent_bet must be at most 100")
+
+
+def parse_player_groups(groups):
+    """
+    Validate a table's player mix
+
+    Each group is an object with "strategy", "count" and the strategy's
+    parameters: "bet", "bankroll" (a number, or [low, high] to draw each
+    player's bankroll uniformly), "target_profit", "percent_bet", the custom
+    strategy fields, "rules" or the ladder's "rungs".
+
+    Raises:
+        ValueError: If the mix is malformed
+    """
+    if isinstance(groups, str):
+        try:
+            groups = json.loads(groups)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid players JSON: {e}")
+    if not isinstance(groups, list) or not groups:
+        raise ValueError("players must be a non-empty list of player groups")
+
+    total = 0
+    for n, group in enumerate(groups):
+        if not isinstance(group, dict):
+            raise ValueError(f"players[{n}] must be an object")
+        if group.get('strategy') not in BATCH_STRATEGIES:
+            raise ValueError(f"players[{n}]: invalid strategy {group.get('strategy')}")
+        count = group.get('count', 1)
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            raise ValueError(f"players[{n}]: count must be a positive integer")
+        bankroll = group.get('bankroll', 100)
+        if isinstance(bankroll, list):
+            if (len(bankroll) != 2 or not all(_is_number(b) for b in bankroll)
+                    or not 0 < bankroll[0] <= bankroll[1]):
+                raise ValueError(f"players[{n}]: bankroll range must be [low, high]")
+        elif not _is_number(bankroll) or bankroll <= 0:
+            raise ValueError(f"players[{n}]: bankroll must be positive")
+        check_group_amounts(group, f"players[{n}]")
+        total += count
+
+    if total > MAX_TABLE_PLAYERS:
+        raise ValueError(f"Table is limited to {MAX_TABLE_PLAYERS} players")
+    return groups
+
+
+def group_params(group, rng, min_bet, max_bet):
+    """Batch parameters for one player group, with per-player bankrolls"""
+    bankroll = group.get('bankroll', 100)
+    if isinstance(bankroll, list):
+        bankroll = rng.uniform(bankroll[0], bankroll[1], group.get('count', 1))
+
+    custom_params = None
+    if group['strategy'] == 'custom':
+        custom_params = {
+            'cashout_target': group.get('cashout_target', 2.0),
+            'bet_sequence': group.get('bet_sequence', '1,2,4'),
+            'max_bet': group.get('max_bet', 20),
+            'stop_loss': group.get('stop_loss', 50),
+            'take_profit': group.get('take_profit', 200),
+            'progression_type': group.get('progression_type', 'loss'),
+        }
+    elif group['strategy'] == 'rules':
+        custom_params = {'rules': group.get('rules')}
+    elif group['strategy'] == 'ladder':
+        custom_params = {'rungs': group.get('rungs')}
+
+    return build_batch_params(
+        group['strategy'],
+        bet=group.get('bet', 1.0),
+        bankroll=bankroll,
+        target_profit=group.get('target_profit', 50),
+        percent_bet=group.get('percent_bet', 5),
+        min_bet=min_bet,
+        max_bet=max_bet,
+        custom_params=custom_params
+    )
+
+
+def simulate_table(groups, rounds, seed=None, realistic_conditions=True, network_delay=True,
+                   error_simulation=True, min_bet=0.10, max_bet=1000.0, sample_every=1,
+                   chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Simulate many players betting on the same crash stream
+
+    Every group keeps a players x strategy-state batch that advances in
+    lockstep over one shared crash multiplier per round; network outcomes
+    stay per player. Rounds are processed in chunks sized so that the
+    per-player stream arrays never exceed chunk_elements, so memory is
+    bounded by the number of players rather than players x rounds.
+
+    The built-in early/mid/high/dual strategies track P&L from zero and
+    cannot be ruined, as in simulate_strategy; use a "rules" group for
+    bankroll-limited flat bettors.
+
+    Args:
+        groups: Player groups, see parse_player_groups
+        rounds: Number of shared rounds
+        seed: Optional seed for reproducible runs
+        sample_every: Keep every Nth round in the returned series
+
+    Returns:
+        Dictionary with per-round table series and per-group summaries
+    """
+    groups = parse_player_groups(groups)
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+
+    members = []
+    for group in groups:
+        params = group_params(group, rng, min_bet, max_bet)
+        state = init_batch_state(params, group.get('count', 1))
+        members.append((group, params, state, float(state["balance"].sum())))
+
+    players = sum(state["balance"].size for _, _, state, _ in members)
+    chunk_rounds = max(1, min(rounds, chunk_elements // max(1, players)))
+    simulate_network = realistic_conditions and network_delay
+
+    samples = list(range(sample_every - 1, rounds, sample_every))
+    series = {
+        "round": [r + 1 for r in samples],
+        "wagered": np.zeros(len(samples)),
+        "house_pnl": np.zeros(len(samples)),
+        "active_players": np.zeros(len(samples), dtype=np.int64),
+        "ruined_players": np.zeros(len(samples), dtype=np.int64),
+    }
+    total_wagered = 0.0
+    total_pnl = 0.0
+    wagered_since = 0.0
+    pnl_since = 0.0
+    sample = 0
+
+    done = 0
+    while done < rounds:
+        n = min(chunk_rounds, rounds - done)
+        crash = generate_crash_batch(rng, (1, n))
+
+        # Per-player network outcomes for this chunk
+        blocks = []
+        for _, _, state, _ in members:
+            size = state["balance"].size
+            if not simulate_network:
+                blocks.append((None, None))
+                continue
+            if error_simulation:
+                net_ok = rng.random((size, n)) >= NETWORK_ERROR_RATE
+            else:
+                net_ok = np.ones((size, n), dtype=bool)
+            blocks.append((net_ok, rng.uniform(MIN_NETWORK_DELAY, MAX_NETWORK_DELAY, (size, n))))
+
+        # Per-round table totals for this chunk
+        round_wagered = np.zeros(n)
+        round_pnl = np.zeros(n)
+        round_active = np.zeros(n, dtype=np.int64)
+        round_ruined = np.zeros(n, dtype=np.int64)
+
+        for (group, params, state, _), (net_ok, delay) in zip(members, blocks):
+            streams = {"crash": crash, "net_ok": net_ok, "delay": delay}
+            if params["strategy"] in STATELESS_STRATEGIES:
+                # No per-round state: advance the whole chunk at once
+                before = state["balance"].sum()
+                sums = advance_batch(params, state, streams, record=True).sum(axis=0)
+                round_pnl += np.diff(sums, prepend=before)
+                played = state["balance"].size if net_ok is None else net_ok.sum(axis=0)
+                round_wagered += played * stateless_stake(params)
+                round_active += state["balance"].size
+                continue
+
+            if not state["active"].any():
+                round_ruined += state["ruin"].sum()
+                continue
+
+            for j in range(n):
+                before_balance = state["balance"].sum()
+                before_wagered = state["wagered"].sum()
+                advance_batch(params, state, {
+                    "crash": crash[:, j:j + 1],
+                    "net_ok": None if net_ok is None else net_ok[:, j:j + 1],
+                    "delay": None if delay is None else delay[:, j:j + 1],
+                })
+                round_wagered[j] += state["wagered"].sum() - before_wagered
+                round_pnl[j] += state["balance"].sum() - before_balance
+                round_active[j] += state["active"].sum()
+                round_ruined[j] += state["ruin"].sum()
+
+        for j in range(n):
+            total_wagered += round_wagered[j]
+            total_pnl += round_pnl[j]
+            wagered_since += round_wagered[j]
+            pnl_since += round_pnl[j]
+            if sample < len(samples) and done + j == samples[sample]:
+                series["wagered"][sample] = wagered_since
+                series["house_pnl"][sample] = -pnl_since
+                series["active_players"][sample] = round_active[j]
+                series["ruined_players"][sample] = round_ruined[j]
+                wagered_since = 0.0
+                pnl_since = 0.0
+                sample += 1
+        done += n
+
+    summaries = []
+    for group, params, state, start_balance in members:
+        final = state["balance"]
+        summaries.append({
+            "strategy": group['strategy'],
+            "players": int(final.size),
+            "ruined": int(state["ruin"].sum()),
+            "ruin_rate": round(float(state["ruin"].mean()), 6),
+            "target_reached": int(state["target_reached"].sum()),
+            "mean_final_balance": round(float(final.mean()), 2),
+            "median_final_balance": round(float(np.median(final)), 2),
+            "total_wagered": round(float(state["wagered"].sum()), 2),
+            "house_pnl": round(start_balance - float(final.sum()), 2),
+        })
+
+    elapsed = time.perf_counter() - started
+    logger.info("Table simulation: %s players x %s rounds in %.2fs", players, rounds, elapsed)
+
+    return {
+        "players": players,
+        "rounds": rounds,
+        "sample_every": sample_every,
+        "total_wagered": round(float(total_wagered), 2),
+        "house_pnl": round(float(-total_pnl), 2),
+        "house_edge_realized": round(float(-total_pnl / total_wagered), 6) if total_wagered else None,
+        "series": {
+            "round": series["round"],
+            "wagered": np.round(series["wagered"], 2).tolist(),
+            "house_pnl": np.round(series["house_pnl"], 2).tolist(),
+            "active_players": series["active_players"].tolist(),
+            "ruined_players": series["ruined_players"].tolist(),
+        },
+        "groups": summaries,
+        "elapsed_seconds": round(elapsed, 3),
+    }
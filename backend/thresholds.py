@@ -0,0 +1,133 @@
+import time
+import random
+import logging
+import numpy as np
+
+from simulator import custom_strategy_realistic, target_profit_strategy_realistic
+from distributions import DistributionRandom, load_distribution
+
+logger = logging.getLogger(__name__)
+
+# Strategies whose stop thresholds only end the run and never change a bet
+SWEEP_STRATEGIES = ('custom', 'target_profit')
+
+MAX_SWEEP_PAIRS = 100000
+
+# Stand-in for "no threshold" that still converts to cents
+UNBOUNDED = 1e15
+
+
+def first_passage(path, lower, upper):
+    """
+    First index at which a path is at or below lower or at or above upper
+
+    Running minima and maxima of a path are monotone, so the first passage
+    below every lower threshold (and above every upper one) is a single
+    searchsorted over them.
+
+    Args:
+        path: Values checked at indices 0..n-1
+        lower, upper: Threshold arrays of equal length; use -inf / inf to
+            disable one side
+
+    Returns:
+        Tuple of (index, hit) arrays: index is n where neither threshold is
+        crossed, hit is 0 for none, 1 for lower (checked first) and 2 for upper
+    """
+    path = np.asarray(path, dtype=float)
+    running_min = np.minimum.accumulate(path)
+    running_max = np.maximum.accumulate(path)
+    lower_index = np.searchsorted(-running_min, -np.asarray(lower, dtype=float), side='left')
+    upper_index = np.searchsorted(running_max, np.asarray(upper, dtype=float), side='left')
+    index = np.minimum(lower_index, upper_index)
+    hit = np.where(index == path.size, 0, np.where(lower_index <= upper_index, 1, 2))
+    return index, hit
+
+
+def sweep_thresholds(strategy, rounds, stop_losses, take_profits, bet=1.0, bankroll=100,
+                     custom_params=None, realistic_conditions=True, min_bet=0.10, max_bet=1000.0,
+                     network_delay=True, error_simulation=True, cents=False, seed=None,
+                     crash_distribution=None):
+    """
+    Outcome of many stop-loss/take-profit pairs on one simulated path
+
+    The strategy is run once with its thresholds disabled; since they only
+    end a run, every pair's run is a prefix of that path and its stop round
+    is a first-passage time. For target_profit, take_profits are profit
+    targets and stop losses do not apply. Thresholds are compared against
+    balances rounded to the cent, which is exact in cents mode.
+
+    Args:
+        strategy: "custom" or "target_profit"
+        rounds: Rounds of the unconstrained path
+        stop_losses, take_profits: Equal-length threshold arrays, one entry
+            per pair (None entries disable a threshold)
+        seed: Optional seed of the path
+        crash_distribution: Optional crash distribution spec of the path
+
+    Returns:
+        Dictionary with per-pair stop round, final balance and outcome
+        ("stop_loss", "take_profit", "ruin" or "completed")
+
+    Raises:
+        ValueError: If the strategy does not support sweeps
+    """
+    if strategy not in SWEEP_STRATEGIES:
+        raise ValueError(f"Threshold sweeps support {', '.join(SWEEP_STRATEGIES)}, not {strategy}")
+    if len(stop_losses) != len(take_profits):
+        raise ValueError("stop_losses and take_profits must have the same length")
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    if crash_distribution is not None:
+        rng = DistributionRandom(load_distribution(crash_distribution), rng)
+    common = dict(realistic_conditions=realistic_conditions, min_bet=min_bet, max_bet=max_bet,
+                  network_delay=network_delay, error_simulation=error_simulation, cents=cents,
+                  rng=rng)
+
+    lower = np.array([-np.inf if v is None else v for v in stop_losses], dtype=float)
+    upper = np.array([np.inf if v is None else v for v in take_profits], dtype=float)
+    if strategy == 'custom':
+        result = custom_strategy_realistic(
+            rounds, bankroll=bankroll, cashout_target=custom_params['cashout_target'],
+            bet_sequence=custom_params['bet_sequence'], max_bet_custom=custom_params['max_bet'],
+            stop_loss=-1, take_profit=UNBOUNDED,
+            progression_type=custom_params['progression_type'], **common)
+    else:
+        result = target_profit_strategy_realistic(
+            rounds, base_bet=bet, target_profit=UNBOUNDED, bankroll=bankroll, **common)
+        lower[:] = -np.inf
+        upper = upper + bankroll
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+    history = np.asarray(result["history"], dtype=float)
+    # Balances the stop checks see: before each round played, including the
+    # round at which the run was ruined
+    checked = np.concatenate([[bankroll], history if result["ruin_occurred"] else history[:-1]])
+    index, hit = first_passage(checked, lower, upper)
+
+    final = np.where(hit > 0, checked[np.minimum(index, checked.size - 1)],
+                     history[-1] if history.size else bankroll)
+    outcome_names = np.array(['ruin' if result["ruin_occurred"] else 'completed',
+                              'stop_loss', 'take_profit'])
+    outcomes = outcome_names[hit]
+    stop_round = np.where(hit > 0, index, history.size)
+
+    elapsed = time.perf_counter() - started
+    logger.info("Threshold sweep: %s pairs over %s rounds in %.3fs",
+                len(lower), history.size, elapsed)
+
+    return {
+        "strategy": strategy,
+        "rounds": rounds,
+        "path_rounds": int(history.size),
+        "pairs": len(lower),
+        "stop_loss": [None if v is None else float(v) for v in stop_losses],
+        "take_profit": [None if v is None else float(v) for v in take_profits],
+        "stop_round": stop_round.tolist(),
+        "final_balance": np.round(final, 2).tolist(),
+        "outcome": outcomes.tolist(),
+        "outcome_counts": {str(name): int((outcomes == name).sum()) for name in set(outcome_names)},
+        "elapsed_seconds": round(elapsed, 4),
+    }
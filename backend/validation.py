@@ -0,0 +1,331 @@
+import logging
+from datetime import datetime, timezone
+
+from batch import build_batch_params, parse_ladder
+from strategy_dsl import parse_rules, compile_rules
+from checkpoint import decode_checkpoint
+from distributions import CRASH_DISTRIBUTIONS, DEFAULT_EMPIRICAL_BINS, MAX_EMPIRICAL_BINS, MAX_CRASH
+from fair import DEFAULT_HOUSE_EDGE, MAX_CHAIN_LENGTH
+
+# Request argument parsing shared by the HTTP API and offline tools such as
+# scenarios.py, so it must stay importable without creating the Flask app
+logger = logging.getLogger(__name__)
+
+
+def validate_float(value, default, min_val=None, max_val=None, name="parameter"):
+    """Validate and convert string to float with bounds checking"""
+    try:
+        result = float(value) if value is not None else default
+        if min_val is not None and result < min_val:
+            logger.warning("%s %s below minimum %s, using %s", name, result, min_val, min_val)
+            return min_val
+        if max_val is not None and result > max_val:
+            logger.warning("%s %s above maximum %s, using %s", name, result, max_val, max_val)
+            return max_val
+        return result
+    except (ValueError, TypeError):
+        logger.warning("Invalid %s value: %s, using default: %s", name, value, default)
+        return default
+
+
+def validate_int(value, default, min_val=None, max_val=None, name="parameter"):
+    """Validate and convert string to int with bounds checking"""
+    try:
+        result = int(value) if value is not None else default
+        if min_val is not None and result < min_val:
+            logger.warning("%s %s below minimum %s, using %s", name, result, min_val, min_val)
+            return min_val
+        if max_val is not None and result > max_val:
+            logger.warning("%s %s above maximum %s, using %s", name, result, max_val, max_val)
+            return max_val
+        return result
+    except (ValueError, TypeError):
+        logger.warning("Invalid %s value: %s, using default: %s", name, value, default)
+        return default
+
+
+def validate_bool(value, default, name="parameter"):
+    """Validate and convert string to boolean"""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.lower() in ('true', '1', 'yes', 'on')
+    return bool(value)
+
+
+def validate_bet_sequence(bet_sequence, default="1,2,4"):
+    """Validate and parse bet sequence"""
+    if not bet_sequence:
+        return default.split(',')
+
+    try:
+        # Parse and validate bet sequence
+        bets = [float(x.strip()) for x in bet_sequence.split(',') if x.strip()]
+        if not bets:
+            logger.warning("Empty bet sequence, using default: %s", default)
+            return default.split(',')
+
+        # Ensure all bets are positive
+        valid_bets = [max(0.01, bet) for bet in bets]
+        if valid_bets != [float(x) for x in bets]:
+            logger.warning("Some bet values were below 0.01, adjusted to minimum")
+
+        return [str(bet) for bet in valid_bets]
+    except Exception as e:
+        logger.warning("Invalid bet sequence '%s': %s, using default: %s", bet_sequence, e, default)
+        return default.split(',')
+
+
+def parse_threshold_list(value, name):
+    """Parse a comma-separated list of thresholds; "none" disables one"""
+    if not value:
+        return [None]
+    try:
+        return [None if x.strip().lower() == 'none' else float(x)
+                for x in value.split(',') if x.strip()]
+    except ValueError:
+        raise ValueError(f"{name} must be a comma-separated list of numbers")
+
+
+def parse_timestamp(value, name):
+    """Parse an ISO date or timestamp into the run store's UTC format"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or timestamp")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+STRATEGIES = ['early', 'mid', 'high', 'dual', 'ladder', 'martingale', 'paroli',
+              'fixed_percent', 'target_profit', 'custom', 'rules']
+
+
+def parse_simulation_args(args):
+    """
+    Validate the strategy parameters shared by the simulation endpoints
+
+    Args:
+        args: Request query arguments
+
+    Returns:
+        Tuple of (params, error) where params holds simulate_strategy keyword
+        arguments and error is a message when the request is invalid
+    """
+    # Basic parameters with validation
+    strategy = args.get('strategy', 'early')
+    if strategy not in STRATEGIES:
+        return None, f"Invalid strategy: {strategy}"
+
+    rounds = validate_int(args.get('rounds'), 1000, 1, 100000, "rounds")
+    bet = validate_float(args.get('bet'), 1.0, 0.01, 10000, "bet")
+    bankroll = validate_float(args.get('bankroll'), 100, 1, 1000000, "bankroll")
+    target_profit = validate_float(args.get('target_profit'), 50, 1, 1000000, "target_profit")
+    percent_bet = validate_float(args.get('percent_bet'), 5, 0.1, 100, "percent_bet")
+
+    # Realistic conditions parameters with validation
+    realistic_conditions = validate_bool(args.get('realistic_conditions'), True)
+    min_bet = validate_float(args.get('min_bet'), 0.10, 0.01, 1000, "min_bet")
+    max_bet = validate_float(args.get('max_bet'), 1000.0, 1, 100000, "max_bet")
+    network_delay = validate_bool(args.get('network_delay'), True)
+    error_simulation = validate_bool(args.get('error_simulation'), True)
+    cents = validate_bool(args.get('cents'), False)
+
+    # Ensure min_bet <= max_bet
+    if min_bet > max_bet:
+        logger.warning("min_bet (%s) > max_bet (%s), swapping values", min_bet, max_bet)
+        min_bet, max_bet = max_bet, min_bet
+
+    # Custom strategy parameters with validation
+    custom_params = {}
+    if strategy == 'custom':
+        custom_params = {
+            'cashout_target': validate_float(args.get('cashout_target'), 2.0, 1.01, 1000, "cashout_target"),
+            'bet_sequence': ','.join(validate_bet_sequence(args.get('bet_sequence'))),
+            'max_bet': validate_float(args.get('max_bet'), 20, 1, 100000, "custom_max_bet"),
+            'stop_loss': validate_float(args.get('stop_loss'), 50, 0, 1000000, "stop_loss"),
+            'take_profit': validate_float(args.get('take_profit'), 200, 1, 1000000, "take_profit"),
+            'progression_type': args.get('progression_type', 'loss')
+        }
+
+        # Validate progression type
+        if custom_params['progression_type'] not in ['loss', 'win']:
+            logger.warning("Invalid progression_type: %s, using 'loss'", custom_params['progression_type'])
+            custom_params['progression_type'] = 'loss'
+
+    # Ladder rungs as [stake, cashout] pairs
+    if strategy == 'ladder':
+        try:
+            custom_params = {'rungs': parse_ladder(args.get('rungs', ''))}
+        except ValueError as e:
+            return None, str(e)
+
+    # Rule-based strategies are compiled up front so a bad spec is a 400
+    if strategy == 'rules':
+        try:
+            rules = parse_rules(args.get('rules', ''))
+            compile_rules(rules)
+        except ValueError as e:
+            return None, str(e)
+        custom_params = {'rules': rules}
+
+    # Validate bankroll is sufficient for minimum bet
+    if bankroll < min_bet:
+        return None, f"Bankroll ({bankroll}) must be at least the minimum bet ({min_bet})"
+
+    try:
+        crash_distribution = parse_crash_distribution(args)
+    except ValueError as e:
+        return None, str(e)
+
+    return {
+        'strategy': strategy,
+        'rounds': rounds,
+        'bet': bet,
+        'bankroll': bankroll,
+        'target_profit': target_profit,
+        'percent_bet': percent_bet,
+        'realistic_conditions': realistic_conditions,
+        'min_bet': min_bet,
+        'max_bet': max_bet,
+        'network_delay': network_delay,
+        'error_simulation': error_simulation,
+        'custom_params': custom_params,
+        'cents': cents,
+        'crash_distribution': crash_distribution
+    }, None
+
+
+# Query arguments of the parametric crash distributions: (spec key, bounds)
+PARETO_ARGS = {'pareto_alpha': ('alpha', 0.01, 100), 'instant_crash': ('instant', 0, 0.99)}
+LOGNORMAL_ARGS = {'lognormal_mu': ('mu', -50, 50), 'lognormal_sigma': ('sigma', 0.001, 50),
+                  'instant_crash': ('instant', 0, 0.99)}
+
+
+def parse_crash_samples(value):
+    """Parse comma-separated recorded crash multipliers"""
+    try:
+        return [float(x) for x in value.split(',') if x.strip()]
+    except ValueError:
+        raise ValueError("crash_samples must be a comma-separated list of multipliers")
+
+
+def parse_crash_distribution(args):
+    """
+    Crash distribution spec requested with crash_distribution, or None
+
+    Model parameters that are left out are fitted to crash_samples
+    (see distributions.normalize_distribution).
+
+    Raises:
+        ValueError: If the distribution is unknown or underspecified
+    """
+    kind = args.get('crash_distribution', 'default')
+    if kind not in CRASH_DISTRIBUTIONS:
+        raise ValueError(f"Invalid crash_distribution: {kind}")
+    max_crash = args.get('max_crash')
+    if max_crash is not None:
+        max_crash = validate_float(max_crash, None, 1.0, MAX_CRASH, "max_crash")
+    if kind == 'default' and max_crash is None:
+        return None
+
+    spec = {"type": kind, "max_crash": max_crash}
+    if args.get('crash_samples'):
+        spec["samples"] = parse_crash_samples(args['crash_samples'])
+    if kind == 'house_edge':
+        spec["house_edge"] = validate_float(args.get('house_edge'), DEFAULT_HOUSE_EDGE, 0, 0.5, "house_edge")
+    elif kind == 'empirical':
+        spec["bins"] = validate_int(args.get('crash_bins'), DEFAULT_EMPIRICAL_BINS, 1,
+                                    MAX_EMPIRICAL_BINS, "crash_bins")
+    elif kind != 'default':
+        names = PARETO_ARGS if kind == 'pareto' else LOGNORMAL_ARGS
+        for name, (key, low, high) in names.items():
+            if args.get(name) is not None:
+                spec[key] = validate_float(args[name], None, low, high, name)
+    return spec
+
+
+def parse_crash_chain(args):
+    """
+    Hash-chain crash source requested with crash_source=hash_chain, or None
+
+    Raises:
+        ValueError: If the chain is not fully specified
+    """
+    source = args.get('crash_source', 'random')
+    if source == 'random':
+        return None
+    if source != 'hash_chain':
+        raise ValueError(f"Invalid crash_source: {source}")
+    server_seed = args.get('server_seed')
+    if not server_seed:
+        raise ValueError("server_seed is required for hash-chain crashes")
+    return {
+        "server_seed": server_seed,
+        "length": validate_int(args.get('chain_length'), 100000, 1, MAX_CHAIN_LENGTH, "chain_length"),
+        "house_edge": validate_float(args.get('house_edge'), DEFAULT_HOUSE_EDGE, 0, 0.5, "house_edge"),
+        "offset": validate_int(args.get('chain_offset'), 0, 0, MAX_CHAIN_LENGTH - 1, "chain_offset"),
+    }
+
+
+# Query arguments that feed custom_params
+CUSTOM_ARGS = ('cashout_target', 'bet_sequence', 'max_bet', 'stop_loss', 'take_profit',
+               'progression_type', 'rules', 'rungs')
+
+
+def parse_resume_args(args):
+    """
+    Simulation arguments for continuing a checkpoint
+
+    Parameters not given explicitly are taken from the checkpointed run, so
+    a bare checkpoint plus rounds continues the same run, while any given
+    parameter overrides it for a what-if branch. Tokens are signed (see
+    checkpoint.encode_checkpoint), so saved parameters are ones this server
+    validated when it ran them.
+
+    Returns:
+        Tuple of (params, error) as from parse_simulation_args
+    """
+    try:
+        saved = decode_checkpoint(args['checkpoint'])["params"]
+    except ValueError as e:
+        return None, str(e)
+    except (KeyError, TypeError):
+        return None, "Invalid checkpoint: missing run parameters"
+
+    merged = dict(args)
+    merged.setdefault('strategy', saved['strategy'])
+    if merged['strategy'] == 'rules' and 'rules' not in args and saved['custom_params']:
+        merged['rules'] = saved['custom_params'].get('rules')
+    if merged['strategy'] == 'ladder' and 'rungs' not in args and saved['custom_params']:
+        merged['rungs'] = saved['custom_params'].get('rungs')
+
+    params, error = parse_simulation_args(merged)
+    if error:
+        return None, error
+    if params['strategy'] == saved['strategy']:
+        for key, value in saved.items():
+            if key not in ('strategy', 'custom_params') and key not in args:
+                params[key] = value
+        if not any(key in args for key in CUSTOM_ARGS):
+            params['custom_params'] = saved['custom_params']
+    return params, None
+
+
+def build_request_batch_params(params):
+    """Batch engine parameters for validated simulation arguments"""
+    return build_batch_params(
+        params['strategy'],
+        bet=params['bet'],
+        bankroll=params['bankroll'],
+        target_profit=params['target_profit'],
+        percent_bet=params['percent_bet'],
+        min_bet=params['min_bet'],
+        max_bet=params['max_bet'],
+        custom_params=params['custom_params'],
+        cents=params['cents'],
+        crash_distribution=params['crash_distribution']
+    )
@@ -0,0 +1,52 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Worker processes shared by every request that simulates in parallel
+WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES', os.cpu_count() or 1))
+
+# Forking a threaded server copies whatever locks its other threads hold,
+# so workers start from a clean forkserver, or spawn where there is none
+WORKER_START_METHOD = os.environ.get(
+    'WORKER_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool():
+    """
+    The process pool shared by all requests, created on first use
+
+    Requests submit their tasks to this one pool instead of starting their
+    own, so parallel requests queue for WORKER_PROCESSES workers rather
+    than each forking a set. A pool broken by a worker that died, or
+    inherited from a parent process, is replaced.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid() or _pool._broken:
+            _pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES,
+                                        mp_context=multiprocessing.get_context(WORKER_START_METHOD))
+            _pool_pid = os.getpid()
+            logger.info("Started a pool of %d %s workers", WORKER_PROCESSES, WORKER_START_METHOD)
+        return _pool
+
+
+def start_pool():
+    """
+    Create the shared pool and launch its workers without waiting for them
+
+    Call it from the server's main block: workers started while the main
+    module is still being imported would import it again themselves.
+    """
+    pool = shared_pool()
+    for _ in range(WORKER_PROCESSES):
+        pool.submit(os.getpid)
+    return pool
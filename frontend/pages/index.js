@@ -73,6 +73,46 @@ function computeStats(history, startingBankroll = 100) {
   };
 }
 
+const API_URL = "http://localhost:8000";
+const HISTORY_PAGE_SIZE = 20;
+
+// Shape a stored run summary from the backend like a locally made history entry
+function runToEntry(run) {
+  const params = run.params;
+  const custom = params.custom_params || {};
+  return {
+    id: run.id,
+    strategy: run.strategy,
+    bet: params.bet,
+    rounds: run.rounds,
+    bankroll: run.bankroll,
+    targetProfit: params.target_profit,
+    percentBet: params.percent_bet,
+    json: run.summary,
+    timestamp: run.created_at,
+    realisticConditions: params.realistic_conditions,
+    minBetLimit: params.min_bet,
+    maxBetLimit: params.max_bet,
+    networkDelay: params.network_delay,
+    errorSimulation: params.error_simulation,
+    customParams: run.strategy === "custom" ? {
+      cashOutTarget: custom.cashout_target,
+      betSequence: custom.bet_sequence,
+      maxBet: custom.max_bet,
+      stopLoss: custom.stop_loss,
+      takeProfit: custom.take_profit,
+      progressionType: custom.progression_type
+    } : null
+  };
+}
+
+async function fetchRunHistory(id) {
+  const res = await fetch(`${API_URL}/runs/${id}/history`);
+  const json = await res.json();
+  if (json.error) throw new Error(json.error);
+  return json.history;
+}
+
 function downloadCSV(rows, fileName = "simulation_history.csv") {
   const header = Object.keys(rows[0]).join(",");
   const csv = [header, ...rows.map(row => Object.values(row).join(","))].join("\n");
@@ -110,6 +150,10 @@ export default function Home() {
   const [error, setError] = useState(null);
   const [showBands, setShowBands] = useState(true);
   const [historyLog, setHistoryLog] = useState([]);
+  const [historyTotal, setHistoryTotal] = useState(0);
+  const [historyOffset, setHistoryOffset] = useState(0);
+  const [historyVersion, setHistoryVersion] = useState(0);
+  const [recentRuns, setRecentRuns] = useState([]);
   const [filterStrategy, setFilterStrategy] = useState("");
   const [minProfit, setMinProfit] = useState("");
   const [highlightedEntry, setHighlightedEntry] = useState(null);
@@ -144,26 +188,67 @@ export default function Home() {
   // Custom Strategy Builder mode
   const [showCustomBuilder, setShowCustomBuilder] = useState(false);
 
+  // Run history lives in the backend run store; only the current page of
+  // summaries is loaded, and histories are fetched when a run is opened
+  const historyFilters = () => {
+    const params = new URLSearchParams();
+    if (filterStrategy !== "") params.append("strategy", filterStrategy);
+    if (minProfit !== "") params.append("min_final_balance", minProfit);
+    return params;
+  };
+
+  const fetchRuns = async (params) => {
+    const res = await fetch(`${API_URL}/runs?${params.toString()}`);
+    const json = await res.json();
+    if (json.error) throw new Error(json.error);
+    return json;
+  };
+
   useEffect(() => {
-    const stored = localStorage.getItem("aviator_history");
-    if (stored) {
-      const parsed = JSON.parse(stored);
-      setHistoryLog(parsed);
-      if (parsed.length > 0) {
-        const best = parsed.reduce((prev, curr) =>
-          curr.json.final_balance > prev.json.final_balance ? curr : prev
-        );
-        setHighlightedEntry(best);
-      }
-    }
-  }, []);
+    const params = historyFilters();
+    params.append("limit", HISTORY_PAGE_SIZE);
+    params.append("offset", historyOffset);
+    fetchRuns(params)
+      .then(page => {
+        setHistoryLog(page.runs.map(runToEntry));
+        setHistoryTotal(page.total);
+      })
+      .catch(() => setHistoryLog([]));
+  }, [filterStrategy, minProfit, historyOffset, historyVersion]);
+
+  useEffect(() => {
+    setHistoryOffset(0);
+  }, [filterStrategy, minProfit]);
 
+  // Best run overall and the two latest runs (with histories) for the radar chart
   useEffect(() => {
-    localStorage.setItem("aviator_history", JSON.stringify(historyLog));
-  }, [historyLog]);
+    fetchRuns(new URLSearchParams({ order: "final_balance_desc", limit: 1 }))
+      .then(page => setHighlightedEntry(page.runs.length > 0 ? runToEntry(page.runs[0]) : null))
+      .catch(() => setHighlightedEntry(null));
+    fetchRuns(new URLSearchParams({ limit: 2 }))
+      .then(page => Promise.all(page.runs.map(async run => {
+        const entry = runToEntry(run);
+        const history = await fetchRunHistory(run.id);
+        return { ...entry, json: { ...entry.json, history } };
+      })))
+      .then(setRecentRuns)
+      .catch(() => setRecentRuns([]));
+  }, [historyVersion]);
+
+  const openRun = async (entry) => {
+    try {
+      const history = await fetchRunHistory(entry.id);
+      const json = { ...entry.json, history };
+      setData(json);
+      setStats(computeStats(history));
+      setError(null);
+    } catch (err) {
+      setError("Failed to load run history.");
+    }
+  };
 
   const comparisonData = () => {
-    const [first, second] = historyLog.slice(0, 2);
+    const [first, second] = recentRuns;
     if (!first || !second) return null;
     const stat1 = computeStats(first.json.history, first.bankroll);
     const stat2 = computeStats(second.json.history, second.bankroll);
@@ -257,7 +342,8 @@ export default function Home() {
         min_bet: minBetLimit,
         max_bet: maxBetLimit,
         network_delay: networkDelay,
-        error_simulation: errorSimulation
+        error_simulation: errorSimulation,
+        save: true
       });
 
       // Add custom strategy parameters if custom strategy is selected
@@ -270,7 +356,7 @@ export default function Home() {
         params.append('progression_type', progressionType);
       }
 
-      const res = await fetch(`http://localhost:8000/simulate?${params.toString()}`);
+      const res = await fetch(`${API_URL}/simulate?${params.toString()}`);
       const json = await res.json();
 
       if (json.error) {
@@ -279,31 +365,8 @@ export default function Home() {
       } else {
         setData(json);
         setStats(computeStats(json.history));
-        const newEntry = { 
-          strategy, 
-          bet, 
-          rounds, 
-          bankroll, 
-          targetProfit, 
-          percentBet, 
-          json, 
-          timestamp: new Date().toISOString(),
-          realisticConditions,
-          minBetLimit,
-          maxBetLimit,
-          networkDelay,
-          errorSimulation,
-          // Include custom strategy parameters
-          customParams: strategy === "custom" ? {
-            cashOutTarget,
-            betSequence,
-            maxBet,
-            stopLoss,
-            takeProfit,
-            progressionType
-          } : null
-        };
-        setHistoryLog([newEntry, ...historyLog]);
+        setHistoryOffset(0);
+        setHistoryVersion(v => v + 1);
         setError(null);
       }
     } catch (err) {
@@ -336,7 +399,8 @@ export default function Home() {
           min_bet: minBetLimit,
           max_bet: maxBetLimit,
           network_delay: networkDelay,
-          error_simulation: errorSimulation
+          error_simulation: errorSimulation,
+          save: true
         });
 
         // Add custom strategy parameters if comparing custom strategy
@@ -349,7 +413,7 @@ export default function Home() {
           params.append('progression_type', progressionType);
         }
 
-        const res = await fetch(`http://localhost:8000/simulate?${params.toString()}`);
+        const res = await fetch(`${API_URL}/simulate?${params.toString()}`);
         const json = await res.json();
 
         if (json.error) {
@@ -367,23 +431,9 @@ export default function Home() {
       
       if (results.length > 0) {
         setComparisonResults(results);
-        // Also add these results to history log
-        const newEntries = results.map(result => ({
-          strategy: result.strategy,
-          bet: result.bet,
-          rounds: result.rounds,
-          bankroll: result.bankroll,
-          targetProfit,
-          percentBet,
-          json: result.json,
-          timestamp: new Date().toISOString(),
-          realisticConditions,
-          minBetLimit,
-          maxBetLimit,
-          networkDelay,
-          errorSimulation
-        }));
-        setHistoryLog([...newEntries, ...historyLog]);
+        // The runs were stored by the backend; refresh the history page
+        setHistoryOffset(0);
+        setHistoryVersion(v => v + 1);
       }
     } catch (err) {
       setError("Failed to connect to backend.");
@@ -402,14 +452,23 @@ export default function Home() {
     });
   };
 
-  const filteredHistory = historyLog.filter(entry => {
-    const profitOk = minProfit === "" || entry.json.final_balance >= parseFloat(minProfit);
-    const strategyOk = filterStrategy === "" || entry.strategy === filterStrategy;
-    return profitOk && strategyOk;
-  });
-
-  const handleExport = () => {
-    const rows = filteredHistory.map(entry => ({
+  // Export every run matching the filters, one page of summaries at a time
+  const handleExport = async () => {
+    const entries = [];
+    try {
+      for (let offset = 0; ; offset += 500) {
+        const params = historyFilters();
+        params.append("limit", 500);
+        params.append("offset", offset);
+        const page = await fetchRuns(params);
+        entries.push(...page.runs.map(runToEntry));
+        if (entries.length >= page.total || page.runs.length === 0) break;
+      }
+    } catch (err) {
+      setError("Failed to load run history.");
+      return;
+    }
+    const rows = entries.map(entry => ({
       timestamp: entry.timestamp,
       strategy: entry.strategy,
       bet: entry.bet,
@@ -905,7 +964,7 @@ export default function Home() {
         // Single Strategy Mode
         <>
           {/* Radar or Bar Chart Comparison */}
-          {historyLog.length >= 2 && (
+          {recentRuns.length >= 2 && (
             <div style={{ marginBottom: "2rem" }}>
               <h3>📊 Strategy Comparison</h3>
               <Radar
@@ -1265,7 +1324,7 @@ export default function Home() {
         </div>
       )}
 
-      {historyLog.length > 0 && (
+      {(historyTotal > 0 || filterStrategy !== "" || minProfit !== "") && (
         <div style={{ marginTop: "2rem" }}>
           <h2>Simulation History</h2>
           <div style={{ marginBottom: "1rem" }}>
@@ -1289,8 +1348,8 @@ export default function Home() {
             <button onClick={handleExport}>Export CSV</button>
           </div>
           <ul>
-            {filteredHistory.map((entry, index) => (
-              <li key={index} style={{ marginBottom: "0.5rem" }}>
+            {historyLog.map((entry) => (
+              <li key={entry.id} style={{ marginBottom: "0.5rem" }}>
                 <div style={{ display: "flex", alignItems: "center", gap: "8px", flexWrap: "wrap" }}>
                   <div 
                     style={{ 
@@ -1323,10 +1382,30 @@ export default function Home() {
                       🧪 {entry.json.network_errors || 0}E, {entry.json.bet_limit_hits || 0}L
                     </span>
                   )}
+                  <button onClick={() => openRun(entry)} style={{ marginLeft: "8px", fontSize: "0.8rem" }}>
+                    Open
+                  </button>
                 </div>
               </li>
             ))}
           </ul>
+          <div style={{ display: "flex", alignItems: "center", gap: "8px" }}>
+            <button
+              onClick={() => setHistoryOffset(Math.max(0, historyOffset - HISTORY_PAGE_SIZE))}
+              disabled={historyOffset === 0}
+            >
+              Previous
+            </button>
+            <span style={{ fontSize: "0.85rem", color: "#666" }}>
+              {historyTotal === 0 ? "No runs" : `${historyOffset + 1}–${historyOffset + historyLog.length} of ${historyTotal}`}
+            </span>
+            <button
+              onClick={() => setHistoryOffset(historyOffset + HISTORY_PAGE_SIZE)}
+              disabled={historyOffset + HISTORY_PAGE_SIZE >= historyTotal}
+            >
+              Next
+            </button>
+          </div>
         </div>
       )}
     </div>